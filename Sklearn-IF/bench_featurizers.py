@@ -0,0 +1,67 @@
+# bench_featurizers.py
+# -*- coding: utf-8 -*-
+# Benchmark des featurizers pour l'Isolation Forest : débit de vectorisation (logs/s), taille de
+# la matrice et ROC-AUC obtenue avec les paramètres et l'évaluation de sklearn_isolationForest2.py.
+# Usage : python bench_featurizers.py --logs logs.csv --featurizers spacy hashing-tfidf hashing
+import argparse
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import roc_auc_score
+
+from features import clean, row_texts
+from featurizers import FEATURIZERS, get_featurizer
+
+
+def matrix_megabytes(X):
+    if sp.issparse(X):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 2**20
+    return np.asarray(X).nbytes / 2**20
+
+
+def evaluate(X, y_true, n_estimators):
+    # Mêmes paramètres que sklearn_isolationForest2.py
+    model = IsolationForest(n_estimators=n_estimators, max_samples=0.9, max_features=0.5,
+                            contamination=0.10, random_state=42)
+    start = time.perf_counter()
+    model.fit(X)
+    decision_scores = model.decision_function(X)
+    elapsed = time.perf_counter() - start
+    return roc_auc_score(y_true, -decision_scores), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit et ROC-AUC de l'Isolation Forest selon le featurizer")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs")
+    parser.add_argument("--featurizers", nargs="+", default=sorted(FEATURIZERS), help="Featurizers à comparer")
+    parser.add_argument("--text", choices=("row", "message"), default="row",
+                        help="Texte vectorisé : ligne complète (comme le détecteur) ou message seul")
+    parser.add_argument("--n-estimators", type=int, default=500, help="Nombre d'arbres de l'Isolation Forest")
+    parser.add_argument("--limit", type=int, default=None, help="Ne garder que les N premiers logs")
+    args = parser.parse_args()
+
+    df = clean(args.logs)
+    if args.limit:
+        df = df.iloc[:args.limit]
+    texts = row_texts(df) if args.text == "row" else df['message'].tolist()
+    # Même correspondance des labels que le bloc d'évaluation du détecteur
+    y_true = [1 if str(val).lower() in ['abnormal', 'anomaly', 'critical', 'error'] else 0
+              for val in df['severity_unified']]
+
+    print(f"\n{len(texts)} logs, {sum(y_true)} anomalies (texte : {args.text})")
+    print(f"{'featurizer':>14} {'dim':>7} {'Mo':>7} {'vectorisation (s)':>18} {'logs/s':>9}"
+          f" {'IF fit+score (s)':>17} {'ROC-AUC':>8}")
+    for name in args.featurizers:
+        featurizer = get_featurizer(name)
+        start = time.perf_counter()
+        X = featurizer.fit_transform(texts)
+        elapsed = time.perf_counter() - start
+        roc_auc, fit_elapsed = evaluate(X, y_true, args.n_estimators)
+        print(f"{name:>14} {X.shape[1]:>7} {matrix_megabytes(X):>7.1f} {elapsed:>18.2f}"
+              f" {len(texts) / elapsed:>9.0f} {fit_elapsed:>17.2f} {roc_auc:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
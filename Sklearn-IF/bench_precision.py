@@ -0,0 +1,82 @@
+# bench_precision.py
+# -*- coding: utf-8 -*-
+# Rapport des précisions de stockage des vecteurs (float64, float32, float16, int8 quantifié) :
+# mémoire de la matrice, taille sur le réseau, erreur de reconstruction et ROC-AUC obtenue par
+# l'Isolation Forest et le One-Class SVM (mêmes paramètres que les détecteurs).
+# Usage : python bench_precision.py --logs logs.csv --limit 20000
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import OneClassSVM
+
+from features import clean, get_log_vectors, row_texts
+from quantization import PRECISIONS, as_model_input, dequantize, quantize
+from wire_format import NPY_MIMETYPE, RAW_F16_MIMETYPE, RAW_F32_MIMETYPE, RAW_I8_MIMETYPE, encode_vectors
+
+WIRE_MIMETYPES = {'float64': NPY_MIMETYPE, 'float32': RAW_F32_MIMETYPE,
+                  'float16': RAW_F16_MIMETYPE, 'int8': RAW_I8_MIMETYPE}
+
+
+def isolation_forest_auc(X, y_true):
+    # Mêmes paramètres que sklearn_isolationForest2.py
+    model = IsolationForest(n_estimators=500, max_samples=0.9, max_features=0.5, contamination=0.10, random_state=42)
+    model.fit(X)
+    return roc_auc_score(y_true, -model.decision_function(X))
+
+
+def one_class_svm_auc(X, y_true):
+    # Mêmes paramètres que sklearn_one_class_Svm2.py
+    X_scaled = StandardScaler().fit_transform(X)
+    model = OneClassSVM(kernel='rbf', gamma='scale', nu=0.1)
+    model.fit(X_scaled)
+    return roc_auc_score(y_true, -model.decision_function(X_scaled))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire et ROC-AUC selon la précision des vecteurs")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs")
+    parser.add_argument("--text", choices=("row", "message"), default="row",
+                        help="Texte vectorisé : ligne complète (comme les détecteurs) ou message seul")
+    parser.add_argument("--limit", type=int, default=None, help="Ne garder que les N premiers logs (l'OCSVM est quadratique)")
+    parser.add_argument("--skip-ocsvm", action="store_true", help="Ne pas entraîner le One-Class SVM")
+    args = parser.parse_args()
+
+    df = clean(args.logs)
+    if args.limit:
+        df = df.iloc[:args.limit]
+    texts = row_texts(df) if args.text == "row" else df['message'].tolist()
+    # Même correspondance des labels que le bloc d'évaluation des détecteurs
+    y_true = [1 if str(val).lower() in ['abnormal', 'anomaly', 'critical', 'error'] else 0
+              for val in df['severity_unified']]
+    reference = np.asarray(get_log_vectors(texts), dtype=np.float32)
+
+    print(f"\n{len(texts)} logs, {reference.shape[1]} dimensions, {sum(y_true)} anomalies")
+    print(f"{'précision':>10} {'mémoire (Mo)':>13} {'gain':>6} {'réseau (Mo)':>12} {'erreur max':>11}"
+          f" {'IF ROC-AUC':>11} {'OCSVM ROC-AUC':>14} {'durée (s)':>10}")
+    baseline = None
+    for precision in ('float64',) + PRECISIONS:
+        start = time.perf_counter()
+        if precision == 'float64':
+            codes, scales = reference.astype(np.float64), None
+            model_input = codes
+        else:
+            codes, scales = quantize(reference, precision)
+            model_input = as_model_input(reference, precision)
+        megabytes = (codes.nbytes + (scales.nbytes if scales is not None else 0)) / 2**20
+        baseline = baseline or megabytes
+        wire = len(encode_vectors(reference, WIRE_MIMETYPES[precision])) / 2**20
+        error = float(np.abs(dequantize(codes, scales) - reference).max())
+        if_auc = isolation_forest_auc(model_input, y_true)
+        ocsvm_auc = float('nan') if args.skip_ocsvm else one_class_svm_auc(model_input, y_true)
+        elapsed = time.perf_counter() - start
+        print(f"{precision:>10} {megabytes:>13.1f} {baseline / megabytes:>5.1f}x {wire:>12.1f} {error:>11.2e}"
+              f" {if_auc:>11.4f} {ocsvm_auc:>14.4f} {elapsed:>10.1f}")
+    print("(réseau : float64 envoyé en .npy float32, le format de réponse le plus proche)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# bench_row_text.py
+# -*- coding: utf-8 -*-
+# Compare l'ancienne construction du texte des lignes (" ".join(map(str, row)) ligne par ligne,
+# '-' compris) et la sérialisation "champ=valeur" de row_text.py : durée, tokens et caractères
+# par log, durée de vectorisation du texte obtenu.
+# Usage : python bench_row_text.py --logs logs.csv --fields message,event.action,source.port
+import argparse
+import time
+
+import numpy as np
+
+from features import clean, get_log_vectors
+from row_text import ROW_TEXT_FORMATS, serialize_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Texte des lignes : jointure naïve contre champ=valeur")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs")
+    parser.add_argument("--fields", default=None, help="Champs sérialisés, séparés par des virgules (défaut : ROW_TEXT_FIELDS)")
+    parser.add_argument("--format", choices=ROW_TEXT_FORMATS, default=None, help="Format du texte (défaut : ROW_TEXT_FORMAT)")
+    parser.add_argument("--skip-vectorize", action="store_true", help="Ne pas mesurer la vectorisation")
+    args = parser.parse_args()
+
+    df = clean(args.logs)
+    fields = args.fields.split(",") if args.fields else None
+
+    def naive():
+        return [" ".join(map(str, row)) for row in df.iloc[:, :-1].values]
+
+    def serialized():
+        return serialize_rows(df, fields, args.format)
+
+    print(f"\n{len(df)} logs, {df.shape[1] - 1} colonnes")
+    print(f"{'texte':>12} {'durée (s)':>10} {'tokens/log':>11} {'car./log':>9} {'vectorisation (s)':>18}")
+    for name, build in (("naïf", naive), ("champ=valeur", serialized)):
+        start = time.perf_counter()
+        texts = build()
+        elapsed = time.perf_counter() - start
+        tokens = np.mean([len(text.split()) for text in texts])
+        chars = np.mean([len(text) for text in texts])
+        if args.skip_vectorize:
+            vectorize_elapsed = float('nan')
+        else:
+            start = time.perf_counter()
+            get_log_vectors(texts)
+            vectorize_elapsed = time.perf_counter() - start
+        print(f"{name:>12} {elapsed:>10.3f} {tokens:>11.1f} {chars:>9.0f} {vectorize_elapsed:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
 
 # --- Isolation Forest Anomaly Detection (Improved Version) dali ---
+import os
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
-from analyse_spacy2 import get_log_vectors, clean  # Ensure this module is properly configured
-from collections import Counter
+from features import get_log_vectors, get_row_features, clean, load_features, row_texts  # Ensure this module is properly configured
+from featurizers import LOG_FEATURIZER, get_featurizer
+from structured_features import LOG_STRUCTURED_FEATURES
+from quantization import VECTOR_PRECISION, as_model_input, input_scales
+from dedup import LOG_DEDUP, LOG_DEDUP_SAMPLE_WEIGHTS, RowDedup
+from log_loader import (SEVERITY_COLUMN, SPACY_CHECKPOINT_DIR, SPACY_CLEAN_COMPACT, checkpoint_lock, compact_frame,
+                        end_checkpoint, load_checkpoint, read_tail, save_checkpoint)
+import scipy.sparse as sp
+from metrics import track_stage
+import collections
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from flask import Flask, request, jsonify, Response
 
 from prometheus_client import generate_latest, Counter, Histogram, Gauge, REGISTRY 
-import time # Pour simuler la latence si nécessaire et mesurer
 
 app = Flask(__name__)
 
@@ -49,6 +57,15 @@ def safe_vectorize(text):
         print(f"Vectorization failed for: '{text[:50]}...' - Error: {str(e)}")
         return np.zeros(300)  # Fallback: zero vector matching spaCy's typical dim
 
+def vectorize_rows(rows_df):
+    """Vectorise le texte de toutes les lignes en un seul appel par lots (nlp.pipe) ; ligne par ligne en cas d'échec"""
+    texts = row_texts(rows_df)
+    try:
+        return np.asarray(get_log_vectors(texts))
+    except Exception as e:
+        print(f"Batch vectorization failed, falling back to row by row - Error: {str(e)}")
+        return np.array([safe_vectorize(text) for text in texts])
+
 # --- 2. Load & Prepare Data ---
 df = clean("logs.csv")
 logs_df = pd.DataFrame(df)
@@ -57,10 +74,53 @@ logs_df = pd.DataFrame(df)
 label_columns = logs_df["severity_unified"]
 logs = logs_df.iloc[:, :-1] 
 
+# --- 4. Lignes distinctes : chaque ligne unique n'est vectorisée et scorée qu'une fois ---
+dedup = RowDedup.from_frame(logs_df) if LOG_DEDUP else None
+if dedup is not None:
+    print(f"Dédoublonnage : {dedup.summary()}")
+
 # --- 5. Vectorize Logs ---
-print("Vectorizing logs...")
-log_vectors = [safe_vectorize(str(text)) for text in logs.values]
-data = pd.DataFrame(log_vectors)
+# Featurizer de texte et encodeur des champs ECS appris à l'entraînement puis réutilisés tels
+# quels au predict (poids IDF, moyennes et écarts-types...)
+text_featurizer = get_featurizer(LOG_FEATURIZER) if LOG_FEATURIZER != "spacy" else None
+structured_encoder = None
+if LOG_STRUCTURED_FEATURES:
+    # Champs ECS numériques et catégoriels encodés directement, le reste de la ligne vectorisé comme texte
+    print(f"Vectorizing logs (champs ECS structurés + texte '{LOG_FEATURIZER}')...")
+    data, structured_encoder = get_row_features(logs_df, featurizer=text_featurizer)
+elif LOG_FEATURIZER != "spacy":
+    # Featurizer choisi par déploiement (LOG_FEATURIZER) ; une matrice creuse est passée telle quelle
+    print(f"Vectorizing logs with featurizer '{LOG_FEATURIZER}'...")
+    data = get_log_vectors(row_texts(logs_df), featurizer=text_featurizer, fit=True)
+else:
+    # Si le service Spacy a écrit le stock de features (FEATURE_STORE_PATH), l'ouvrir en memmap sans copie
+    # (seulement s'il a été construit sur ce même fichier, avec le même texte de ligne que le predict)
+    data = load_features(logs_df.index, text="row", source="logs.csv")
+if data is None:
+    print("Vectorizing logs...")
+    # Même texte de ligne ("champ=valeur", sans les '-') à l'entraînement et au predict ;
+    # les textes répétés ne sont vectorisés qu'une fois (LOG_DEDUP, dans vectorize)
+    data = vectorize_rows(logs_df)
+
+# Précision des vecteurs donnés au modèle (VECTOR_PRECISION : float32, float16 ou int8 quantifié) ;
+# en int8, les échelles de l'entraînement sont gardées avec le modèle et réutilisées au predict
+model_scales = None
+if not sp.issparse(data):
+    data = np.asarray(data)
+    model_scales = input_scales(data, VECTOR_PRECISION)
+    data = as_model_input(data, VECTOR_PRECISION, model_scales)
+
+def predict_features(rows_df):
+    """Features de nouvelles lignes, construites comme à l'entraînement (même featurizer appris, même précision)"""
+    if structured_encoder is not None:
+        X, _ = get_row_features(rows_df, featurizer=text_featurizer, encoder=structured_encoder)
+    elif text_featurizer is not None:
+        X = get_log_vectors(row_texts(rows_df), featurizer=text_featurizer)
+    else:
+        X = vectorize_rows(rows_df)
+    if not sp.issparse(X):
+        X = as_model_input(np.asarray(X), VECTOR_PRECISION, model_scales)
+    return X
 
 # --- 6. Train Model on Full Dataset ---
 model = IsolationForest(
@@ -70,18 +130,33 @@ model = IsolationForest(
     contamination=0.10,
     random_state=42
 )
-model.fit(data)
+if dedup is not None and LOG_DEDUP_SAMPLE_WEIGHTS:
+    # IsolationForest ignore sample_weight dans la longueur des chemins (scores) : entraîner sur les
+    # lignes uniques pondérées ferait perdre leur densité aux lignes fréquentes. Le dédoublonnage ne
+    # sert donc ici qu'à la vectorisation et au scoring.
+    print("LOG_DEDUP_SAMPLE_WEIGHTS ignoré par l'Isolation Forest : entraînement sur toutes les lignes")
+with IF_TRAINING_LATENCY_SECONDS.time(), track_stage('if_train', rows=data.shape[0]):
+    model.fit(data)
 
 # --- 7. Predict & Analyze ---
-predictions = model.predict(data)
-decision_scores = model.decision_function(data)
+with track_stage('if_score', rows=data.shape[0]):
+    if dedup is not None:
+        # Le score d'une ligne ne dépend que de la ligne : les doublons reçoivent celui de leur ligne unique
+        decision_scores = dedup.scatter(model.decision_function(dedup.unique(data)), stage='if_score')
+    else:
+        decision_scores = model.decision_function(data)
+    # Même règle que model.predict : anomalie si le score est négatif
+    predictions = np.where(decision_scores < 0, -1, 1)
 y_pred_mapped = ['abnormal' if val == -1 else 'normal' for val in predictions]
 
 # --- 8. Résumé ---
 print(y_pred_mapped)
-counter = Counter(y_pred_mapped)
+# collections.Counter : le nom Counter désigne le compteur Prometheus importé plus haut
+counter = collections.Counter(y_pred_mapped)
 print(f"Anomalies détectées: {counter['abnormal']}")
 print(f"Logs normaux détectés: {counter['normal']}")
+IF_LAST_ANOMALIES_COUNT.set(counter['abnormal'])
+IF_LAST_ANOMALIES_PERCENT.set(100 * counter['abnormal'] / len(y_pred_mapped) if y_pred_mapped else 0)
 
 # --- 9. Comparaison avec 'severity_unified' ---
 true_labels = label_columns.tolist()  # Convert Series to list
@@ -119,13 +194,20 @@ original_indices = logs_df.index
 
 # Créez un DataFrame avec les informations nécessaires pour le dashboard
 # Incluez l'index original, le score, la prédiction, et les vrais labels (utiles pour la comparaison dans le dash)
-results_if_df = pd.DataFrame({
-    'original_index': original_indices,
-    'if_score': decision_scores, # Score de décision Isolation Forest
-    'if_prediction': y_pred_mapped, # Prédiction 'normal'/'abnormal' IF
-    'severity_unified_original': label_columns.tolist(), # Vrai label original (string)
-    'severity_unified_binary': y_true # Vrai label binaire (0/1) - déjà calculé
-})
+def results_frame(original_indices, scores, predictions, severities):
+    """Lignes du CSV du dashboard (entraînement et /predict/tail)"""
+    severities = list(severities)
+    return pd.DataFrame({
+        'original_index': original_indices,
+        'if_score': scores, # Score de décision Isolation Forest
+        'if_prediction': predictions, # Prédiction 'normal'/'abnormal' IF
+        'severity_unified_original': severities, # Vrai label original (string)
+        # Vrai label binaire (0/1), même règle que y_true
+        'severity_unified_binary': [1 if str(val).lower() in ['abnormal', 'anomaly', 'critical', 'error'] else 0
+                                    for val in severities]
+    })
+
+results_if_df = results_frame(original_indices, decision_scores, y_pred_mapped, label_columns)
 
 # Définir le nom du fichier de sortie
 output_filename_if = "isolation_forest_results_for_dashboard.csv"
@@ -137,6 +219,16 @@ try:
 except Exception as e:
     print(f"Erreur lors de la sauvegarde des résultats Isolation Forest : {e}")
 
+# --- 11. Point de reprise de l'ingestion incrémentale ---
+# Les lignes de logs.csv scorées ci-dessus ne sont pas relues : /predict/tail ne score ensuite que
+# les lignes ajoutées au fichier. Point de reprise propre au détecteur (le service Spacy et
+# l'OCSVM ont chacun le leur)
+IF_CHECKPOINT_DIR = os.path.join(SPACY_CHECKPOINT_DIR, 'isolation_forest')
+try:
+    save_checkpoint("logs.csv", end_checkpoint("logs.csv", len(logs_df)), IF_CHECKPOINT_DIR)
+except Exception as e:
+    print(f"Erreur lors de l'enregistrement du point de reprise : {e}")
+
 
 
 @app.route('/predict', methods=['POST'])
@@ -145,28 +237,70 @@ def predict():
     data = request.json
     logs_file = data.get("logs.csv", None)  # Nom du fichier CSV contenant les logs
     
+    IF_PREDICT_REQUESTS_TOTAL.inc()
     if not logs_file:
         return jsonify({"error": "No logs file provided"}), 400
     
     try:
-        # Appeler votre fonction clean() avec le fichier CSV
-        df = clean(logs.csv)
-        
-        # Extraire les vecteurs pour chaque log
-        log_vectors = [safe_vectorize(row) for row in df.iloc[:, :-1].values]
-        X = np.array(log_vectors)
-        
-        # Standardiser les données
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Faire des prédictions avec le modèle Isolation Forest
-        y_pred = model.predict(X_scaled)
-        y_pred_labels = ["abnormal" if p == -1 else "normal" for p in y_pred]
+        with IF_PREDICT_LATENCY_SECONDS.time():
+            # Appeler votre fonction clean() avec le fichier CSV
+            df = clean(logs_file)
+            
+            # Extraire les vecteurs de chaque ligne distincte, à partir du même texte de ligne qu'à l'entraînement
+            request_dedup = RowDedup.from_frame(df) if LOG_DEDUP else None
+            rows_df = request_dedup.unique(df) if request_dedup is not None else df
+            X = predict_features(rows_df)
+            
+            # Faire des prédictions avec le modèle Isolation Forest (entraîné sans standardisation)
+            with track_stage('if_score', rows=len(df)):
+                y_pred = model.predict(X)
+                if request_dedup is not None:
+                    y_pred = request_dedup.scatter(y_pred, stage='if_score')
+            y_pred_labels = ["abnormal" if p == -1 else "normal" for p in y_pred]
         
         # Retourner les prédictions sous forme JSON
         return jsonify({"predictions": y_pred_labels})
     except Exception as e:
+        IF_PREDICT_ERRORS_TOTAL.inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/predict/tail', methods=['POST'])
+def predict_tail():
+    """
+    Ingestion incrémentale : score avec le modèle déjà entraîné uniquement les lignes ajoutées à
+    logs.csv depuis l'entraînement (ou le dernier appel) et les ajoute au CSV du dashboard.
+    Le coût dépend du nombre de nouvelles lignes, pas de la taille de l'historique.
+    """
+    IF_PREDICT_REQUESTS_TOTAL.inc()
+    try:
+        # Verrou de la lecture du point de reprise à son enregistrement : deux appels concurrents
+        # ne scorent jamais le même delta
+        with IF_PREDICT_LATENCY_SECONDS.time(), checkpoint_lock("logs.csv", IF_CHECKPOINT_DIR):
+            delta, checkpoint = read_tail("logs.csv", load_checkpoint("logs.csv", IF_CHECKPOINT_DIR))
+            y_pred_labels = []
+            if len(delta):
+                # Mêmes valeurs que clean() (mode compact compris)
+                if SPACY_CLEAN_COMPACT:
+                    delta = compact_frame(delta)
+                request_dedup = RowDedup.from_frame(delta) if LOG_DEDUP else None
+                rows_df = request_dedup.unique(delta) if request_dedup is not None else delta
+                X = predict_features(rows_df)
+                with track_stage('if_score', rows=len(delta)):
+                    scores = model.decision_function(X)
+                    if request_dedup is not None:
+                        scores = request_dedup.scatter(scores, stage='if_score')
+                # Même règle que model.predict : anomalie si le score est négatif
+                y_pred_labels = ["abnormal" if score < 0 else "normal" for score in scores]
+                # Fichier remplacé ou tronqué : read_tail repart de la première ligne, le CSV du dashboard aussi
+                restart = delta.index.start == 0
+                results_frame(delta.index, scores, y_pred_labels, delta[SEVERITY_COLUMN]).to_csv(
+                    output_filename_if, mode='w' if restart else 'a', header=restart, index=False)
+            save_checkpoint("logs.csv", checkpoint, IF_CHECKPOINT_DIR)
+        
+        # Les lignes du delta sont numérotées à la suite des lignes déjà scorées (original_index)
+        return jsonify({"row_start": int(delta.index.start), "row_count": len(delta), "predictions": y_pred_labels})
+    except Exception as e:
+        IF_PREDICT_ERRORS_TOTAL.inc()
         return jsonify({"error": str(e)}), 500
 
 @app.route('/metrics')
@@ -4,7 +4,7 @@ from sklearn.svm import OneClassSVM
 from sklearn.preprocessing import StandardScaler
 # Assurez-vous que le fichier 'analyse_spacy.py' est dans le même répertoire
 # ou que le module est correctement installé/accessible.
-from analyse_spacy2 import get_log_vectors, clean
+from features import get_log_vectors, clean
 from sklearn.metrics import classification_report, confusion_matrix
 import sys # Importé pour la gestion des erreurs potentielles
 
@@ -0,0 +1,69 @@
+# bench_near_dedup.py
+# -*- coding: utf-8 -*-
+# Compare l'entraînement du One-Class SVM sur toutes les lignes et sur un représentant pondéré
+# par groupe de quasi-doublons (near_dedup.py), pour plusieurs seuils : durée du regroupement et
+# de l'entraînement, puis la même répartition des prédictions par vrai label (severity_unified)
+# que le script d'entraînement, toutes les lignes étant scorées par chaque modèle.
+# Usage : python bench_near_dedup.py --logs logs.csv --thresholds 0.8,0.9,0.95
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import OneClassSVM
+
+from features import clean, get_log_vectors, row_texts
+from near_dedup import near_dedup
+
+
+def label_breakdown(true_labels, predictions):
+    """% de lignes prédites abnormal pour chaque vrai label (lignes de la matrice de confusion)."""
+    cm_df = pd.crosstab(pd.Series(true_labels, name='Vrai Label'),
+                        pd.Series(np.where(predictions == -1, 'abnormal', 'normal'), name='Prédit par SVM'))
+    for column in ('abnormal', 'normal'):
+        if column not in cm_df.columns:
+            cm_df[column] = 0
+    return (100 * cm_df['abnormal'] / cm_df.sum(axis=1)).round(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-Class SVM : toutes les lignes contre représentants des quasi-doublons")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs")
+    parser.add_argument("--thresholds", default="0.8,0.9,0.95", help="Seuils de similarité, séparés par des virgules")
+    parser.add_argument("--nu", type=float, default=0.1, help="Paramètre nu du One-Class SVM")
+    args = parser.parse_args()
+
+    df = clean(args.logs)
+    features_df = df.iloc[:, :-1]
+    true_labels = df.iloc[:, -1].astype(str).values
+    X_scaled = StandardScaler().fit_transform(np.asarray(get_log_vectors(row_texts(features_df))))
+
+    runs = {}
+    print(f"\n{len(df)} logs, {X_scaled.shape[1]} dimensions")
+    print(f"{'seuil':>8} {'groupes':>9} {'regroupement (s)':>17} {'entraînement (s)':>17} {'accord (%)':>11}")
+    for threshold in [None] + [float(value) for value in args.thresholds.split(',')]:
+        model = OneClassSVM(kernel='rbf', gamma='scale', nu=args.nu)
+        start = time.perf_counter()
+        groups = near_dedup(features_df, threshold) if threshold is not None else None
+        group_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        if groups is not None:
+            model.fit(groups.unique(X_scaled), sample_weight=groups.counts)
+        else:
+            model.fit(X_scaled)
+        fit_elapsed = time.perf_counter() - start
+        predictions = model.predict(X_scaled)
+
+        name = 'aucun' if threshold is None else f"{threshold:g}"
+        runs[name] = predictions
+        agreement = 100 * np.mean(predictions == runs['aucun'])
+        n_groups = groups.n_unique if groups is not None else len(df)
+        print(f"{name:>8} {n_groups:>9} {group_elapsed:>17.2f} {fit_elapsed:>17.2f} {agreement:>11.1f}")
+
+    print("\n% prédit abnormal par vrai label :")
+    print(pd.DataFrame({name: label_breakdown(true_labels, predictions) for name, predictions in runs.items()}).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
-from analyse_spacy2 import get_log_vectors, clean  # Ensure this module is properly configured
+from features import get_log_vectors, clean  # Ensure this module is properly configured
 from collections import Counter
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 
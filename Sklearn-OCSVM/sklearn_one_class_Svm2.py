@@ -1,16 +1,50 @@
+import os
 import pandas as pd
 import numpy as np
 from sklearn.svm import OneClassSVM
 from sklearn.preprocessing import StandardScaler
 # Assurez-vous que le fichier 'analyse_spacy.py' est dans le même répertoire
 # ou que le module est correctement installé/accessible.
-from analyse_spacy2 import get_log_vectors, clean
-from sklearn.metrics import classification_report, confusion_matrix
+from features import get_log_vectors, get_row_features, clean, load_features, row_texts
+from structured_features import LOG_STRUCTURED_FEATURES
+from quantization import VECTOR_PRECISION, as_model_input, input_scales
+from dedup import LOG_DEDUP, LOG_DEDUP_SAMPLE_WEIGHTS, RowDedup
+from near_dedup import LOG_NEAR_DEDUP, LOG_NEAR_DEDUP_THRESHOLD, near_dedup
+from log_loader import (SEVERITY_COLUMN, SPACY_CHECKPOINT_DIR, SPACY_CLEAN_COMPACT, checkpoint_lock, compact_frame,
+                        end_checkpoint, load_checkpoint, read_tail, save_checkpoint)
+from sklearn.metrics import confusion_matrix
 import sys # Importé pour la gestion des erreurs potentielles
 
 from flask import Flask, request, jsonify, Response # Flask est déjà importé, mais rappelé ici pour clarté
 from prometheus_client import generate_latest, Counter, Histogram, Gauge, REGISTRY
-import time # Pour simuler la latence si nécessaire et mesurer
+from metrics import track_stage
+
+# --- DÉFINITION DES MÉTRIQUES PROMETHEUS ---
+# Compteur pour le nombre total de requêtes à l'API de prédiction One-Class SVM
+OCSVM_PREDICT_REQUESTS_TOTAL = Counter(
+    'ocsvm_predict_requests_total', 'Total requests to the One-Class SVM /predict endpoint'
+)
+# Histogramme pour la latence de l'opération de prédiction One-Class SVM
+OCSVM_PREDICT_LATENCY_SECONDS = Histogram(
+    'ocsvm_predict_latency_seconds', 'Latency of One-Class SVM prediction in seconds'
+)
+# Compteur pour le nombre d'erreurs lors de la prédiction One-Class SVM
+OCSVM_PREDICT_ERRORS_TOTAL = Counter(
+    'ocsvm_predict_errors_total', 'Total errors during One-Class SVM prediction'
+)
+# Jauge pour le nombre d'anomalies détectées lors de la dernière exécution (à mettre à jour)
+OCSVM_LAST_ANOMALIES_COUNT = Gauge(
+    'ocsvm_last_anomalies_count', 'Number of anomalies detected in the last One-Class SVM run'
+)
+# Jauge pour la proportion d'anomalies détectées lors de la dernière exécution
+OCSVM_LAST_ANOMALIES_PERCENT = Gauge(
+    'ocsvm_last_anomalies_percent', 'Percentage of anomalies detected in the last One-Class SVM run'
+)
+# Histogramme pour la durée d'entraînement du modèle One-Class SVM
+OCSVM_TRAINING_LATENCY_SECONDS = Histogram(
+    'ocsvm_training_latency_seconds', 'Latency of One-Class SVM model training in seconds'
+)
+
 
 # --- 1. Load & Prepare Data ---
 print("Chargement et nettoyage des données...")
@@ -69,11 +103,9 @@ except Exception as e:
 # Définition d'une dimension de vecteur attendue (par exemple, 300 pour spaCy)
 EXPECTED_VECTOR_DIM = 300
 
-def safe_vectorize(row_data):
-    """Vectorise une ligne de log en joignant ses éléments et gère les erreurs."""
+def safe_vectorize(log_text):
+    """Vectorise le texte d'une ligne de log (voir row_texts) et gère les erreurs."""
     try:
-        # Convertit tous les éléments de la ligne en string et les joint avec un espace
-        log_text = " ".join(map(str, row_data))
         if not log_text.strip(): # Vérifie si le texte est vide ou juste des espaces
              print("Warning: Ligne de log vide rencontrée, retourne un vecteur nul.")
              return np.zeros(EXPECTED_VECTOR_DIM)
@@ -88,25 +120,69 @@ def safe_vectorize(row_data):
         return vector
     except Exception as e:
         # Affiche l'erreur et le début du log problématique pour le débogage
-        log_text_preview = " ".join(map(str, row_data))[:100] # Aperçu du log
-        print(f"Echec de la vectorisation pour le log : '{log_text_preview}...' - Erreur : {e}")
+        print(f"Echec de la vectorisation pour le log : '{log_text[:100]}...' - Erreur : {e}")
         # Retourne un vecteur de zéros de la dimension attendue en cas d'échec
         return np.zeros(EXPECTED_VECTOR_DIM)
 
-print("Vectorisation des logs (utilisation des features uniquement)...")
-# Applique la vectorisation sécurisée à chaque ligne du DataFrame de features
-# .values retourne un NumPy array des valeurs du DataFrame, itérer dessus est efficace
-log_vectors = [safe_vectorize(row) for row in features_df.values]
+def vectorize_rows(rows_df):
+    """
+    Vectorise le texte de toutes les lignes en un seul appel par lots (nlp.pipe) ; en cas d'échec
+    du lot, repasse ligne par ligne avec safe_vectorize pour isoler les logs problématiques.
+    """
+    texts = row_texts(rows_df)
+    try:
+        return np.asarray(get_log_vectors(texts))
+    except Exception as e:
+        print(f"Echec de la vectorisation par lots, vectorisation ligne par ligne - Erreur : {e}")
+        return np.array([safe_vectorize(text) for text in texts])
+
+# Lignes distinctes : chaque ligne unique n'est vectorisée et scorée qu'une fois
+dedup = RowDedup.from_frame(features_df) if LOG_DEDUP else None
+if dedup is not None:
+    print(f"Dédoublonnage : {dedup.summary()}")
+# Groupes de quasi-doublons (MinHash + LSH) : l'entraînement ne voit qu'un représentant pondéré par groupe
+near_groups = near_dedup(features_df) if LOG_NEAR_DEDUP else None
+if near_groups is not None:
+    print(f"Quasi-doublons (seuil {LOG_NEAR_DEDUP_THRESHOLD}) : {near_groups.n_unique} groupes sur {near_groups.n_rows} lignes")
+
+structured_encoder = None
+if LOG_STRUCTURED_FEATURES:
+    # Champs ECS numériques et catégoriels encodés directement, le reste de la ligne vectorisé comme texte
+    print("Vectorisation des logs (champs ECS structurés + texte)...")
+    # L'encodeur appris est gardé pour transformer les lignes du predict de la même façon
+    X, structured_encoder = get_row_features(df)
+else:
+    # Si le service Spacy a écrit le stock de features (FEATURE_STORE_PATH), l'ouvrir en memmap sans copie
+    # (seulement s'il a été construit sur ce même fichier, avec le même texte de ligne que le predict)
+    X = load_features(features_df.index, text="row", source="logs.csv")
+if X is None:
+    print("Vectorisation des logs (utilisation des features uniquement)...")
+    # Applique la vectorisation sécurisée au texte de chaque ligne du DataFrame de features
+    # ("champ=valeur" des champs renseignés, identique au predict ; textes répétés vectorisés une fois)
+    log_vectors = vectorize_rows(features_df)
+
+    # Vérification post-vectorisation
+    if not len(log_vectors):
+        print("Erreur : La vectorisation n'a produit aucun vecteur.")
+        sys.exit(1)
 
-# Vérification post-vectorisation
-if not log_vectors:
-    print("Erreur : La vectorisation n'a produit aucun vecteur.")
-    sys.exit(1)
+    # Convertit la liste de vecteurs en un array NumPy pour scikit-learn
+    # C'est la variable 'X' qui sera utilisée pour l'entraînement et la prédiction
+    X = np.array(log_vectors)
+# Précision des vecteurs donnés au modèle (VECTOR_PRECISION : float32, float16 ou int8 quantifié) ;
+# en int8, les échelles de l'entraînement sont gardées avec le modèle et réutilisées au predict
+model_scales = input_scales(X, VECTOR_PRECISION)
+X = as_model_input(X, VECTOR_PRECISION, model_scales)
+
+def predict_features(rows_df):
+    """Features de nouvelles lignes, construites comme à l'entraînement (même encodeur appris, même précision)."""
+    if structured_encoder is not None:
+        X_rows, _ = get_row_features(rows_df, encoder=structured_encoder)
+    else:
+        X_rows = vectorize_rows(rows_df)
+    return as_model_input(np.asarray(X_rows), VECTOR_PRECISION, model_scales)
 
-# Convertit la liste de vecteurs en un array NumPy pour scikit-learn
-# C'est la variable 'X' qui sera utilisée pour l'entraînement et la prédiction
-X = np.array(log_vectors)
-print(f"Vectorisation terminée. Shape de la matrice de vecteurs (X) : {X.shape}")
+print(f"Vectorisation terminée. Shape de la matrice de vecteurs (X) : {X.shape}, type {X.dtype}")
 
 # Vérifie si la matrice X contient des NaNs ou des infinis qui peuvent poser problème
 if np.isnan(X).any() or np.isinf(X).any():
@@ -120,9 +196,27 @@ if np.isnan(X).any() or np.isinf(X).any():
 # --- 3. Standardization ---
 # Standardise les features (vecteurs) pour que le modèle SVM fonctionne mieux
 print("Standardisation des vecteurs de features...")
+# Par blocs de lignes : X peut être le stock de features en memmap, fit_transform en ferait une
+# copie complète de plus
+OCSVM_SCALE_CHUNK_ROWS = int(os.getenv('OCSVM_SCALE_CHUNK_ROWS', '65536'))
 scaler = StandardScaler()
-# Fitte le scaler sur les données ET les transforme en une seule étape
-X_scaled = scaler.fit_transform(X)
+# Moyenne et variance apprises bloc par bloc
+for start in range(0, X.shape[0], OCSVM_SCALE_CHUNK_ROWS):
+    scaler.partial_fit(X[start:start + OCSVM_SCALE_CHUNK_ROWS])
+
+def scale(X):
+    """
+    Standardise X bloc par bloc dans une seule matrice float64. L'OCSVM (libsvm) a besoin de toutes
+    les lignes en mémoire en float64 : les écrire directement dans ce type évite que fit, predict et
+    decision_function en refassent une copie.
+    """
+    X_scaled = np.empty(X.shape, dtype=np.float64)
+    for start in range(0, X.shape[0], OCSVM_SCALE_CHUNK_ROWS):
+        chunk = np.asarray(X[start:start + OCSVM_SCALE_CHUNK_ROWS], dtype=np.float64)
+        X_scaled[start:start + OCSVM_SCALE_CHUNK_ROWS] = scaler.transform(chunk)
+    return X_scaled
+
+X_scaled = scale(X)
 print(f"Standardisation terminée. Shape des données standardisées : {X_scaled.shape}")
 
 # --- 4. Train One-Class SVM ---
@@ -137,7 +231,15 @@ print("Entraînement du modèle One-Class SVM...")
 #       Une valeur typique est entre 0.01 et 0.1 (ici 0.05 = 5% d'anomalies attendues).
 model = OneClassSVM(kernel='rbf', gamma='scale', nu=0.1) # gamma='scale' est souvent un bon point de départ
 try:
-    model.fit(X_scaled)
+    with OCSVM_TRAINING_LATENCY_SECONDS.time(), track_stage('ocsvm_train', rows=len(X_scaled)):
+        if near_groups is not None:
+            # Un représentant par groupe de quasi-doublons, pondéré par la taille du groupe
+            model.fit(near_groups.unique(X_scaled), sample_weight=near_groups.counts)
+        elif dedup is not None and LOG_DEDUP_SAMPLE_WEIGHTS:
+            # Lignes uniques pondérées par leur nombre d'occurrences au lieu des lignes répétées
+            model.fit(dedup.unique(X_scaled), sample_weight=dedup.counts)
+        else:
+            model.fit(X_scaled)
     print("Entraînement terminé.")
 except Exception as e:
     print(f"Erreur lors de l'entraînement du modèle SVM : {e}")
@@ -148,13 +250,20 @@ except Exception as e:
 # (ce qui est standard pour la détection d'anomalies non supervisée comme One-Class SVM)
 print("Prédiction des labels...")
 # .predict() retourne 1 pour les inliers (normaux) et -1 pour les outliers (anomalies)
-y_pred_numeric = model.predict(X_scaled)
+with track_stage('ocsvm_score', rows=len(X_scaled)):
+    if dedup is not None:
+        # La prédiction d'une ligne ne dépend que de la ligne : les doublons reçoivent celle de leur ligne unique
+        y_pred_numeric = dedup.scatter(model.predict(dedup.unique(X_scaled)), stage='ocsvm_score')
+    else:
+        y_pred_numeric = model.predict(X_scaled)
 
 # Mappe les sorties numériques (-1, 1) vers des labels textuels ("abnormal", "normal")
 # Cette étape est cruciale pour pouvoir comparer avec 'true_labels' qui sont probablement textuels.
 # Assurez-vous que "abnormal" correspond à -1 (outlier) et "normal" à 1 (inlier).
 y_pred_labels = ["abnormal" if p == -1 else "normal" for p in y_pred_numeric]
 print("Mapping des prédictions terminé.")
+OCSVM_LAST_ANOMALIES_COUNT.set(y_pred_labels.count("abnormal"))
+OCSVM_LAST_ANOMALIES_PERCENT.set(100 * y_pred_labels.count("abnormal") / len(y_pred_labels) if y_pred_labels else 0)
 
 # --- 6. Scientific Comparison (Revised Approach) ---
 # Faire une comparaison en analysant comment les prédictions binaires
@@ -264,7 +373,10 @@ print("\nScript terminé avec succès.")
 print("\nCalcul des scores de décision One-Class SVM...")
 try:
     # Utilise les données standardisées qui ont été utilisées pour la prédiction
-    ocsvm_decision_scores = model.decision_function(X_scaled)
+    if dedup is not None:
+        ocsvm_decision_scores = dedup.scatter(model.decision_function(dedup.unique(X_scaled)))
+    else:
+        ocsvm_decision_scores = model.decision_function(X_scaled)
     print("Scores de décision OCSVM calculés.")
 except Exception as e:
     print(f"Erreur lors du calcul des scores de décision OCSVM : {e}")
@@ -280,15 +392,20 @@ original_indices = features_df.index
 
 # Créez un DataFrame avec les informations nécessaires pour le dashboard
 # Incluez l'index original, le score, la prédiction, et les vrais labels
-results_ocsvm_df = pd.DataFrame({
-    'original_index': original_indices,
-    'ocsvm_score': ocsvm_decision_scores, # Score de décision One-Class SVM
-    'ocsvm_prediction': y_pred_labels, # Prédiction 'normal'/'abnormal' OCSVM (chaîne)
-    'severity_unified_original': true_labels, # Vrai label original (string)
-    # Pour la cohérence, convertissons aussi le vrai label en binaire ici
-    'severity_unified_binary': [1 if str(val).lower() in ['abnormal', 'anomaly', 'critical', 'error'] else 0
-                                for val in true_labels]
-})
+def results_frame(original_indices, scores, predictions, severities):
+    """Lignes du CSV du dashboard (entraînement et /predict/tail)"""
+    severities = list(severities)
+    return pd.DataFrame({
+        'original_index': original_indices,
+        'ocsvm_score': scores, # Score de décision One-Class SVM
+        'ocsvm_prediction': predictions, # Prédiction 'normal'/'abnormal' OCSVM (chaîne)
+        'severity_unified_original': severities, # Vrai label original (string)
+        # Pour la cohérence, convertissons aussi le vrai label en binaire ici
+        'severity_unified_binary': [1 if str(val).lower() in ['abnormal', 'anomaly', 'critical', 'error'] else 0
+                                    for val in severities]
+    })
+
+results_ocsvm_df = results_frame(original_indices, ocsvm_decision_scores, y_pred_labels, true_labels)
 
 # Définir le nom du fichier de sortie
 output_filename_ocsvm = "one_class_svm_results_for_dashboard.csv"
@@ -300,66 +417,93 @@ try:
 except Exception as e:
     print(f"Erreur lors de la sauvegarde des résultats One-Class SVM : {e}")
 
+# --- 9. Point de reprise de l'ingestion incrémentale ---
+# Les lignes de logs.csv scorées ci-dessus ne sont pas relues : /predict/tail ne score ensuite que
+# les lignes ajoutées au fichier (point de reprise propre à ce détecteur)
+OCSVM_CHECKPOINT_DIR = os.path.join(SPACY_CHECKPOINT_DIR, 'one_class_svm')
+try:
+    save_checkpoint("logs.csv", end_checkpoint("logs.csv", len(df)), OCSVM_CHECKPOINT_DIR)
+except Exception as e:
+    print(f"Erreur lors de l'enregistrement du point de reprise : {e}")
+
 
 from flask import Flask, request, jsonify
 
 # Initialiser Flask
 app = Flask(__name__)
 
-# --- DÉFINITION DES MÉTRIQUES PROMETHEUS ---
-# Compteur pour le nombre total de requêtes à l'API de prédiction One-Class SVM
-OCSVM_PREDICT_REQUESTS_TOTAL = Counter(
-    'ocsvm_predict_requests_total', 'Total requests to the One-Class SVM /predict endpoint'
-)
-# Histogramme pour la latence de l'opération de prédiction One-Class SVM
-OCSVM_PREDICT_LATENCY_SECONDS = Histogram(
-    'ocsvm_predict_latency_seconds', 'Latency of One-Class SVM prediction in seconds'
-)
-# Compteur pour le nombre d'erreurs lors de la prédiction One-Class SVM
-OCSVM_PREDICT_ERRORS_TOTAL = Counter(
-    'ocsvm_predict_errors_total', 'Total errors during One-Class SVM prediction'
-)
-# Jauge pour le nombre d'anomalies détectées lors de la dernière exécution (à mettre à jour)
-OCSVM_LAST_ANOMALIES_COUNT = Gauge(
-    'ocsvm_last_anomalies_count', 'Number of anomalies detected in the last One-Class SVM run'
-)
-# Jauge pour la proportion d'anomalies détectées lors de la dernière exécution
-OCSVM_LAST_ANOMALIES_PERCENT = Gauge(
-    'ocsvm_last_anomalies_percent', 'Percentage of anomalies detected in the last One-Class SVM run'
-)
-# Histogramme pour la durée d'entraînement du modèle One-Class SVM
-OCSVM_TRAINING_LATENCY_SECONDS = Histogram(
-    'ocsvm_training_latency_seconds', 'Latency of One-Class SVM model training in seconds'
-)
-
 @app.route('/predict', methods=['POST'])
 def predict():
     # Récupérer les données envoyées par le client
     data = request.json
     logs_file = data.get("logs.csv", None)  # Nom du fichier CSV contenant les logs
     
+    OCSVM_PREDICT_REQUESTS_TOTAL.inc()
     if not logs_file:
         return jsonify({"error": "No logs file provided"}), 400
     
     try:
-        # Appeler votre fonction clean() avec le fichier CSV
-        df = clean(logs.csv)
-        
-        # Extraire les vecteurs pour chaque log
-        log_vectors = [safe_vectorize(row) for row in df.iloc[:, :-1].values]
-        X = np.array(log_vectors)
-        
-        # Standardiser les données
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Faire des prédictions avec le modèle One-Class SVM
-        y_pred = model.predict(X_scaled)
-        y_pred_labels = ["abnormal" if p == -1 else "normal" for p in y_pred]
+        with OCSVM_PREDICT_LATENCY_SECONDS.time():
+            # Appeler votre fonction clean() avec le fichier CSV
+            df = clean(logs_file)
+            
+            # Extraire les vecteurs de chaque ligne distincte, à partir du même texte de ligne qu'à l'entraînement
+            request_dedup = RowDedup.from_frame(df) if LOG_DEDUP else None
+            rows_df = request_dedup.unique(df) if request_dedup is not None else df
+            X = predict_features(rows_df)
+            
+            # Standardiser les données avec le scaler appris à l'entraînement
+            X_scaled = scale(X)
+            
+            # Faire des prédictions avec le modèle One-Class SVM (une fois par ligne distincte)
+            with track_stage('ocsvm_score', rows=len(df)):
+                y_pred = model.predict(X_scaled)
+                if request_dedup is not None:
+                    y_pred = request_dedup.scatter(y_pred, stage='ocsvm_score')
+            y_pred_labels = ["abnormal" if p == -1 else "normal" for p in y_pred]
         
         # Retourner les prédictions sous forme JSON
         return jsonify({"predictions": y_pred_labels})
     except Exception as e:
+        OCSVM_PREDICT_ERRORS_TOTAL.inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/predict/tail', methods=['POST'])
+def predict_tail():
+    """
+    Ingestion incrémentale : score avec le modèle déjà entraîné uniquement les lignes ajoutées à
+    logs.csv depuis l'entraînement (ou le dernier appel) et les ajoute au CSV du dashboard.
+    """
+    OCSVM_PREDICT_REQUESTS_TOTAL.inc()
+    try:
+        # Verrou de la lecture du point de reprise à son enregistrement : deux appels concurrents
+        # ne scorent jamais le même delta
+        with OCSVM_PREDICT_LATENCY_SECONDS.time(), checkpoint_lock("logs.csv", OCSVM_CHECKPOINT_DIR):
+            delta, checkpoint = read_tail("logs.csv", load_checkpoint("logs.csv", OCSVM_CHECKPOINT_DIR))
+            y_pred_labels = []
+            if len(delta):
+                # Mêmes valeurs que clean() (mode compact compris)
+                if SPACY_CLEAN_COMPACT:
+                    delta = compact_frame(delta)
+                request_dedup = RowDedup.from_frame(delta) if LOG_DEDUP else None
+                rows_df = request_dedup.unique(delta) if request_dedup is not None else delta
+                X_scaled = scale(predict_features(rows_df))
+                with track_stage('ocsvm_score', rows=len(delta)):
+                    scores = model.decision_function(X_scaled)
+                    if request_dedup is not None:
+                        scores = request_dedup.scatter(scores, stage='ocsvm_score')
+                # Même règle que model.predict : anomalie si le score est négatif
+                y_pred_labels = ["abnormal" if score < 0 else "normal" for score in scores]
+                # Fichier remplacé ou tronqué : read_tail repart de la première ligne, le CSV du dashboard aussi
+                restart = delta.index.start == 0
+                results_frame(delta.index, scores, y_pred_labels, delta[SEVERITY_COLUMN]).to_csv(
+                    output_filename_ocsvm, mode='w' if restart else 'a', header=restart, index=False)
+            save_checkpoint("logs.csv", checkpoint, OCSVM_CHECKPOINT_DIR)
+        
+        # Les lignes du delta sont numérotées à la suite des lignes déjà scorées (original_index)
+        return jsonify({"row_start": int(delta.index.start), "row_count": len(delta), "predictions": y_pred_labels})
+    except Exception as e:
+        OCSVM_PREDICT_ERRORS_TOTAL.inc()
         return jsonify({"error": str(e)}), 500
 
 @app.route('/metrics')
@@ -1,3 +1,12 @@
+import argparse
+import contextlib
+import sys
+
+import spacy
+import pandas as pd
+
+from annotator import ANNOTATIONS, annotate, parse_annotations, pipeline_components, write_jsonl
+
 '''
 import spacy
 import pandas as pd
@@ -107,9 +116,6 @@ if __name__ == "__main__":
 
 
 
-import spacy
-import pandas as pd
-
 def clean(title):
     # Lire le fichier CSV en ignorant les lignes mal formées
     df = pd.read_csv(title, sep=",", header=None, on_bad_lines='skip')
@@ -191,55 +197,32 @@ def clean(title):
     
     return df
 
-def main():
-    # Charger le modèle spaCy avec vecteurs Word2Vec
-    nlp = spacy.load("en_core_web_md")
-
-    # Nettoyer et préparer le DataFrame de logs
-    df = clean("logs.csv")
-
-    # Parcourir chaque log dans la colonne 'message'
-    for text in df['message']:
-        # Analyser chaque log avec spaCy. Cela crée un objet 'doc' contenant toutes les informations NLP.
-        doc = nlp(text)
-
-        # Afficher le texte du log que nous analysons
-        print(f"\nTexte : {text}")
-
-        # === Named Entity Recognition ===
-        # Identifier et afficher les entités nommées (dates, IP, noms…)
-        for ent in doc.ents:
-            print(f" - Entité : {ent.text} | Type : {ent.label_}")
-
-        # === Tokenisation ===
-        print("\n=== [Tokenisation] ===")
-        for token in doc:
-            print(f"Token: {token.text}")
-
-        # === Part-of-Speech Tagging ===
-        print("\n=== [Part-of-Speech Tagging] ===")
-        for token in doc:
-            print(f"Token: {token.text} | POS: {token.pos_} | Lemma: {token.lemma_}")
-
-        # === Dependency Parsing ===
-        print("\n=== [Dependency Parsing] ===")
-        for token in doc:
-            print(f"Mot: {token.text} | Rôle: {token.dep_} | Attaché à: {token.head.text}")
-
-        # === Word2Vec Embedding ===
-        print("\n=== [Word2Vec Embedding] ===")
-        if doc.vector_norm:  # Vérifie si des vecteurs sont disponibles
-            print(f"Vecteur du document (taille {len(doc.vector)}):")
-            print(doc.vector)
-        else:
-            print("Aucun vecteur disponible avec ce modèle pour le texte donné.")
-
-        # Exemple : similarité entre les deux premiers tokens
-        if len(doc) >= 2 and doc[0].has_vector and doc[1].has_vector:
-            sim = doc[0].similarity(doc[1])  # Mesure de similarité
-            print(f"\nSimilarité entre '{doc[0].text}' et '{doc[1].text}' : {sim:.3f}")
-        else:
-            print("Impossible de comparer des tokens : vecteurs non disponibles.")
+def main(argv=None):
+    # Analyse NLP structurée des logs, écrite en JSONL (un enregistrement par log) ; seuls les
+    # composants spaCy nécessaires aux annotations demandées sont exécutés, par lots
+    parser = argparse.ArgumentParser(description="Analyse NLP des logs (entités, lemmes, POS, dépendances) en JSONL")
+    parser.add_argument("--annotations", default=",".join(ANNOTATIONS),
+                        help=f"Annotations à produire, séparées par des virgules ({', '.join(ANNOTATIONS)})")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs à analyser")
+    parser.add_argument("--output", default="-", help="Fichier JSONL de sortie (- pour la sortie standard)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Taille des lots nlp.pipe")
+    args = parser.parse_args(argv)
+
+    try:
+        annotations = parse_annotations(args.annotations)
+        pipeline_components(annotations)
+    except ValueError as e:
+        parser.error(str(e))
+    # clean() affiche un aperçu du DataFrame : ne pas le mêler au JSONL de la sortie standard
+    with contextlib.redirect_stdout(sys.stderr):
+        df = clean(args.logs)
+    records = annotate(df['message'].tolist(), annotations, batch_size=args.batch_size, ids=df.index.tolist())
+    if args.output == "-":
+        count = write_jsonl(records, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            count = write_jsonl(records, f)
+    print(f"{count} logs analysés ({', '.join(annotations)})", file=sys.stderr)
 
 def get_log_vectors(logs):
     # Fonction utilitaire pour obtenir les vecteurs de chaque log
@@ -1,8 +1,28 @@
-from flask import Flask, request, jsonify, Response
-import spacy
+from flask import Flask, request, jsonify, Response, send_file, stream_with_context
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import numpy as np
 import pandas as pd
 
-from prometheus_client import generate_latest, Counter, Histogram, Gauge, REGISTRY  
+from vectorizer import vectorize, iter_vectors, model_loaded, vector_dim, vectorizer_version, warm_up
+from features import clean, get_log_vectors, row_text_config, row_texts
+from feature_store import FEATURE_STORE_PATH, FeatureStream
+from log_loader import (SPACY_CLEAN_COMPACT, checkpoint_lock, compact_frame, estimate_rows, iter_clean,
+                        iter_upload_texts, load_checkpoint, read_tail, save_checkpoint, source_fingerprint)
+from annotator import ANNOTATIONS, annotate, parse_annotations, pipeline_components, write_jsonl
+from log_entities import ENTITY_TYPES, entity_frame, extract_entities
+from metrics import track_stage
+from jobs import SPACY_JOB_CHUNK_ROWS, cancel_job, job_status, list_jobs, result_path, submit_job
+from templates import mine_templates, template_text
+from wire_format import JSON_MIMETYPE, NPY_MIMETYPE, compress, encode_vectors, supported_encodings, supported_mimetypes
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from prometheus_client import generate_latest, Counter, Histogram, Gauge, REGISTRY, CollectorRegistry, multiprocess
 import time # Pour simuler la latence si nécessaire et mesurer
 
 # --- DÉFINITION DES MÉTRIQUES PROMETHEUS ---
@@ -20,180 +40,491 @@ SPACY_VECTORIZE_ERRORS_TOTAL = Counter(
 )
 # Jauge pour indiquer si le modèle spaCy est chargé (1 si oui, 0 si non)
 SPACY_MODEL_LOADED = Gauge(
-    'spacy_model_loaded', 'Status of the spaCy model (1=loaded, 0=not loaded)'
+    'spacy_model_loaded', 'Status of the spaCy model (1=loaded, 0=not loaded)', multiprocess_mode='max'
 )
-# Compteur pour le nombre de lignes nettoyées par la fonction clean
-SPACY_CLEANED_ROWS_TOTAL = Counter(
-    'spacy_cleaned_rows_total', 'Total number of rows processed by clean function'
+# Le modèle est chargé à la demande : la jauge lit son état au moment du scrape
+SPACY_MODEL_LOADED.set_function(lambda: 1 if model_loaded() else 0)
+# Jauge pour la durée du démarrage (chargement du modèle + préchauffage)
+SPACY_STARTUP_DURATION_SECONDS = Gauge(
+    'spacy_startup_duration_seconds', 'Duration of the spaCy model load and warm-up at startup in seconds',
+    multiprocess_mode='max'
 )
+
+# Charger et préchauffer le vectoriseur au démarrage du service (0 pour un chargement au premier appel)
+SPACY_PRELOAD = os.getenv('SPACY_PRELOAD', '1') == '1'
+
+# Taille des blocs lus dans le corps d'une requête (upload CSV)
+SPACY_UPLOAD_READ_BYTES = int(os.getenv('SPACY_UPLOAD_READ_BYTES', str(256 * 1024)))
+# Types de contenu acceptés pour un upload CSV brut
+CSV_MIMETYPES = ("text/csv", "application/csv")
+
+# État du démarrage, lu par /readyz et /healthz
+_startup = {"ready": False, "error": None, "seconds": None}
+
 app = Flask(__name__)
 
-def clean(title):
-    # Lire le fichier CSV en ignorant les lignes mal formées
-    df = pd.read_csv(title, sep=",", header=None, on_bad_lines='skip')
-    # Supprimer les colonnes complètement vides
-    df.dropna(axis=1, how='all', inplace=True)
-    # Utiliser la première ligne comme noms de colonnes
-    df.columns = df.iloc[0]
-    # Supprimer cette ligne d'en-tête des données
-    df = df[1:].reset_index(drop=True)
-    
-    # Liste des colonnes importantes à conserver
-    colonnes_importantes = [
-        '@timestamp', '_score', 'agent.hostname', 'agent.name', 'agent.name.text', 'agent.type', 'agent.version',
-        'cisco.ios.facility', 'cisco.ios.message_count', 'client.address', 'component.binary',
-        'component.dataset', 'component.id', 'component.type', 'container.id', 'data_stream.dataset',
-        'data_stream.namespace', 'data_stream.type', 'destination.bytes', 'destination.ip',
-        'destination.mac', 'destination.packets', 'destination.port', 'ecs.version', 'elastic.agent.id',
-        'elastic_agent.id', 'elastic_agent.snapshot', 'elastic_agent.version', 'error.message',
-        'error.type', 'event.agent_id_status', 'event.code', 'event.created', 'event.dataset',
-        'event.duration', 'event.end', 'event.id', 'event.ingested', 'event.kind', 'event.module',
-        'event.provider', 'event.sequence', 'event.start', 'event.timezone', 'file.Ext.entropy',
-        'file.Ext.header_bytes', 'file.extension', 'file.name', 'host.containerized', 'host.domain',
-        'host.hostname', 'host.id', 'host.ip', 'host.mac', 'host.name', 'host.name.text',
-        'host.os.Ext.variant', 'host.os.build', 'host.os.codename', 'host.os.family',
-        'host.os.full', 'host.os.full.caseless', 'host.os.full.text', 'host.os.kernel',
-        'host.os.name', 'host.os.name.caseless', 'host.os.name.text', 'host.os.platform',
-        'host.os.type', 'host.os.version', 'http.request.body.bytes', 'http.request.id',
-        'http.request.method', 'http.response.body.bytes', 'http.response.status_code', 'http.version',
-        'id', 'input.type', 'log.file.device_id', 'log.file.idxhi', 'log.file.idxlo',
-        'log.file.inode', 'log.file.path', 'log.file.vol', 'log.logger', 'log.offset',
-        'log.origin.file.line', 'log.origin.file.name', 'log.origin.function', 'log.source',
-        'log.source.address', 'log.syslog.priority', 'message', 'network.bytes', 'network.community_id',
-        'network.direction', 'network.iana_number', 'network.packets', 'network.transport',
-        'network.type', 'network_traffic.flow.final', 'network_traffic.flow.id', 'observer.product',
-        'observer.type', 'observer.vendor', 'process.Ext.code_signature',
-        'process.code_signature.exists', 'process.code_signature.status',
-        'process.code_signature.subject_name', 'process.code_signature.trusted', 'process.entity_id',
-        'process.executable', 'process.executable.caseless', 'process.executable.text',
-        'process.name', 'process.name.caseless', 'process.name.text', 'process.parent.pid',
-        'process.pid', 'process.thread.id', 'related.ip', 'related.user', 'server.address',
-        'service.name', 'service.type', 'source.bytes', 'source.ip', 'source.mac',
-        'source.packets', 'source.port', 'state', 'syslog.facility', 'syslog.facility_label',
-        'syslog.priority', 'tags', 'tls.established', 'url.full', 'url.full.text',
-        'user.domain', 'user.id', 'user.name', 'user.name.text', 'winlog.activity_id',
-        'winlog.api', 'winlog.channel', 'winlog.computer_name', 'winlog.event_data.AccessList',
-        'winlog.event_data.AccessListDescription', 'winlog.event_data.AccessMask',
-        'winlog.event_data.AccessMaskDescription', 'winlog.event_data.AuthenticationPackageName',
-        'winlog.event_data.Binary', 'winlog.event_data.Direction', 'winlog.event_data.ElevatedToken',
-        'winlog.event_data.FilterRTID', 'winlog.event_data.HandleId', 'winlog.event_data.KeyLength',
-        'winlog.event_data.LayerName', 'winlog.event_data.LayerNameDescription',
-        'winlog.event_data.LayerRTID', 'winlog.event_data.LogonProcessName',
-        'winlog.event_data.LogonType', 'winlog.event_data.ObjectName',
-        'winlog.event_data.ObjectServer', 'winlog.event_data.ObjectType',
-        'winlog.event_data.PrivilegeList', 'winlog.event_data.ProcessID',
-        'winlog.event_data.ProcessId', 'winlog.event_data.ProcessName',
-        'winlog.event_data.Protocol', 'winlog.event_data.RemoteMachineDescription',
-        'winlog.event_data.RemoteMachineID', 'winlog.event_data.RemoteUserDescription',
-        'winlog.event_data.RemoteUserID', 'winlog.event_data.RestrictedSidCount',
-        'winlog.event_data.SourceHandleId', 'winlog.event_data.SourceProcessId',
-        'winlog.event_data.SubjectDomainName', 'winlog.event_data.SubjectLogonId',
-        'winlog.event_data.SubjectUserName', 'winlog.event_data.SubjectUserSid',
-        'winlog.event_data.TargetDomainName', 'winlog.event_data.TargetHandleId',
-        'winlog.event_data.TargetLinkedLogonId', 'winlog.event_data.TargetLogonId',
-        'winlog.event_data.TargetProcessId', 'winlog.event_data.TargetUserName',
-        'winlog.event_data.TargetUserSid', 'winlog.event_data.VirtualAccount',
-        'winlog.event_data.param1', 'winlog.event_data.param2', 'winlog.event_id',
-        'winlog.keywords', 'winlog.logon.id', 'winlog.logon.type', 'winlog.opcode',
-        'winlog.process.pid', 'winlog.process.thread.id', 'winlog.provider_name',
-        'winlog.record_id', 'winlog.task', 'event.severity', 'event.category',
-        'event.type', 'event.action', 'syslog.severity_label', 'log.level'
-    ]
-    
-    # Fusionner log.level et syslog.severity_label dans une seule colonne
-    df['severity_unified'] = df['log.level'].where(df['log.level'] != '-', df['syslog.severity_label'])
-    
-    # Affichage des 200 premières lignes des colonnes importantes + la nouvelle colonne
-    colonnes_affichage = colonnes_importantes + ['severity_unified']
-    print(df[colonnes_affichage].head(70))
-    
-    return df
-
-def main():
-    # Charger le modèle spaCy avec vecteurs Word2Vec
-    nlp = spacy.load("en_core_web_md")
-
-    # Nettoyer et préparer le DataFrame de logs
-    df = clean("logs.csv")
-
-    # Parcourir chaque log dans la colonne 'message'
-    for text in df['message']:
-        # Analyser chaque log avec spaCy. Cela crée un objet 'doc' contenant toutes les informations NLP.
-        doc = nlp(text)
-
-        # Afficher le texte du log que nous analysons
-        print(f"\nTexte : {text}")
-
-        # === Named Entity Recognition ===
-        # Identifier et afficher les entités nommées (dates, IP, noms…)
-        for ent in doc.ents:
-            print(f" - Entité : {ent.text} | Type : {ent.label_}")
-
-        # === Tokenisation ===
-        print("\n=== [Tokenisation] ===")
-        for token in doc:
-            print(f"Token: {token.text}")
-
-        # === Part-of-Speech Tagging ===
-        print("\n=== [Part-of-Speech Tagging] ===")
-        for token in doc:
-            print(f"Token: {token.text} | POS: {token.pos_} | Lemma: {token.lemma_}")
-
-        # === Dependency Parsing ===
-        print("\n=== [Dependency Parsing] ===")
-        for token in doc:
-            print(f"Mot: {token.text} | Rôle: {token.dep_} | Attaché à: {token.head.text}")
-
-        # === Word2Vec Embedding ===
-        print("\n=== [Word2Vec Embedding] ===")
-        if doc.vector_norm:  # Vérifie si des vecteurs sont disponibles
-            print(f"Vecteur du document (taille {len(doc.vector)}):")
-            print(doc.vector)
-        else:
-            print("Aucun vecteur disponible avec ce modèle pour le texte donné.")
+def main(argv=None):
+    # Sans argument : lance le service. Avec --analyze : analyse NLP d'un fichier de logs en ligne
+    # de commande, résultats structurés écrits en JSONL (un enregistrement par log)
+    parser = argparse.ArgumentParser(description="Service Spacy / analyse NLP des logs en JSONL")
+    parser.add_argument("--analyze", metavar="ANNOTATIONS", nargs="?", const=",".join(ANNOTATIONS), default=None,
+                        help=f"Annotations à produire, séparées par des virgules ({', '.join(ANNOTATIONS)} ; toutes par défaut)")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs à analyser")
+    parser.add_argument("--column", default="message", help="Colonne analysée")
+    parser.add_argument("--output", default="-", help="Fichier JSONL de sortie (- pour la sortie standard)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Taille des lots nlp.pipe")
+    args = parser.parse_args(argv)
+
+    if args.analyze is None:
+        serve()
+        return
+
+    try:
+        annotations = parse_annotations(args.analyze)
+        pipeline_components(annotations)
+    except ValueError as e:
+        parser.error(str(e))
+    # clean() affiche un aperçu du DataFrame : ne pas le mêler au JSONL de la sortie standard
+    with contextlib.redirect_stdout(sys.stderr):
+        df = clean(args.logs)
+    start = time.perf_counter()
+    records = annotate(df[args.column].tolist(), annotations, batch_size=args.batch_size, ids=df.index.tolist())
+    if args.output == "-":
+        count = write_jsonl(records, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            count = write_jsonl(records, f)
+    elapsed = time.perf_counter() - start
+    print(f"{count} logs analysés ({', '.join(annotations)}) en {elapsed:.1f} s", file=sys.stderr)
+
+def build_feature_store(logs_file, path, text="message", batch_size=None, chunk_rows=100000, progress=None):
+    # Lit, nettoie et vectorise le fichier bloc par bloc (iter_clean) et écrit la matrice float32
+    # (.npy) + métadonnées (.json) au fil des blocs : ni le DataFrame complet ni la matrice ne sont
+    # gardés en mémoire. progress(lignes traitées, total estimé) est appelée après chaque bloc de
+    # chunk_rows lignes (avancement des jobs, qui y vérifient aussi leur annulation).
+    # Empreinte du contenu source : un lecteur vérifie que le stock correspond bien à son fichier
+    source_sha = source_fingerprint(logs_file)['sha']
+    estimated = estimate_rows(logs_file)
+    if progress:
+        progress(0, estimated)
+    with FeatureStream(path, vector_dim()) as stream:
+        for chunk in iter_clean(logs_file, chunksize=chunk_rows):
+            # Mêmes valeurs que clean() (mode compact compris), bloc par bloc
+            if SPACY_CLEAN_COMPACT:
+                chunk = compact_frame(chunk)
+            texts = chunk['message'].tolist() if text == "message" else row_texts(chunk)
+            for start in range(0, len(texts), chunk_rows):
+                stream.append(get_log_vectors(texts[start:start + chunk_rows], batch_size=batch_size))
+                if progress:
+                    progress(stream.rows, max(estimated, stream.rows))
+        if progress:
+            progress(stream.rows, stream.rows)
+        # clean() numérote les lignes de 0 à n-1 dans l'ordre du fichier
+        return stream.commit(range(stream.rows), vectorizer_version(), text=text, source=logs_file,
+                             source_sha=source_sha, row_text=row_text_config() if text == "row" else None)
+
+def vectorize_job(job, logs_file, text="message", batch_size=None):
+    # Job asynchrone (exécuté dans un processus du pool de jobs) : écrit un stock de features
+    # dans le répertoire des jobs, en signalant l'avancement bloc par bloc
+    meta = build_feature_store(logs_file, job.result_path, text=text, batch_size=batch_size,
+                               chunk_rows=SPACY_JOB_CHUNK_ROWS, progress=job.progress)
+    return {"text": meta["text"], "vectorizer_version": meta["vectorizer_version"], "dim": vector_dim()}
+
+def get_template_vectors(logs, batch_size=None, n_process=None):
+    # Variante par templates : les champs variables (GUID, IP, PID...) sont masqués, seuls les
+    # templates uniques sont vectorisés et chaque log reçoit le vecteur de son template.
+    # Retourne (vecteurs (n, dim), template_id de chaque log, miner contenant les templates).
+    template_ids, miner = mine_templates(logs)
+    texts = [template_text(miner.template(i)) for i in range(len(miner.templates))]
+    template_vectors = vectorize(texts, batch_size=batch_size, n_process=n_process)
+    return template_vectors[template_ids], template_ids, miner
 
-        # Exemple : similarité entre les deux premiers tokens
-        if len(doc) >= 2 and doc[0].has_vector and doc[1].has_vector:
-            sim = doc[0].similarity(doc[1])  # Mesure de similarité
-            print(f"\nSimilarité entre '{doc[0].text}' et '{doc[1].text}' : {sim:.3f}")
-        else:
-            print("Impossible de comparer des tokens : vecteurs non disponibles.")
 
-def get_log_vectors(logs):
-    # Fonction utilitaire pour obtenir les vecteurs de chaque log
-    nlp = spacy.load("en_core_web_md")
-    return [nlp(log).vector for log in logs]
 
+def _vectors_response(vectors):
+    # Choisir le format selon l'en-tête Accept et la compression selon Accept-Encoding
+    mimetype = request.accept_mimetypes.best_match(supported_mimetypes(), default=JSON_MIMETYPE)
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    body, encoding = compress(encode_vectors(vectors, mimetype), encoding)
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    return response
 
+def _iter_request_body():
+    # Corps brut de la requête, bloc par bloc
+    while True:
+        chunk = request.stream.read(SPACY_UPLOAD_READ_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+def _iter_multipart_file(field="file"):
+    # Contenu du fichier `field` d'un formulaire multipart, décodé au fil de la lecture du corps
+    # (request.files mettrait tout le fichier en tampon avant de le rendre disponible)
+    boundary = request.mimetype_params.get("boundary")
+    if not boundary:
+        raise ValueError("Multipart request without boundary")
+    decoder = MultipartDecoder(boundary.encode())
+    in_file = False
+    body = _iter_request_body()
+    while True:
+        chunk = next(body, None)
+        decoder.receive_data(chunk)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, (Field, File)):
+                in_file = isinstance(event, File) and event.name == field
+            elif isinstance(event, Data) and in_file:
+                yield event.data
+                if not event.more_data:
+                    return
+            elif isinstance(event, Epilogue):
+                return
+            event = decoder.next_event()
+        if chunk is None:
+            return
+
+def _upload_vectors(batch_size=None):
+    # Vectorise un CSV envoyé dans le corps (text/csv) ou en multipart (champ `file`), bloc de
+    # lignes par bloc de lignes : seul un bloc du fichier est en mémoire à la fois
+    column = request.args.get("column", "message")
+    if request.mimetype == "multipart/form-data":
+        chunks = _iter_multipart_file(request.args.get("field", "file"))
+    else:
+        chunks = _iter_request_body()
+    blocks = [get_log_vectors(texts, batch_size=batch_size) for texts in iter_upload_texts(chunks, column=column)]
+    return np.concatenate(blocks) if blocks else np.zeros((0, vector_dim()), dtype=np.float32)
 
 @app.route('/vectorize', methods=['POST'])
 def vectorize_logs():
-    # Récupérer les données envoyées par le client
+    # Trois modes d'entrée : un CSV en flux (text/csv ou multipart, paramètres dans l'URL),
+    # une liste de textes JSON {"texts": [...]}, ou un fichier du conteneur {"logs_file": ...}
+    upload = request.mimetype in CSV_MIMETYPES or request.mimetype == "multipart/form-data"
+    if upload:
+        data = request.args
+        batch_size = request.args.get("batch_size", type=int)
+    else:
+        data = request.get_json(silent=True) or {}
+        batch_size = data.get("batch_size", None)  # Taille des lots nlp.pipe (optionnel)
+    logs_file = data.get("logs_file", None)  # Nom du fichier CSV contenant les logs
+    texts = data.get("texts", None)  # Textes à vectoriser, envoyés directement
+    n_process = data.get("n_process", None)  # Nombre de processus (optionnel, 0 = tous les cœurs, borné par SPACY_MAX_PROCESSES)
+    use_templates = data.get("templates", False)  # Vectoriser par template plutôt que log par log
+    
+    SPACY_REQUESTS_TOTAL.inc()
+    if not upload and texts is None and not logs_file:
+        return jsonify({"error": "No logs file provided"}), 400
+    if texts is not None and (not isinstance(texts, list) or not all(isinstance(t, str) for t in texts)):
+        return jsonify({"error": "texts must be a list of strings"}), 400
+    if n_process is not None and (not isinstance(n_process, int) or isinstance(n_process, bool)):
+        return jsonify({"error": "n_process must be an integer"}), 400
+    
+    # Appeler votre fonction clean() avec le fichier CSV
+    try:
+        with SPACY_VECTORIZE_LATENCY_SECONDS.time():
+            if upload:
+                vectors = _upload_vectors(batch_size=batch_size)
+            else:
+                messages = texts if texts is not None else clean(logs_file)['message']
+                
+                # Extraire les vecteurs pour chaque log (modèle déjà chargé, traitement par lots)
+                if use_templates:
+                    vectors, _, _ = get_template_vectors(messages, batch_size=batch_size, n_process=n_process)
+                else:
+                    vectors = get_log_vectors(messages, batch_size=batch_size, n_process=n_process)
+        
+        # Retourner les vecteurs dans le format négocié (JSON par défaut, float32 brut, .npy ou Arrow)
+        return _vectors_response(vectors)
+    except Exception as e:
+        SPACY_VECTORIZE_ERRORS_TOTAL.inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/vectorize/tail', methods=['POST'])
+def vectorize_tail():
+    """Vectorise uniquement les lignes ajoutées au fichier depuis le dernier appel (delta)."""
     data = request.json
     logs_file = data.get("logs_file", None)  # Nom du fichier CSV contenant les logs
+    batch_size = data.get("batch_size", None)  # Taille des lots nlp.pipe (optionnel)
+    commit = data.get("commit", True)  # Avancer le point de reprise une fois le delta renvoyé
     
     if not logs_file:
         return jsonify({"error": "No logs file provided"}), 400
     
-    # Appeler votre fonction clean() avec le fichier CSV
+    try:
+        # Verrou de la lecture du point de reprise à son enregistrement : deux appels concurrents
+        # (autres workers gunicorn compris) ne reçoivent jamais le même delta
+        with checkpoint_lock(logs_file) if commit else contextlib.nullcontext():
+            # Lire la fin du fichier à partir du dernier offset traité
+            delta, checkpoint = read_tail(logs_file, load_checkpoint(logs_file))
+            vectors = get_log_vectors(delta['message'], batch_size=batch_size)
+            
+            # Les lignes du delta sont numérotées à la suite des lignes déjà traitées
+            response = _vectors_response(vectors)
+            response.headers['X-Row-Start'] = str(delta.index.start)
+            response.headers['X-Row-Count'] = str(len(delta))
+            if commit:
+                save_checkpoint(logs_file, checkpoint)
+        return response
+    except Exception as e:
+        SPACY_VECTORIZE_ERRORS_TOTAL.inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/features', methods=['POST'])
+def features():
+    """Écrit le stock de features partagé (matrice .npy + métadonnées .json) pour un fichier de logs."""
+    data = request.json
+    logs_file = data.get("logs_file", None)  # Nom du fichier CSV contenant les logs
+    path = data.get("output", FEATURE_STORE_PATH)  # Chemin du stock, sans extension
+    # Texte vectorisé : "row" (ligne complète, celui des détecteurs) ou "message"
+    text = data.get("text", "row")
+    
+    if not logs_file:
+        return jsonify({"error": "No logs file provided"}), 400
+    if not path:
+        return jsonify({"error": "No feature store path provided"}), 400
+    if text not in ("message", "row"):
+        return jsonify({"error": f"Unknown text mode: {text}"}), 400
+    
+    try:
+        meta = build_feature_store(logs_file, path, text=text, batch_size=data.get("batch_size", None))
+        return jsonify({"path": path, **meta})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Lance la vectorisation d'un gros fichier de logs en arrière-plan et retourne l'id du job."""
+    data = request.json or {}
+    logs_file = data.get("logs_file", None)  # Nom du fichier CSV contenant les logs
+    text = data.get("text", "message")  # Texte vectorisé : "message" ou "row" (ligne complète)
+
+    if not logs_file:
+        return jsonify({"error": "No logs file provided"}), 400
+    if text not in ("message", "row"):
+        return jsonify({"error": f"Unknown text mode: {text}"}), 400
+
+    try:
+        job = submit_job(vectorize_job, logs_file=logs_file, text=text, batch_size=data.get("batch_size", None))
+        return jsonify(job), 202, {"Location": f"/jobs/{job['job_id']}"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/jobs', methods=['GET'])
+def jobs():
+    """Liste les jobs connus (du plus récent au plus ancien)."""
+    return jsonify({"jobs": list_jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Avancement du job : lignes traitées, débit (lignes/s), temps restant estimé."""
+    job = job_status(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Annule un job en file ou en cours ; supprime un job terminé et son résultat."""
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job), 202 if job["status"] in ("queued", "running") else 200
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Télécharge la matrice float32 (.npy) produite par le job, une fois celui-ci terminé."""
+    job = job_status(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": f"Job {job_id} is {job['status']}", "status": job["status"]}), 409
+    # Envoyé depuis le disque (sans charger la matrice), reprise possible via Range
+    return send_file(os.path.abspath(result_path(job_id) + ".npy"), mimetype=NPY_MIMETYPE,
+                     as_attachment=True, download_name=f"{job_id}.npy", conditional=True)
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    """
+    Analyse NLP par lots (entités, lemmes, POS, dépendances) de textes fournis ou d'un fichier de
+    logs ; résultats diffusés en JSONL au fil des lots, un enregistrement par log.
+    """
+    data = request.json or {}
+    try:
+        annotations = parse_annotations(data.get("annotations", None))
+        pipeline_components(annotations)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    texts = data.get("texts", None)  # Logs fournis directement dans la requête
+    logs_file = data.get("logs_file", None)  # ou nom du fichier CSV contenant les logs
+    column = data.get("column", "message")
+    if texts is not None:
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return jsonify({"error": "texts must be a list of strings"}), 400
+        ids = None
+    elif logs_file:
+        try:
+            df = clean(logs_file)
+            texts, ids = df[column].tolist(), df.index.tolist()
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    else:
+        return jsonify({"error": "No texts or logs file provided"}), 400
+
+    def generate():
+        try:
+            for record in annotate(texts, annotations, batch_size=data.get("batch_size", None), ids=ids):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Le statut HTTP est déjà parti : signaler l'erreur dans le flux
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route('/entities', methods=['POST'])
+def log_entities():
+    """
+    Extraction à base de règles (IP, GUID, MAC, SID, ports, hôtes) sur une colonne, sans NER
+    statistique ; un enregistrement JSONL par log : entités typées avec leurs positions
+    ("format": "spans") ou un tableau de valeurs par type ("format": "typed").
+    """
+    data = request.json or {}
+    texts = data.get("texts", None)  # Logs fournis directement dans la requête
+    logs_file = data.get("logs_file", None)  # ou nom du fichier CSV contenant les logs
+    column = data.get("column", "message")
+    output = data.get("format", "spans")
+    types = data.get("types", None) or list(ENTITY_TYPES)
+
+    if output not in ("spans", "typed"):
+        return jsonify({"error": f"Unknown format: {output}"}), 400
+    unknown = [label for label in types if label not in ENTITY_TYPES]
+    if unknown:
+        return jsonify({"error": f"Unknown entity types: {', '.join(unknown)}"}), 400
+    if texts is not None:
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return jsonify({"error": "texts must be a list of strings"}), 400
+        values = pd.Series(texts, dtype=object)
+    elif logs_file:
+        values = None
+    else:
+        return jsonify({"error": "No texts or logs file provided"}), 400
+
+    try:
+        if values is None:
+            values = clean(logs_file)[column]
+        with track_stage('entities', rows=len(values)):
+            if output == "typed":
+                records = entity_frame(values, types).to_dict(orient="records")
+            else:
+                records = [{"entities": [entity for entity in found if entity["label"] in types]}
+                           for found in extract_entities(values)]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        for record_id, record in zip(values.index.tolist(), records):
+            yield json.dumps({"id": record_id, **record}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route('/templates', methods=['POST'])
+def log_templates():
+    """Retourne le template_id de chaque log et la liste des templates extraits."""
+    data = request.json
+    logs_file = data.get("logs_file", None)  # Nom du fichier CSV contenant les logs
+    if not logs_file:
+        return jsonify({"error": "No logs file provided"}), 400
+
     try:
         df = clean(logs_file)
-        
-        # Extraire les vecteurs pour chaque log (ajoutez cette partie si elle n'existe pas déjà)
-        nlp = spacy.load("en_core_web_md")
-        vectors = [nlp(log).vector.tolist() for log in df['message']]
-        
-        # Retourner les vecteurs sous forme JSON
-        return jsonify({"vectors": vectors})
+        template_ids, miner = mine_templates(df['message'])
+        templates = [
+            {"template_id": i, "template": miner.template(i), "count": miner.counts[i]}
+            for i in range(len(miner.templates))
+        ]
+        return jsonify({"template_ids": template_ids, "templates": templates})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _iter_request_messages(ndjson):
+    # Lit le corps de la requête ligne par ligne, sans le charger entièrement en mémoire.
+    # En NDJSON, chaque ligne est une chaîne JSON ou un objet {"message": ...} ; en texte brut,
+    # chaque ligne non vide est un log.
+    for raw in request.stream:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if not line.strip():
+            continue
+        if ndjson:
+            item = json.loads(line)
+            yield item.get("message", "") if isinstance(item, dict) else item
+        else:
+            yield line
+
+@app.route('/vectorize/stream', methods=['POST'])
+def vectorize_stream():
+    """Vectorise un flux de logs (un par ligne) et renvoie un vecteur JSON par ligne (NDJSON)."""
+    ndjson = request.mimetype in ("application/x-ndjson", "application/jsonl")
+    batch_size = request.args.get("batch_size", type=int)
+
+    def generate():
+        try:
+            for vector in iter_vectors(_iter_request_messages(ndjson), batch_size=batch_size):
+                yield json.dumps(vector.tolist()) + "\n"
+        except Exception as e:
+            SPACY_VECTORIZE_ERRORS_TOTAL.inc()
+            # Le statut HTTP est déjà parti : signaler l'erreur dans le flux
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    # Réponse envoyée en chunked transfer encoding au fil des lots
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+def startup():
+    # Charge le modèle et vectorise un lot synthétique avant de se déclarer prêt
+    try:
+        duration = warm_up()
+        SPACY_STARTUP_DURATION_SECONDS.set(duration)
+        _startup["seconds"] = round(duration, 3)
+        _startup["ready"] = True
+        print(f"Modèle spaCy chargé et préchauffé en {duration:.2f} s")
+    except Exception as e:
+        _startup["error"] = str(e)
+        print(f"Échec du chargement du modèle spaCy : {e}")
+
+@app.route('/healthz')
+def healthz():
+    """Liveness : le processus répond ; en échec seulement si le chargement du modèle a échoué."""
+    if _startup["error"]:
+        return jsonify({"status": "error", "error": _startup["error"]}), 500
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness : le modèle est chargé et préchauffé, le service peut recevoir du trafic."""
+    if not _startup["ready"]:
+        return jsonify({"status": "error" if _startup["error"] else "loading", "error": _startup["error"]}), 503
+    return jsonify({"status": "ready", "startup_seconds": _startup["seconds"]})
+
 @app.route('/metrics')
 def metrics():
     """Expose Prometheus metrics for this Flask application."""
     # Cette fonction génère le texte des métriques Prometheus
     # à partir du registre par défaut (REGISTRY) de prometheus_client.
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        # Sous gunicorn : agréger les valeurs écrites par tous les workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), mimetype='text/plain')
     return Response(generate_latest(REGISTRY), mimetype='text/plain')
 
-if __name__ == "__main__":
+def serve():
+    if SPACY_PRELOAD:
+        # Préchauffage en arrière-plan : /healthz répond pendant le chargement, /readyz une fois prêt
+        threading.Thread(target=startup, daemon=True).start()
+    else:
+        _startup["ready"] = True
     app.run(host="0.0.0.0", port=5003)
+
+if __name__ == "__main__":
+    main()
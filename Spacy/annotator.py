@@ -0,0 +1,99 @@
+# annotator.py
+# -*- coding: utf-8 -*-
+# Analyse NLP structurée des logs (entités, lemmes, POS, dépendances) : seuls les composants
+# spaCy nécessaires aux annotations demandées sont exécutés, par lots, et chaque log produit un
+# enregistrement JSON (une ligne JSONL) au lieu de l'affichage token par token de l'ancien main().
+import json
+
+from spacy.util import minibatch
+
+from metrics import track_stage
+from vectorizer import SPACY_BATCH_SIZE, SPACY_MODEL_NAME, get_nlp
+
+# Composants requis par chaque type d'annotation (pipelines en_core_web_* v3) : le tagger et le
+# parser écoutent le tok2vec partagé, l'attribute_ruler dérive le POS du tag, le lemmatiseur à
+# règles a besoin du POS ; le NER embarque son propre tok2vec.
+ANNOTATION_COMPONENTS = {
+    'entities': ['ner'],
+    'lemmas': ['tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer'],
+    'pos': ['tok2vec', 'tagger', 'attribute_ruler'],
+    'deps': ['tok2vec', 'parser'],
+}
+# Composant sans lequel l'annotation est impossible
+ANNOTATION_PRODUCERS = {'entities': 'ner', 'lemmas': 'lemmatizer', 'pos': 'tagger', 'deps': 'parser'}
+ANNOTATIONS = tuple(ANNOTATION_COMPONENTS)
+
+
+def parse_annotations(annotations):
+    """Liste d'annotations validée, depuis une liste ou une chaîne 'entities,pos' (toutes si vide)."""
+    if isinstance(annotations, str):
+        annotations = [name.strip() for name in annotations.split(',') if name.strip()]
+    annotations = list(annotations or ANNOTATIONS)
+    unknown = [name for name in annotations if name not in ANNOTATION_COMPONENTS]
+    if unknown:
+        raise ValueError(f"Annotations inconnues : {', '.join(unknown)} (disponibles : {', '.join(ANNOTATIONS)})")
+    return annotations
+
+
+def pipeline_components(annotations, nlp=None):
+    """Noms des composants à exécuter, dans l'ordre du pipeline, pour les annotations demandées."""
+    nlp = nlp or get_nlp()
+    missing = [ANNOTATION_PRODUCERS[name] for name in annotations if ANNOTATION_PRODUCERS[name] not in nlp.component_names]
+    if missing:
+        raise ValueError(f"Le modèle {SPACY_MODEL_NAME} n'a pas les composants : {', '.join(missing)}")
+    needed = {component for name in annotations for component in ANNOTATION_COMPONENTS[name]}
+    return [name for name in nlp.component_names if name in needed]
+
+
+def _doc_record(doc, annotations):
+    record = {}
+    if any(name != 'entities' for name in annotations):
+        record['tokens'] = [token.text for token in doc]
+    if 'lemmas' in annotations:
+        record['lemmas'] = [token.lemma_ for token in doc]
+    if 'pos' in annotations:
+        record['pos'] = [token.pos_ for token in doc]
+    if 'deps' in annotations:
+        # Arc de chaque token : relation et indice du token gouverneur
+        record['deps'] = [token.dep_ for token in doc]
+        record['heads'] = [token.head.i for token in doc]
+    if 'entities' in annotations:
+        record['entities'] = [
+            {'text': ent.text, 'label': ent.label_, 'start_char': ent.start_char, 'end_char': ent.end_char}
+            for ent in doc.ents
+        ]
+    return record
+
+
+def annotate(texts, annotations=None, batch_size=None, ids=None):
+    """
+    Analyse les textes par lots et produit un enregistrement par texte, dans l'ordre :
+    {'id': ..., 'tokens': [...], 'lemmas': [...], 'pos': [...], 'deps': [...], 'heads': [...],
+    'entities': [{'text', 'label', 'start_char', 'end_char'}]} selon les annotations demandées.
+    Les composants non nécessaires ne sont pas exécutés ; le modèle partagé n'est pas modifié.
+    """
+    annotations = parse_annotations(annotations)
+    nlp = get_nlp()
+    components = [nlp.get_pipe(name) for name in pipeline_components(annotations, nlp)]
+    batch_size = batch_size or SPACY_BATCH_SIZE
+    ids = iter(ids) if ids is not None else None
+    position = 0
+    for batch in minibatch(texts, size=batch_size):
+        with track_stage('analyze', rows=len(batch)):
+            docs = nlp.tokenizer.pipe(["" if text is None else str(text) for text in batch], batch_size=batch_size)
+            for component in components:
+                docs = component.pipe(docs, batch_size=batch_size)
+            records = [_doc_record(doc, annotations) for doc in docs]
+        for record in records:
+            record_id = next(ids) if ids is not None else position
+            position += 1
+            yield {'id': record_id, **record}
+
+
+def write_jsonl(records, output):
+    """Écrit les enregistrements en JSONL dans un fichier ouvert ; retourne le nombre de lignes."""
+    count = 0
+    for record in records:
+        output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,53 @@
+# bench_entities.py
+# -*- coding: utf-8 -*-
+# Benchmark de l'extraction d'entités : règles compilées (log_entities.py) contre le NER
+# statistique du modèle spaCy (doc.ents via nlp.pipe, seul le composant ner exécuté).
+# Usage : python bench_entities.py --logs logs.csv --column message
+import argparse
+import collections
+import time
+
+from features import clean
+from annotator import annotate, pipeline_components
+from log_entities import ENTITY_TYPES, extract_entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de l'extraction d'entités : règles contre NER spaCy")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs")
+    parser.add_argument("--column", default="message", help="Colonne analysée")
+    parser.add_argument("--limit", type=int, default=None, help="Ne garder que les N premiers logs")
+    parser.add_argument("--batch-size", type=int, default=None, help="Taille des lots nlp.pipe")
+    args = parser.parse_args()
+
+    values = clean(args.logs)[args.column]
+    if args.limit:
+        values = values.iloc[:args.limit]
+
+    print(f"\n{len(values)} logs, {values.nunique()} valeurs distinctes")
+    print(f"{'moteur':>8} {'durée (s)':>10} {'logs/s':>12} {'entités':>9}")
+
+    start = time.perf_counter()
+    found = extract_entities(values)
+    elapsed = time.perf_counter() - start
+    labels = collections.Counter(entity['label'] for entities in found for entity in entities)
+    print(f"{'règles':>8} {elapsed:>10.3f} {len(values) / elapsed:>12.0f} {sum(labels.values()):>9}")
+    rules_elapsed = elapsed
+
+    try:
+        pipeline_components(['entities'])
+    except ValueError as e:
+        print(f"{'ner':>8} ignoré : {e}")
+    else:
+        start = time.perf_counter()
+        count = sum(len(record['entities']) for record in annotate(values.tolist(), ['entities'], batch_size=args.batch_size))
+        elapsed = time.perf_counter() - start
+        print(f"{'ner':>8} {elapsed:>10.3f} {len(values) / elapsed:>12.0f} {count:>9}"
+              f"  (règles {elapsed / rules_elapsed:.0f}x plus rapides)")
+
+    print("Entités trouvées par les règles : "
+          + ", ".join(f"{label} {labels.get(label, 0)}" for label in ENTITY_TYPES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# bench_serving.py
+# -*- coding: utf-8 -*-
+# Benchmark du service Spacy : débit de /vectorize sous requêtes concurrentes et mémoire par
+# processus, serveur de développement Flask (python analyse_spacy2.py) contre gunicorn pré-forké.
+# La mémoire est lue dans /proc (Linux) : RSS compte les pages partagées dans chaque processus,
+# PSS les répartit entre les processus qui les partagent (somme PSS = mémoire réellement occupée).
+# Usage : python bench_serving.py --logs logs.csv --workers 1 2 4 --concurrency 8 --requests 64
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _children(pid):
+    # Processus dont le parent est pid (workers gunicorn)
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Le nom du processus (2e champ) peut contenir des espaces : lire après la parenthèse
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def _memory(pid):
+    # (RSS, PSS) en Mo depuis /proc/<pid>/smaps_rollup
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1]) / 1024
+    return values.get('Rss:', 0.0), values.get('Pss:', 0.0)
+
+
+def start_server(mode, workers, port):
+    env = dict(os.environ, FLASK_RUN_PORT=str(port))
+    if mode == 'dev':
+        # Le serveur de développement écoute toujours sur 5003
+        command = [sys.executable, 'analyse_spacy2.py']
+    else:
+        env['SPACY_WORKERS'] = str(workers)
+        env['PROMETHEUS_MULTIPROC_DIR'] = f'/tmp/spacy_prometheus_bench_{port}'
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'analyse_spacy2:app']
+    return subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(url, process, timeout=600):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrêté pendant le démarrage")
+        try:
+            if requests.get(f'{url}/readyz', timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Le serveur n'est pas prêt après le délai imparti")
+
+
+def run_load(url, logs_file, concurrency, n_requests, accept):
+    def call(_):
+        response = requests.post(f'{url}/vectorize', json={'logs_file': logs_file}, headers={'Accept': accept})
+        response.raise_for_status()
+        return int(response.headers.get('Content-Length') or len(response.content))
+
+    # Une requête hors mesure : cache Parquet de clean() et caches du vectoriseur déjà remplis
+    call(None)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(n_requests)))
+    return time.perf_counter() - start
+
+
+def bench(mode, workers, args, rows):
+    port = 5003 if mode == 'dev' else args.port
+    url = f'http://127.0.0.1:{port}'
+    process = start_server(mode, workers, port)
+    try:
+        startup = wait_ready(url, process)
+        elapsed = run_load(url, args.logs, args.concurrency, args.requests, args.accept)
+        pids = [process.pid] + _children(process.pid)
+        memory = [_memory(pid) for pid in pids]
+    finally:
+        process.terminate()
+        process.wait()
+    label = 'dev' if mode == 'dev' else f'gunicorn x{workers}'
+    rss_total = sum(rss for rss, _ in memory)
+    pss_total = sum(pss for _, pss in memory)
+    # Mémoire d'un worker : le processus servant les requêtes (le maître gunicorn n'en sert pas)
+    worker_rss, worker_pss = memory[-1]
+    print(f"{label:>14} {startup:>9.1f} {args.requests / elapsed:>8.1f} {args.requests * rows / elapsed:>10.0f}"
+          f" {worker_rss:>12.0f} {worker_pss:>12.0f} {rss_total:>10.0f} {pss_total:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit concurrent de /vectorize et mémoire par worker")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs envoyé à /vectorize")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Nombres de workers gunicorn à tester")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requêtes simultanées")
+    parser.add_argument("--requests", type=int, default=32, help="Nombre de requêtes mesurées")
+    parser.add_argument("--port", type=int, default=5103, help="Port utilisé pour gunicorn")
+    parser.add_argument("--accept", default="application/x-float32", help="Format de réponse demandé")
+    parser.add_argument("--skip-dev", action="store_true", help="Ne pas mesurer le serveur de développement")
+    args = parser.parse_args()
+    args.logs = os.path.abspath(args.logs)
+
+    from log_loader import iter_clean
+    rows = sum(len(chunk) for chunk in iter_clean(args.logs))
+
+    print(f"\n{rows} logs par requête, {args.concurrency} requêtes simultanées, {args.requests} requêtes")
+    print(f"{'serveur':>14} {'démarrage':>9} {'req/s':>8} {'logs/s':>10}"
+          f" {'RSS worker':>12} {'PSS worker':>12} {'RSS total':>10} {'PSS total':>10}")
+    if not args.skip_dev:
+        bench('dev', 1, args, rows)
+    for workers in args.workers:
+        bench('gunicorn', workers, args, rows)
+    print("(mémoire en Mo ; démarrage en s, chargement et préchauffage du modèle compris)")
+
+
+if __name__ == "__main__":
+    main()
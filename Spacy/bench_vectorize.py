@@ -0,0 +1,91 @@
+# bench_vectorize.py
+# -*- coding: utf-8 -*-
+# Benchmark du débit de vectorisation (logs/s) en fonction du nombre de workers.
+# Usage : python bench_vectorize.py --logs logs.csv --workers 1 2 4
+#         python bench_vectorize.py --logs logs.csv --compare-fast
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from features import clean
+from fast_vectorizer import FastVectorizer
+from vectorizer import SPACY_BATCH_SIZE, available_cpus, get_nlp, vectorize
+
+
+def compare_fast(messages, batch_size=None):
+    """Compare le pipeline spaCy (nlp.pipe -> doc.vector) et le calcul direct sur la table de vecteurs."""
+    nlp = get_nlp()
+    # Textes bruts des deux côtés : le calcul direct doit rendre nlp(texte).vector tel quel
+    texts = ["" if message is None else str(message) for message in messages]
+
+    def with_pipeline():
+        return np.array([doc.vector for doc in nlp.pipe(texts, batch_size=batch_size or SPACY_BATCH_SIZE)])
+
+    def with_fast():
+        return FastVectorizer(nlp)(texts)
+
+    print(f"\n{len(texts)} logs")
+    print(f"{'moteur':>10} {'durée (s)':>10} {'logs/s':>10} {'pic mémoire (Mo)':>17}")
+    results = {}
+    for name, run in (("spacy", with_pipeline), ("fast", with_fast)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        results[name] = run()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>10} {elapsed:>10.2f} {len(texts) / elapsed:>10.0f} {peak / 2**20:>17.1f}")
+    identical = np.array_equal(results["spacy"], results["fast"])
+    print(f"Vecteurs identiques : {identical} (écart max {np.abs(results['spacy'] - results['fast']).max():.2e})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de vectorisation selon le nombre de workers")
+    parser.add_argument("--logs", default="logs.csv", help="Fichier CSV de logs à vectoriser")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Nombres de workers à tester (défaut : 1, 2, 4, ... jusqu'au nombre de cœurs)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Taille des lots nlp.pipe")
+    parser.add_argument("--limit", type=int, default=None, help="Ne garder que les N premiers logs")
+    parser.add_argument("--compare-fast", action="store_true",
+                        help="Comparer le pipeline spaCy et le calcul direct des vecteurs (résultats et débit)")
+    args = parser.parse_args()
+
+    workers = args.workers
+    if not workers:
+        workers, n = [], 1
+        while n < available_cpus():
+            workers.append(n)
+            n *= 2
+        workers.append(available_cpus())
+
+    messages = clean(args.logs)['message'].tolist()
+    if args.limit:
+        messages = messages[:args.limit]
+
+    # Le chargement du modèle n'est pas compté dans les mesures
+    get_nlp()
+
+    if args.compare_fast:
+        compare_fast(messages, batch_size=args.batch_size)
+        return
+
+    print(f"\n{len(messages)} logs, {available_cpus()} cœurs disponibles")
+    print(f"{'workers':>8} {'durée (s)':>10} {'logs/s':>10} {'speedup':>8}")
+    reference = None
+    baseline = None
+    for n_process in workers:
+        start = time.perf_counter()
+        vectors = vectorize(messages, batch_size=args.batch_size, n_process=n_process, use_cache=False)
+        elapsed = time.perf_counter() - start
+        # Vérifier que le mode parallèle rend exactement les mêmes vecteurs, dans le même ordre
+        if reference is None:
+            reference, baseline = vectors, elapsed
+        elif not np.array_equal(reference, vectors):
+            print(f"ATTENTION : résultats différents avec {n_process} workers")
+        print(f"{n_process:>8} {elapsed:>10.2f} {len(messages) / elapsed:>10.0f} {baseline / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# gunicorn.conf.py
+# -*- coding: utf-8 -*-
+# Service Spacy en mode production : gunicorn pré-forké. L'application (modèle en_core_web_md,
+# table de vecteurs, vectoriseur rapide) est chargée et préchauffée dans le processus maître
+# avant le fork : les workers partagent ces pages en copy-on-write au lieu d'en avoir une copie.
+# Le port n'est ouvert qu'après ce chargement : /healthz ne répond pas pendant le préchauffage
+# (en Kubernetes, la startupProbe de k8s/deployment-spacy.yaml couvre cette durée).
+# Usage : gunicorn -c gunicorn.conf.py analyse_spacy2:app
+import gc
+import os
+import shutil
+
+# --- Configuration ---
+bind = f"0.0.0.0:{os.getenv('FLASK_RUN_PORT', '5003')}"
+# Nombre de workers (processus servant les requêtes)
+workers = int(os.getenv('SPACY_WORKERS', '2'))
+# Charger l'application dans le maître avant le fork (indispensable au partage copy-on-write)
+preload_app = True
+# Une vectorisation de gros fichier peut dépasser le délai par défaut de 30 s
+timeout = int(os.getenv('SPACY_WORKER_TIMEOUT', '600'))
+
+# Métriques Prometheus agrégées sur tous les workers : chaque processus écrit ses valeurs
+# dans ce répertoire, /metrics les additionne. Doit être défini avant l'import de prometheus_client.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/spacy_prometheus')
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def on_starting(server):
+    # Exécuté dans le maître après le chargement de l'application (preload_app), avant le fork
+    import analyse_spacy2
+    import vectorizer
+    if vectorizer.SPACY_N_PROCESS != 1:
+        # Un pool de processus créé dans le maître ne survivrait pas au fork des workers
+        server.log.warning("SPACY_N_PROCESS=%s ignoré sous gunicorn : les workers remplacent le pool",
+                           vectorizer.SPACY_N_PROCESS)
+        vectorizer.SPACY_N_PROCESS = 1
+    # Idem pour le n_process demandé par une requête : jamais de pool dans un worker
+    vectorizer.SPACY_MAX_PROCESSES = 1
+    analyse_spacy2.startup()
+    if not analyse_spacy2._startup["ready"]:
+        raise RuntimeError(f"Chargement du modèle spaCy impossible : {analyse_spacy2._startup['error']}")
+    # Geler les objets déjà créés : le ramasse-miettes des workers ne les parcourt plus, ce qui
+    # évite de réécrire (et donc de dupliquer) leurs pages après le fork
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Le modèle a été chargé par le maître avant le fork
+    import analyse_spacy2
+    analyse_spacy2.SPACY_MODEL_LOADED.set(1)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
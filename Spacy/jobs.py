@@ -0,0 +1,198 @@
+# jobs.py
+# -*- coding: utf-8 -*-
+# Jobs asynchrones du service Spacy : un traitement long (vectorisation d'un gros export) est
+# exécuté dans un pool borné de processus séparés, à priorité réduite, pour ne pas bloquer les
+# requêtes interactives. L'état de chaque job est un fichier JSON du répertoire des jobs, lisible
+# par n'importe quel worker du service ; l'annulation passe par un fichier marqueur.
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+# Répertoire des états et résultats des jobs (partagé par les workers du service)
+SPACY_JOB_DIR = os.getenv('SPACY_JOB_DIR', 'jobs')
+# Nombre de jobs exécutés simultanément (les suivants attendent leur tour)
+SPACY_JOB_WORKERS = int(os.getenv('SPACY_JOB_WORKERS', '1'))
+# Priorité des processus de jobs (nice) : les requêtes interactives passent avant
+SPACY_JOB_NICE = int(os.getenv('SPACY_JOB_NICE', '10'))
+# Nombre de lignes vectorisées entre deux mises à jour de la progression
+SPACY_JOB_CHUNK_ROWS = int(os.getenv('SPACY_JOB_CHUNK_ROWS', '20000'))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Pool de processus des jobs (créé au premier job)
+_pool = None
+
+
+class JobCancelled(Exception):
+    """Levée dans le job lorsque son annulation a été demandée."""
+
+
+def _state_path(job_id):
+    return os.path.join(SPACY_JOB_DIR, f'{job_id}.status.json')
+
+
+def _cancel_path(job_id):
+    return os.path.join(SPACY_JOB_DIR, f'{job_id}.cancel')
+
+
+def result_path(job_id):
+    """Chemin (sans extension) du résultat du job : stock de features <chemin>.npy + <chemin>.json."""
+    return os.path.join(SPACY_JOB_DIR, job_id)
+
+
+def _write_state(state):
+    path = _state_path(state['job_id'])
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def _read_state(job_id):
+    try:
+        with open(_state_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Interface donnée à la fonction du job : progression, annulation, chemin du résultat."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.result_path = result_path(job_id)
+
+    def cancelled(self):
+        return os.path.exists(_cancel_path(self.job_id))
+
+    def progress(self, rows_done, rows_total=None):
+        """Enregistre l'avancement ; lève JobCancelled si l'annulation a été demandée."""
+        if self.cancelled():
+            raise JobCancelled()
+        state = _read_state(self.job_id)
+        state['rows_done'] = int(rows_done)
+        if rows_total is not None:
+            state['rows_total'] = int(rows_total)
+        _write_state(state)
+
+
+def _init_job_process():
+    # Les jobs cèdent le CPU aux workers qui servent les requêtes interactives
+    if SPACY_JOB_NICE:
+        os.nice(SPACY_JOB_NICE)
+
+
+def _run(job_id, target, params):
+    # Exécuté dans un processus du pool
+    context = JobContext(job_id)
+    state = _read_state(job_id)
+    if context.cancelled():
+        state.update(status='cancelled', finished_at=time.time())
+        _write_state(state)
+        return
+    state.update(status='running', started_at=time.time(), pid=os.getpid())
+    _write_state(state)
+    try:
+        result = target(context, **params)
+        status, error = 'done', None
+    except JobCancelled:
+        result, status, error = None, 'cancelled', None
+    except Exception as e:
+        result, status, error = None, 'failed', str(e)
+    if status != 'done':
+        # Ne pas laisser de résultat partiel
+        for suffix in ('.npy', '.npy.tmp', '.json'):
+            if os.path.exists(context.result_path + suffix):
+                os.remove(context.result_path + suffix)
+    state = _read_state(job_id)
+    state.update(status=status, error=error, finished_at=time.time(),
+                 result=result if isinstance(result, dict) else None)
+    _write_state(state)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=SPACY_JOB_WORKERS, initializer=_init_job_process)
+    return _pool
+
+
+def submit_job(target, **params):
+    """
+    Crée un job et le place dans la file du pool. `target(context, **params)` est exécutée dans
+    un processus séparé (fonction de module, pour pouvoir être transmise au pool).
+    Retourne l'état initial du job.
+    """
+    os.makedirs(SPACY_JOB_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    state = {
+        'job_id': job_id, 'status': 'queued', 'params': params, 'rows_done': 0, 'rows_total': None,
+        'created_at': time.time(), 'started_at': None, 'finished_at': None, 'error': None,
+        'host': socket.gethostname(), 'pid': os.getpid(),
+    }
+    _write_state(state)
+    get_pool().submit(_run, job_id, target, params)
+    return job_status(job_id)
+
+
+def job_status(job_id):
+    """État du job avec débit (lignes/s) et temps restant estimé, ou None si le job n'existe pas."""
+    state = _read_state(job_id)
+    if state is None:
+        return None
+    # Processus du job disparu (redémarrage du service) : le job ne finira jamais
+    if (state['status'] in ACTIVE_STATUSES and state.get('host') == socket.gethostname()
+            and not _pid_alive(state['pid'])):
+        state.update(status='failed', error='Job interrompu (processus arrêté)', finished_at=time.time())
+        _write_state(state)
+
+    status = {key: value for key, value in state.items() if key not in ('host', 'pid')}
+    started, rows_done, rows_total = state['started_at'], state['rows_done'], state['rows_total']
+    elapsed = ((state['finished_at'] or time.time()) - started) if started else 0.0
+    rate = rows_done / elapsed if elapsed > 0 and rows_done else None
+    status['elapsed_seconds'] = round(elapsed, 3)
+    status['rows_per_second'] = round(rate, 1) if rate else None
+    status['eta_seconds'] = (round((rows_total - rows_done) / rate, 1)
+                             if rate and rows_total is not None and state['status'] == 'running' else None)
+    return status
+
+
+def list_jobs():
+    """États de tous les jobs connus, du plus récent au plus ancien."""
+    if not os.path.isdir(SPACY_JOB_DIR):
+        return []
+    job_ids = [name[:-len('.status.json')] for name in os.listdir(SPACY_JOB_DIR) if name.endswith('.status.json')]
+    jobs = [status for status in map(job_status, job_ids) if status is not None]
+    return sorted(jobs, key=lambda status: status['created_at'], reverse=True)
+
+
+def cancel_job(job_id):
+    """
+    Demande l'annulation d'un job en file ou en cours (effective à la prochaine mise à jour de
+    sa progression) ; un job terminé est supprimé avec son résultat. Retourne l'état, ou None.
+    """
+    status = job_status(job_id)
+    if status is None:
+        return None
+    if status['status'] in ACTIVE_STATUSES:
+        open(_cancel_path(job_id), 'w').close()
+        return job_status(job_id)
+    for path in (_state_path(job_id), _cancel_path(job_id), result_path(job_id) + '.npy', result_path(job_id) + '.json'):
+        if os.path.exists(path):
+            os.remove(path)
+    status['status'] = 'deleted'
+    return status
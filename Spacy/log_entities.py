@@ -0,0 +1,97 @@
+# log_entities.py
+# -*- coding: utf-8 -*-
+# Extraction à base de règles des entités propres aux logs (IP, GUID, MAC, SID, ports, noms
+# d'hôte) : une seule expression régulière compilée, appliquée une fois par valeur distincte
+# d'une colonne, sans tokenisation ni NER statistique. Produit, pour chaque ligne, les entités
+# typées (même forme que les entités de /analyze) ou des tableaux par type utilisables comme
+# features ou comme contexte pour le LLM.
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Suffixes (dernier label DNS) reconnus comme noms d'hôte : sans liste, « host.ip » ou
+# « svchost.exe » seraient pris pour des hôtes
+ENTITY_HOST_SUFFIXES = os.getenv(
+    'ENTITY_HOST_SUFFIXES', 'local,lan,localdomain,corp,internal,intra,home,com,net,org,io,fr,eu'
+).split(',')
+
+_HOST_SUFFIXES = '|'.join(re.escape(suffix.strip()) for suffix in ENTITY_HOST_SUFFIXES if suffix.strip())
+# Une seule alternative par type, dans l'ordre de priorité (à une position donnée, la première
+# qui correspond l'emporte). Le port collé à une IPv4 (10.0.0.1:443) est capturé avec elle.
+ENTITY_RE = re.compile(r'''
+    (?P<GUID>\{?\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b\}?
+            |\{[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4,12})+\})
+  | (?P<SID>\bS-1-\d+(?:-\d+)+\b)
+  | (?P<MAC>\b[0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5}\b|\b[0-9a-fA-F]{2}(?:-[0-9a-fA-F]{2}){5}\b)
+  | (?P<IP>(?<![\w.])(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?!\w|\.\d))
+    (?::(?P<IP_PORT>\d{1,5})\b)?
+  | (?P<IP6>(?<![\w:])(?:(?:[0-9a-fA-F]{1,4}:){7}[0-9a-fA-F]{1,4}
+            |(?=[0-9a-fA-F:]*[0-9a-fA-F])(?:[0-9a-fA-F]{1,4}:){0,6}[0-9a-fA-F]{0,4}::(?:[0-9a-fA-F]{1,4}:){0,6}[0-9a-fA-F]{0,4})
+            (?![\w:]))
+  | \b[Pp]ort[\s:=\#]+(?P<PORT>\d{1,5})\b
+  | (?P<HOST>\b(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+(?:%s)\b)
+''' % _HOST_SUFFIXES, re.VERBOSE)
+ENTITY_TYPES = ('IP', 'GUID', 'MAC', 'SID', 'PORT', 'HOST')
+# Type de chaque groupe nommé
+_GROUP_LABELS = {'GUID': 'GUID', 'SID': 'SID', 'MAC': 'MAC', 'IP': 'IP', 'IP6': 'IP', 'PORT': 'PORT', 'HOST': 'HOST'}
+
+
+def find_entities(text):
+    """Entités d'un texte : liste de {'text', 'label', 'start_char', 'end_char'} dans l'ordre."""
+    entities = []
+    for match in ENTITY_RE.finditer(text):
+        group = match.lastgroup
+        if group == 'IP_PORT':
+            entities.append(_entity(match, 'IP', 'IP'))
+            entities.append(_entity(match, 'IP_PORT', 'PORT'))
+        else:
+            entities.append(_entity(match, group, _GROUP_LABELS[group]))
+    return entities
+
+
+def _entity(match, group, label):
+    return {'text': match.group(group), 'label': label, 'start_char': match.start(group), 'end_char': match.end(group)}
+
+
+def _unique_entities(values):
+    # Les logs se répètent beaucoup : extraire une fois par valeur distincte
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna(''), sort=False)
+    return codes, [find_entities(str(value)) for value in uniques]
+
+
+def extract_entities(values):
+    """Entités de chaque ligne d'une colonne (liste de listes, même forme que find_entities)."""
+    codes, entities = _unique_entities(values)
+    return [entities[code] for code in codes]
+
+
+def entity_frame(values, types=ENTITY_TYPES, unique=True):
+    """
+    DataFrame avec une colonne par type d'entité contenant, pour chaque ligne, le tableau des
+    valeurs trouvées (dédoublonnées dans la ligne si unique, en gardant l'ordre d'apparition).
+    """
+    codes, entities = _unique_entities(values)
+    index = values.index if isinstance(values, pd.Series) else None
+    columns = {}
+    for label in types:
+        per_value = []
+        for found in entities:
+            texts = [entity['text'] for entity in found if entity['label'] == label]
+            per_value.append(list(dict.fromkeys(texts)) if unique else texts)
+        columns[label] = [per_value[code] for code in codes]
+    return pd.DataFrame(columns, index=index)
+
+
+def entity_counts(values, types=ENTITY_TYPES):
+    """Matrice (n, len(types)) float32 du nombre d'entités de chaque type par ligne (features)."""
+    codes, entities = _unique_entities(values)
+    counts = np.zeros((len(entities), len(types)), dtype=np.float32)
+    positions = {label: i for i, label in enumerate(types)}
+    for row, found in enumerate(entities):
+        for entity in found:
+            if entity['label'] in positions:
+                counts[row, positions[entity['label']]] += 1
+    return counts[codes]
@@ -0,0 +1,103 @@
+# templates.py
+# -*- coding: utf-8 -*-
+# Extraction de templates de logs (à la Drain) : les champs variables (GUID, IP, PID, dates,
+# identifiants...) sont masqués, puis les logs de même forme sont regroupés sous un même
+# template_id. Seuls les templates uniques ont besoin d'être vectorisés.
+import os
+import re
+
+# --- Configuration ---
+# Similarité minimale (part de tokens identiques) pour rattacher un log à un template existant
+SPACY_TEMPLATE_SIM = float(os.getenv('SPACY_TEMPLATE_SIM', '0.5'))
+# Nombre maximal de templates par feuille de l'arbre (au-delà, un log rejoint le template le plus proche)
+SPACY_TEMPLATE_MAX_CHILDREN = int(os.getenv('SPACY_TEMPLATE_MAX_CHILDREN', '100'))
+
+WILDCARD = '<*>'
+
+# Masques appliqués avant le regroupement (l'ordre compte : les motifs les plus spécifiques d'abord)
+MASKS = [
+    ('<GUID>', re.compile(r'\{?\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b\}?')),
+    ('<SID>', re.compile(r'\bS-1-\d+(?:-\d+)+\b')),
+    ('<TS>', re.compile(r'\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?')),
+    ('<TS>', re.compile(r'\b[A-Z][a-z]{2} \d{1,2}, \d{4} @ \d{2}:\d{2}:\d{2}(?:\.\d+)?')),
+    ('<TS>', re.compile(r'\b[A-Z][a-z]{2} +\d{1,2} \d{2}:\d{2}:\d{2}\b')),
+    ('<MAC>', re.compile(r'\b[0-9a-fA-F]{2}(?:[:-][0-9a-fA-F]{2}){5}\b')),
+    ('<IP>', re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b')),
+    ('<IP>', re.compile(r'\b(?:[0-9a-fA-F]{1,4}:){2,7}[0-9a-fA-F]{1,4}\b')),
+    ('<HEX>', re.compile(r'\b0x[0-9a-fA-F]+\b')),
+    ('<NUM>', re.compile(r'(?<![A-Za-z])[-+]?\d+(?:\.\d+)?\b')),
+]
+# Tous les marqueurs (masques et joker), retirés du texte avant vectorisation
+PLACEHOLDER_RE = re.compile(r'<(?:GUID|SID|TS|MAC|IP|HEX|NUM|\*)>')
+
+
+def mask(message):
+    """Remplace les champs variables d'un log par des marqueurs (<GUID>, <IP>, <NUM>...)."""
+    message = "" if message is None else str(message)
+    for placeholder, pattern in MASKS:
+        message = pattern.sub(placeholder, message)
+    return message
+
+
+def template_text(template):
+    """Texte d'un template à vectoriser : les marqueurs ne portent pas de sens, on les retire."""
+    return ' '.join(PLACEHOLDER_RE.sub(' ', template).split())
+
+
+class TemplateMiner:
+    """
+    Regroupement de logs à la Drain : un arbre à deux niveaux (nombre de tokens, premier token)
+    dont les feuilles contiennent des templates ; un log rejoint le template le plus proche si
+    la part de tokens identiques dépasse sim_threshold, les positions divergentes devenant <*>.
+    """
+
+    def __init__(self, sim_threshold=SPACY_TEMPLATE_SIM, max_children=SPACY_TEMPLATE_MAX_CHILDREN):
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.templates = []      # template_id -> liste de tokens
+        self.counts = []         # template_id -> nombre de logs rattachés
+        self._leaves = {}        # (nb tokens, premier token) -> [template_id, ...]
+        self._seen = {}          # log masqué -> template_id (les logs répétés évitent l'arbre)
+
+    def add(self, message):
+        """Rattache un log à un template (créé au besoin) et retourne son template_id."""
+        masked = mask(message)
+        template_id = self._seen.get(masked)
+        if template_id is None:
+            template_id = self._match(masked.split())
+            self._seen[masked] = template_id
+        self.counts[template_id] += 1
+        return template_id
+
+    def _match(self, tokens):
+        first = tokens[0] if tokens and not any(c.isdigit() for c in tokens[0]) else WILDCARD
+        leaf = self._leaves.setdefault((len(tokens), first), [])
+
+        best_id, best_sim = None, -1.0
+        for template_id in leaf:
+            template = self.templates[template_id]
+            same = sum(1 for a, b in zip(template, tokens) if a == b or a == WILDCARD)
+            sim = same / len(tokens) if tokens else 1.0
+            if sim > best_sim:
+                best_id, best_sim = template_id, sim
+
+        if best_id is not None and (best_sim >= self.sim_threshold or len(leaf) >= self.max_children):
+            template = self.templates[best_id]
+            self.templates[best_id] = [a if a == b else WILDCARD for a, b in zip(template, tokens)]
+            return best_id
+
+        self.templates.append(list(tokens))
+        self.counts.append(0)
+        leaf.append(len(self.templates) - 1)
+        return len(self.templates) - 1
+
+    def template(self, template_id):
+        """Texte du template (marqueurs compris)."""
+        return ' '.join(self.templates[template_id])
+
+
+def mine_templates(messages, sim_threshold=SPACY_TEMPLATE_SIM):
+    """Retourne (template_ids, miner) : un template_id par log, dans l'ordre des logs."""
+    miner = TemplateMiner(sim_threshold=sim_threshold)
+    template_ids = [miner.add(message) for message in messages]
+    return template_ids, miner
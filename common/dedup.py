@@ -0,0 +1,68 @@
+# dedup.py
+# -*- coding: utf-8 -*-
+# Dédoublonnage exact des lignes de logs : une grande partie du flux d'événements Windows est la
+# même ligne répétée. Chaque ligne est identifiée par son texte sérialisé complet (haché par
+# pd.factorize) ; seules les lignes uniques sont vectorisées et scorées, puis les résultats sont
+# recopiés vers tous les doublons via l'index inverse (comme np.unique(return_inverse=True)).
+import os
+
+import numpy as np
+import pandas as pd
+
+from log_loader import SEVERITY_COLUMN
+from metrics import PIPELINE_STAGE_DUPLICATE_ROWS_TOTAL
+from row_text import serialize_rows
+
+# --- Configuration ---
+# Vectoriser et scorer une seule fois chaque ligne distincte (0 pour désactiver)
+LOG_DEDUP = os.getenv('LOG_DEDUP', '1') == '1'
+# Entraîner sur les lignes uniques pondérées par leur nombre d'occurrences (sample_weight)
+# plutôt que sur toutes les lignes répétées (One-Class SVM seulement : les scores de
+# l'Isolation Forest ne tiennent pas compte des poids, il est toujours entraîné sur toutes les lignes)
+LOG_DEDUP_SAMPLE_WEIGHTS = os.getenv('LOG_DEDUP_SAMPLE_WEIGHTS', '0') == '1'
+
+
+def row_keys(df):
+    """Clé de chaque ligne : tous ses champs (hors label) sérialisés, quel que soit ROW_TEXT_FIELDS."""
+    return serialize_rows(df, [col for col in df.columns if col != SEVERITY_COLUMN], 'pairs')
+
+
+class RowDedup:
+    """
+    Index des lignes distinctes : first (position de la première occurrence de chaque ligne
+    unique), inverse (ligne unique de chaque ligne) et counts (occurrences de chaque ligne unique).
+    """
+
+    def __init__(self, keys):
+        self.inverse, _ = pd.factorize(pd.Series(keys, dtype=object), sort=False)
+        # Les codes de factorize sont numérotés par ordre d'apparition : np.unique les garde alignés
+        _, self.first, self.counts = np.unique(self.inverse, return_index=True, return_counts=True)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(row_keys(df))
+
+    @property
+    def n_rows(self):
+        return len(self.inverse)
+
+    @property
+    def n_unique(self):
+        return len(self.first)
+
+    def unique(self, values):
+        """Lignes uniques d'un DataFrame, d'une matrice (dense ou creuse) ou d'une liste."""
+        if isinstance(values, (pd.DataFrame, pd.Series)):
+            return values.iloc[self.first]
+        if isinstance(values, list):
+            return [values[i] for i in self.first]
+        return values[self.first]
+
+    def scatter(self, values, stage=None):
+        """Recopie les résultats calculés sur les lignes uniques vers toutes les lignes."""
+        if stage:
+            PIPELINE_STAGE_DUPLICATE_ROWS_TOTAL.labels(stage=stage).inc(self.n_rows - self.n_unique)
+        return np.asarray(values)[self.inverse]
+
+    def summary(self):
+        return f"{self.n_unique} lignes uniques sur {self.n_rows} ({self.n_rows / max(self.n_unique, 1):.1f}x)"
@@ -0,0 +1,122 @@
+# fast_vectorizer.py
+# -*- coding: utf-8 -*-
+# Vectorisation « vecteurs seuls » : doc.vector n'est que la moyenne des vecteurs de tokens,
+# on la calcule donc directement avec NumPy sur la table nlp.vocab.vectors, sans passer par
+# le pipeline spaCy ni construire un Doc par log.
+import os
+import re
+
+import numpy as np
+from spacy.attrs import ORTH
+
+# --- Configuration ---
+# Nombre maximal de fragments (mots séparés par des espaces) dont la tokenisation est mémorisée
+SPACY_FAST_TOKEN_CACHE_SIZE = int(os.getenv('SPACY_FAST_TOKEN_CACHE_SIZE', '500000'))
+# Nombre de logs agrégés par opération NumPy (borne la mémoire de la matrice intermédiaire)
+SPACY_FAST_BATCH_SIZE = int(os.getenv('SPACY_FAST_BATCH_SIZE', '4096'))
+# Nombre maximal de cases (logs x tokens) de la matrice d'indices complétée d'un groupe de logs :
+# un log très long n'agrandit que son propre groupe, pas tout le lot
+SPACY_FAST_PAD_CELLS = int(os.getenv('SPACY_FAST_PAD_CELLS', str(1 << 20)))
+
+# Texte dont la tokenisation spaCy se déduit de celle de ses mots : uniquement des espaces
+# simples entre des fragments non vides. Sinon (tabulations, retours ligne, espaces multiples
+# qui deviennent des tokens), on passe par le tokenizer spaCy complet.
+_IRREGULAR_WS_RE = re.compile(r'[^\S ]|  |^ | $')
+
+_EMPTY_ROWS = np.zeros(0, dtype=np.int64)
+
+
+class FastVectorizer:
+    """
+    Reproduit doc.vector (somme des vecteurs de tokens / nombre de tokens, les tokens sans
+    vecteur comptant pour zéro) par un gather sur la table de vecteurs, accumulé position par
+    position, puis une moyenne par log. Le tokenizer spaCy n'est appelé qu'une fois par
+    fragment distinct.
+    """
+
+    def __init__(self, nlp):
+        self.tokenizer = nlp.tokenizer
+        vectors = nlp.vocab.vectors
+        self.table = np.asarray(vectors.data, dtype=np.float32)
+        self.dim = nlp.vocab.vectors_length
+        self.vectors = vectors
+        self.attr = getattr(vectors, 'attr', ORTH)
+        self._rows_cache = {}
+
+    @staticmethod
+    def supports(nlp):
+        """Le raccourci n'est exact que pour des vecteurs statiques classiques (pas floret, pas de hook)."""
+        vectors = nlp.vocab.vectors
+        return vectors.size > 0 and getattr(vectors, 'mode', 'default') == 'default'
+
+    def _rows(self, text):
+        # Lignes de la table pour chaque token du texte (-1 = token sans vecteur)
+        doc = self.tokenizer(text)
+        if not len(doc):
+            return _EMPTY_ROWS
+        keys = doc.to_array([self.attr]).reshape(-1)
+        return np.asarray(self.vectors.find(keys=keys), dtype=np.int64)
+
+    def _fragment_rows(self, fragment):
+        rows = self._rows_cache.get(fragment)
+        if rows is None:
+            if len(self._rows_cache) >= SPACY_FAST_TOKEN_CACHE_SIZE:
+                self._rows_cache.clear()
+            rows = self._rows_cache[fragment] = self._rows(fragment)
+        return rows
+
+    def text_rows(self, text):
+        """Lignes de la table de vecteurs pour chaque token du texte, dans l'ordre."""
+        if not text:
+            return _EMPTY_ROWS
+        if _IRREGULAR_WS_RE.search(text):
+            return self._rows(text)
+        fragments = text.split(' ')
+        if len(fragments) == 1:
+            return self._fragment_rows(text)
+        return np.concatenate([self._fragment_rows(fragment) for fragment in fragments])
+
+    def __call__(self, texts):
+        """Retourne la matrice float32 (n, dim) des doc.vector des textes."""
+        texts = list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), SPACY_FAST_BATCH_SIZE):
+            self._mean_batch(texts[start:start + SPACY_FAST_BATCH_SIZE], out[start:start + SPACY_FAST_BATCH_SIZE])
+        return out
+
+    def _mean_batch(self, texts, out):
+        rows_per_text = [self.text_rows(text) for text in texts]
+        n_tokens = np.fromiter((len(rows) for rows in rows_per_text), dtype=np.int64, count=len(texts))
+        if not n_tokens.any():
+            return
+        # Trier les logs par longueur décroissante puis les traiter par groupes de longueurs
+        # voisines, chaque groupe ayant au plus SPACY_FAST_PAD_CELLS cases d'indices complétées
+        order = np.argsort(-n_tokens, kind='stable')
+        lengths = n_tokens[order]
+        sums = np.zeros((len(texts), self.dim), dtype=np.float32)
+        start = 0
+        while start < len(texts) and lengths[start] > 0:
+            end = min(len(texts), start + max(1, SPACY_FAST_PAD_CELLS // int(lengths[start])))
+            self._sum_sorted([rows_per_text[i] for i in order[start:end]], lengths[start:end], sums[start:end])
+            start = end
+        has_tokens = lengths > 0
+        sums[has_tokens] /= lengths[has_tokens, None].astype(np.float32)
+        out[order] = sums
+
+    def _sum_sorted(self, rows_per_text, lengths, sums):
+        # Logs triés par longueur décroissante : à l'étape k, seuls les `active` premiers logs ont
+        # encore un k-ième token. Les tokens sont additionnés dans leur ordre, comme la somme de
+        # doc.vector, pour obtenir exactement les mêmes valeurs float32.
+        padded = np.full((len(rows_per_text), lengths[0]), -1, dtype=np.int64)
+        for i, rows in enumerate(rows_per_text):
+            padded[i, :lengths[i]] = rows
+        for k in range(lengths[0]):
+            active = np.count_nonzero(lengths > k)
+            rows = padded[:active, k]
+            found = rows >= 0
+            # Les tokens sans vecteur ne contribuent qu'au dénominateur
+            if found.all():
+                sums[:active] += self.table[rows]
+            elif found.any():
+                index = np.flatnonzero(found)
+                sums[index] += self.table[rows[found]]
@@ -0,0 +1,141 @@
+# feature_store.py
+# -*- coding: utf-8 -*-
+# Stock de features partagé entre services : une matrice float32 au format .npy, ouverte par
+# les détecteurs via np.memmap (aucune copie, mémoire indépendante du nombre de lignes),
+# accompagnée d'un fichier JSON décrivant la correspondance ligne -> original_index et la
+# version du vectoriseur qui l'a produite.
+import json
+import os
+import struct
+
+import numpy as np
+
+# --- Configuration ---
+# Chemin du stock (sans extension) : <chemin>.npy pour la matrice, <chemin>.json pour les métadonnées
+FEATURE_STORE_PATH = os.getenv('FEATURE_STORE_PATH', '')
+
+FEATURE_STORE_FORMAT = 1
+# Taille réservée à l'en-tête .npy d'un stock écrit en flux : réécrit à la fin avec le nombre de
+# lignes final, il doit garder la même longueur quel que soit ce nombre
+STREAM_HEADER_BYTES = 128
+
+
+def _paths(path):
+    return path + '.npy', path + '.json'
+
+
+def _encode_index(original_index):
+    # Un index contigu (cas de clean()) est stocké comme un intervalle plutôt qu'une liste
+    original_index = np.asarray(original_index, dtype=np.int64)
+    if len(original_index) and np.array_equal(original_index, np.arange(original_index[0], original_index[0] + len(original_index))):
+        return {'start': int(original_index[0]), 'stop': int(original_index[0] + len(original_index))}
+    return original_index.tolist()
+
+
+def store_original_index(meta):
+    """Retourne l'original_index de chaque ligne du stock (tableau int64)."""
+    index = meta['original_index']
+    if isinstance(index, dict):
+        return np.arange(index['start'], index['stop'], dtype=np.int64)
+    return np.asarray(index, dtype=np.int64)
+
+
+def create_feature_store(path, rows, dim):
+    """Crée la matrice .npy sur disque et la retourne ouverte en écriture (memmap), à remplir par blocs."""
+    npy_path, _ = _paths(path)
+    os.makedirs(os.path.dirname(npy_path) or '.', exist_ok=True)
+    return np.lib.format.open_memmap(npy_path + '.tmp', mode='w+', dtype='<f4', shape=(rows, dim))
+
+
+def commit_feature_store(path, matrix, original_index, vectorizer_version, **extra):
+    """Finalise un stock créé par create_feature_store : flush, renommage atomique puis métadonnées."""
+    matrix.flush()
+    return _commit(path, original_index, vectorizer_version, **extra)
+
+
+def _npy_header(rows, dim):
+    # En-tête .npy version 1.0 d'une matrice float32 (rows, dim), complété par des espaces
+    # jusqu'à STREAM_HEADER_BYTES octets
+    header = repr({'descr': '<f4', 'fortran_order': False, 'shape': (rows, dim)})
+    prefix = np.lib.format.magic(1, 0)
+    size = STREAM_HEADER_BYTES - len(prefix) - 2
+    return prefix + struct.pack('<H', size) + (header.ljust(size - 1) + '\n').encode('latin1')
+
+
+class FeatureStream:
+    """
+    Stock écrit par blocs successifs quand le nombre de lignes n'est pas connu d'avance (fichier
+    lu en flux) : les vecteurs sont ajoutés en fin de fichier, l'en-tête .npy est complété par
+    commit(). Un stock non finalisé reste en <chemin>.npy.tmp et n'est jamais lu.
+    """
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self.rows = 0
+        npy_path, _ = _paths(path)
+        os.makedirs(os.path.dirname(npy_path) or '.', exist_ok=True)
+        self._file = open(npy_path + '.tmp', 'wb')
+        self._file.write(_npy_header(0, dim))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def append(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype='<f4').reshape(-1, self.dim)
+        self._file.write(vectors.tobytes())
+        self.rows += len(vectors)
+
+    def commit(self, original_index, vectorizer_version, **extra):
+        """Écrit l'en-tête final, ferme le fichier et publie le stock (renommage atomique puis métadonnées)."""
+        self._file.seek(0)
+        self._file.write(_npy_header(self.rows, self.dim))
+        self._file.close()
+        return _commit(self.path, original_index, vectorizer_version, **extra)
+
+
+def _commit(path, original_index, vectorizer_version, **extra):
+    npy_path, meta_path = _paths(path)
+    # Retirer d'abord les anciennes métadonnées : un lecteur ne doit jamais associer
+    # l'ancienne description à la nouvelle matrice
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    os.replace(npy_path + '.tmp', npy_path)
+    meta = {
+        'format': FEATURE_STORE_FORMAT,
+        'dtype': 'float32',
+        'vectorizer_version': vectorizer_version,
+        'original_index': _encode_index(original_index),
+        **extra,
+    }
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return meta
+
+
+def write_feature_store(path, vectors, original_index, vectorizer_version, **extra):
+    """Écrit une matrice déjà calculée dans le stock."""
+    vectors = np.asarray(vectors)
+    matrix = create_feature_store(path, *vectors.shape)
+    matrix[:] = vectors
+    return commit_feature_store(path, matrix, original_index, vectorizer_version, **extra)
+
+
+def open_feature_store(path):
+    """
+    Ouvre le stock en lecture seule via np.memmap (sans copie) et retourne (vecteurs, métadonnées),
+    ou None si le stock n'existe pas.
+    """
+    npy_path, meta_path = _paths(path)
+    if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    vectors = np.load(npy_path, mmap_mode='r')
+    if len(store_original_index(meta)) != len(vectors):
+        raise ValueError(f"Stock de features incohérent : {npy_path} et {meta_path} n'ont pas le même nombre de lignes")
+    return vectors, meta
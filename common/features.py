@@ -0,0 +1,126 @@
+# features.py
+# -*- coding: utf-8 -*-
+# Fonctions communes au service Spacy et aux détecteurs (Isolation Forest, One-Class SVM) :
+# nettoyage du CSV de logs, vecteurs de logs, features de lignes complètes et lecture du stock
+# de features partagé. Le service Flask (routes, jobs, annotations) reste dans Spacy/analyse_spacy2.py.
+# Les modules de common/ sont copiés dans chaque image ; hors Docker, ajouter le répertoire au
+# PYTHONPATH (ex. PYTHONPATH=../common python3 sklearn_isolationForest2.py).
+import numpy as np
+import pandas as pd
+from prometheus_client import Counter
+
+from feature_store import FEATURE_STORE_PATH, open_feature_store, store_original_index
+from featurizers import Featurizer, get_featurizer
+from log_loader import (SEVERITY_COLUMN, SPACY_CLEAN_COMPACT, compact_frame, iter_clean, load_clean_cache,
+                        memory_report, read_header, select_columns, source_fingerprint, write_clean_cache)
+from metrics import track_stage
+from row_text import ROW_TEXT_FIELDS, ROW_TEXT_FORMAT, serialize_rows
+from structured_features import StructuredEncoder, concat_features, text_frame
+from vectorizer import vectorize, vectorizer_version
+
+# Compteur pour le nombre de lignes nettoyées par la fonction clean
+SPACY_CLEANED_ROWS_TOTAL = Counter(
+    'spacy_cleaned_rows_total', 'Total number of rows processed by clean function'
+)
+
+
+def clean(title, chunksize=None, engine=None, use_cache=True, compact=None):
+    with track_stage('clean') as stage:
+        df = _clean(title, chunksize, engine, use_cache, compact)
+        stage.rows = len(df)
+    SPACY_CLEANED_ROWS_TOTAL.inc(len(df))
+
+    # Affichage des 70 premières lignes des colonnes importantes + la nouvelle colonne
+    print(df.head(70))
+
+    return df
+
+def _clean(title, chunksize, engine, use_cache, compact):
+    # Réutiliser le résultat en cache (Parquet) si le fichier source n'a pas changé
+    fingerprint = source_fingerprint(title) if use_cache else None
+    df = load_clean_cache(title, fingerprint) if use_cache else None
+    if df is None:
+        # Lire le fichier CSV par blocs, en ne chargeant que les colonnes importantes
+        # (les lignes mal formées sont ignorées, severity_unified est calculée bloc par bloc)
+        chunks = list(iter_clean(title, chunksize=chunksize, engine=engine))
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=select_columns(read_header(title)) + [SEVERITY_COLUMN])
+        if use_cache:
+            write_clean_cache(title, fingerprint, df)
+
+    # Mode compact : catégories, types numériques réduits, '-' -> valeur manquante
+    if SPACY_CLEAN_COMPACT if compact is None else compact:
+        compact_df = compact_frame(df)
+        memory_report(df, compact_df)
+        df = compact_df
+
+    return df
+
+def get_log_vectors(logs, batch_size=None, n_process=None, featurizer=None, fit=False):
+    # Fonction utilitaire pour obtenir les vecteurs de chaque log (modèle chargé une seule fois,
+    # traitement par lots via nlp.pipe, n_process > 1 pour répartir sur plusieurs cœurs).
+    # Retourne une matrice (n, dim) dans l'ordre des logs. Avec un autre featurizer que spaCy
+    # (voir featurizers.py), la matrice peut être creuse (scipy.sparse) : un nom crée un featurizer
+    # neuf appris sur ces logs ; une instance (celle apprise à l'entraînement) est appliquée avec
+    # transform(), ou apprise sur ces logs avec fit=True.
+    if isinstance(featurizer, Featurizer):
+        return featurizer.fit_transform(list(logs)) if fit else featurizer.transform(list(logs))
+    if featurizer and featurizer != "spacy":
+        return get_featurizer(featurizer).fit_transform(list(logs))
+    return vectorize(logs, batch_size=batch_size, n_process=n_process)
+
+def row_texts(df, fields=None):
+    # Texte d'une ligne complète ("champ=valeur" des champs renseignés, sans le label
+    # severity_unified), tel que le construisent les détecteurs à l'entraînement et au predict
+    with track_stage('row_text', rows=len(df)):
+        return serialize_rows(df, fields)
+
+def get_row_features(df, featurizer=None, encoder=None, batch_size=None):
+    # Features d'une ligne complète (DataFrame de clean(), label en dernière colonne) : les champs
+    # ECS numériques et catégoriels sont encodés directement (StructuredEncoder), seul le reste de
+    # la ligne passe par le featurizer de texte ; les deux sont concaténés.
+    # Retourne (features, encodeur). Sans encodeur, il est appris sur ces lignes (ainsi qu'un
+    # featurizer passé en instance) : le garder avec le modèle et le redonner, avec le même
+    # featurizer, pour transformer de nouvelles lignes exactement comme à l'entraînement.
+    fit = encoder is None
+    if fit:
+        encoder = StructuredEncoder().fit(df)
+    with track_stage('structured_features', rows=len(df)):
+        structured = encoder.transform(df)
+    text_vectors = get_log_vectors(row_texts(text_frame(df, encoder)), batch_size=batch_size, featurizer=featurizer, fit=fit)
+    return concat_features(text_vectors, structured), encoder
+
+def row_text_config():
+    # Paramètres qui déterminent le texte "row" (voir row_text.py)
+    return {"fields": ROW_TEXT_FIELDS, "format": ROW_TEXT_FORMAT}
+
+def load_features(original_index, path=None, text="row", source=None):
+    # Ouvre le stock de features en memmap s'il existe et correspond aux lignes attendues
+    # (même original_index, même version du vectoriseur, même texte vectorisé et, si source est
+    # donné, même contenu de fichier source) ; sinon retourne None
+    path = path or FEATURE_STORE_PATH
+    try:
+        store = open_feature_store(path) if path else None
+    except ValueError as e:
+        print(f"Stock de features {path} ignoré : {e}")
+        return None
+    if store is None:
+        return None
+    vectors, meta = store
+    if meta['vectorizer_version'] != vectorizer_version():
+        print(f"Stock de features {path} ignoré : vectoriseur {meta['vectorizer_version']} != {vectorizer_version()}")
+        return None
+    if meta.get('text') != text or (text == "row" and meta.get('row_text') != row_text_config()):
+        print(f"Stock de features {path} ignoré : texte {meta.get('text')} {meta.get('row_text') or ''}"
+              f" != {text} {row_text_config() if text == 'row' else ''} (à reconstruire avec text=\"{text}\")")
+        return None
+    if source is not None and meta.get('source_sha') != source_fingerprint(source)['sha']:
+        print(f"Stock de features {path} ignoré : il a été construit à partir d'un autre contenu que {source}")
+        return None
+    if not np.array_equal(store_original_index(meta), np.asarray(original_index)):
+        print(f"Stock de features {path} ignoré : les lignes ne correspondent pas au DataFrame nettoyé")
+        return None
+    print(f"Features lues depuis {path} (memmap, {vectors.shape[0]} lignes, texte : {meta.get('text')})")
+    return vectors
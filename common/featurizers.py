@@ -0,0 +1,122 @@
+# featurizers.py
+# -*- coding: utf-8 -*-
+# Registre des featurizers : chaque moteur transforme une liste de textes de logs en matrice
+# (n, dim), dense (NumPy) ou creuse (scipy.sparse). Le moteur est choisi par nom, par exemple
+# via LOG_FEATURIZER pour un déploiement donné.
+import os
+
+from vectorizer import vectorize
+
+# scikit-learn est optionnel : il n'est nécessaire qu'aux featurizers par hachage
+try:
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+except ImportError:
+    HashingVectorizer = None
+    TfidfTransformer = None
+
+# --- Configuration ---
+# Featurizer utilisé par les détecteurs ('spacy', 'hashing-tfidf' ou 'hashing')
+LOG_FEATURIZER = os.getenv('LOG_FEATURIZER', 'spacy')
+# Nombre de colonnes de l'espace haché (puissance de 2)
+LOG_HASH_FEATURES = int(os.getenv('LOG_HASH_FEATURES', str(2 ** 16)))
+# Taille maximale des n-grammes de mots
+LOG_HASH_NGRAM = int(os.getenv('LOG_HASH_NGRAM', '2'))
+
+# Tokens d'un log : suites de caractères hors espaces et séparateurs courants, pour garder
+# entiers les IP, chemins, noms de processus ou codes d'erreur
+LOG_TOKEN_PATTERN = r"[^\s,;=\"'()\[\]{}<>|]+"
+
+FEATURIZERS = {}
+
+
+def register_featurizer(name):
+    """Décorateur enregistrant une classe de featurizer sous un nom."""
+    def decorator(cls):
+        cls.name = name
+        FEATURIZERS[name] = cls
+        return cls
+    return decorator
+
+
+def get_featurizer(name=None, **params):
+    """Retourne une nouvelle instance du featurizer demandé (LOG_FEATURIZER par défaut)."""
+    name = name or LOG_FEATURIZER
+    if name not in FEATURIZERS:
+        raise ValueError(f"Featurizer inconnu : {name} (disponibles : {', '.join(sorted(FEATURIZERS))})")
+    return FEATURIZERS[name](**params)
+
+
+class Featurizer:
+    """
+    Interface commune : fit_transform() sur les logs d'entraînement, puis transform() sur de
+    nouveaux logs. `sparse` indique si la matrice produite est une matrice scipy.sparse.
+    """
+
+    name = None
+    sparse = False
+
+    def fit_transform(self, texts):
+        return self.transform(texts)
+
+    def transform(self, texts):
+        raise NotImplementedError
+
+
+@register_featurizer('spacy')
+class SpacyFeaturizer(Featurizer):
+    """Moyenne des vecteurs de mots spaCy (dense, 300 dimensions pour en_core_web_md)."""
+
+    def __init__(self, batch_size=None, n_process=None):
+        self.batch_size = batch_size
+        self.n_process = n_process
+
+    def transform(self, texts):
+        return vectorize(texts, batch_size=self.batch_size, n_process=self.n_process)
+
+
+@register_featurizer('hashing-tfidf')
+class HashingTfidfFeaturizer(Featurizer):
+    """
+    N-grammes de mots hachés dans un espace de taille fixe (aucun vocabulaire à apprendre),
+    pondérés par TF-IDF. Les tokens rares, souvent signes d'anomalie, gardent leur propre
+    colonne au lieu d'être noyés dans une moyenne.
+    """
+
+    sparse = True
+    use_idf = True
+
+    def __init__(self, n_features=None, ngram=None):
+        if HashingVectorizer is None:
+            raise ImportError("scikit-learn est requis pour les featurizers par hachage")
+        self.hasher = HashingVectorizer(
+            n_features=n_features or LOG_HASH_FEATURES, ngram_range=(1, ngram or LOG_HASH_NGRAM),
+            token_pattern=LOG_TOKEN_PATTERN, alternate_sign=False,
+            norm=None if self.use_idf else 'l2', dtype='float32',
+        )
+        self.tfidf = None
+
+    def _hash(self, texts):
+        return self.hasher.transform(["" if text is None else str(text) for text in texts])
+
+    def fit_transform(self, texts):
+        counts = self._hash(texts)
+        if not self.use_idf:
+            return counts
+        # Seuls les poids IDF sont appris (un par colonne hachée), pas de vocabulaire
+        self.tfidf = TfidfTransformer(sublinear_tf=True).fit(counts)
+        return self.tfidf.transform(counts).astype('float32')
+
+    def transform(self, texts):
+        counts = self._hash(texts)
+        if not self.use_idf:
+            return counts
+        if self.tfidf is None:
+            raise ValueError("fit_transform() doit être appelé avant transform() pour pondérer par TF-IDF")
+        return self.tfidf.transform(counts).astype('float32')
+
+
+@register_featurizer('hashing')
+class HashingFeaturizer(HashingTfidfFeaturizer):
+    """N-grammes hachés normalisés (L2), sans pondération IDF : entièrement sans état."""
+
+    use_idf = False
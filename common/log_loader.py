@@ -0,0 +1,539 @@
+# log_loader.py
+# -*- coding: utf-8 -*-
+# Lecture des exports de logs (CSV Elastic/ECS) pour clean() : en-tête lu d'abord, seules les
+# colonnes utiles sont chargées, avec des types explicites, bloc par bloc pour borner la mémoire.
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# pyarrow est optionnel : il n'est utilisé que si le moteur 'pyarrow' est demandé
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+# --- Configuration ---
+# Nombre de lignes par bloc (moteur pandas) ; le moteur pyarrow raisonne en octets
+SPACY_CLEAN_CHUNKSIZE = int(os.getenv('SPACY_CLEAN_CHUNKSIZE', '100000'))
+SPACY_CLEAN_BLOCK_BYTES = int(os.getenv('SPACY_CLEAN_BLOCK_BYTES', str(64 * 2**20)))
+# Moteur de lecture CSV : 'c' (pandas, par défaut) ou 'pyarrow' (multi-thread)
+SPACY_CSV_ENGINE = os.getenv('SPACY_CSV_ENGINE', 'c')
+# Répertoire du cache Parquet des DataFrames nettoyés (vide = cache désactivé)
+SPACY_CLEAN_CACHE_DIR = os.getenv('SPACY_CLEAN_CACHE_DIR', 'clean_cache')
+# Répertoire des points de reprise de l'ingestion incrémentale
+SPACY_CHECKPOINT_DIR = os.getenv('SPACY_CHECKPOINT_DIR', 'checkpoints')
+# Mode compact de clean() : catégories, types numériques réduits, '-' -> valeur manquante
+SPACY_CLEAN_COMPACT = os.getenv('SPACY_CLEAN_COMPACT', '0') == '1'
+# Part maximale de valeurs distinctes pour qu'une colonne texte devienne une catégorie
+SPACY_CATEGORY_MAX_RATIO = float(os.getenv('SPACY_CATEGORY_MAX_RATIO', '0.5'))
+
+# À incrémenter quand le résultat de clean() change pour un même fichier source
+CLEAN_CACHE_VERSION = 1
+
+# Liste des colonnes importantes à conserver
+COLONNES_IMPORTANTES = [
+    '@timestamp', '_score', 'agent.hostname', 'agent.name', 'agent.name.text', 'agent.type', 'agent.version',
+    'cisco.ios.facility', 'cisco.ios.message_count', 'client.address', 'component.binary',
+    'component.dataset', 'component.id', 'component.type', 'container.id', 'data_stream.dataset',
+    'data_stream.namespace', 'data_stream.type', 'destination.bytes', 'destination.ip',
+    'destination.mac', 'destination.packets', 'destination.port', 'ecs.version', 'elastic.agent.id',
+    'elastic_agent.id', 'elastic_agent.snapshot', 'elastic_agent.version', 'error.message',
+    'error.type', 'event.agent_id_status', 'event.code', 'event.created', 'event.dataset',
+    'event.duration', 'event.end', 'event.id', 'event.ingested', 'event.kind', 'event.module',
+    'event.provider', 'event.sequence', 'event.start', 'event.timezone', 'file.Ext.entropy',
+    'file.Ext.header_bytes', 'file.extension', 'file.name', 'host.containerized', 'host.domain',
+    'host.hostname', 'host.id', 'host.ip', 'host.mac', 'host.name', 'host.name.text',
+    'host.os.Ext.variant', 'host.os.build', 'host.os.codename', 'host.os.family',
+    'host.os.full', 'host.os.full.caseless', 'host.os.full.text', 'host.os.kernel',
+    'host.os.name', 'host.os.name.caseless', 'host.os.name.text', 'host.os.platform',
+    'host.os.type', 'host.os.version', 'http.request.body.bytes', 'http.request.id',
+    'http.request.method', 'http.response.body.bytes', 'http.response.status_code', 'http.version',
+    'id', 'input.type', 'log.file.device_id', 'log.file.idxhi', 'log.file.idxlo',
+    'log.file.inode', 'log.file.path', 'log.file.vol', 'log.logger', 'log.offset',
+    'log.origin.file.line', 'log.origin.file.name', 'log.origin.function', 'log.source',
+    'log.source.address', 'log.syslog.priority', 'message', 'network.bytes', 'network.community_id',
+    'network.direction', 'network.iana_number', 'network.packets', 'network.transport',
+    'network.type', 'network_traffic.flow.final', 'network_traffic.flow.id', 'observer.product',
+    'observer.type', 'observer.vendor', 'process.Ext.code_signature',
+    'process.code_signature.exists', 'process.code_signature.status',
+    'process.code_signature.subject_name', 'process.code_signature.trusted', 'process.entity_id',
+    'process.executable', 'process.executable.caseless', 'process.executable.text',
+    'process.name', 'process.name.caseless', 'process.name.text', 'process.parent.pid',
+    'process.pid', 'process.thread.id', 'related.ip', 'related.user', 'server.address',
+    'service.name', 'service.type', 'source.bytes', 'source.ip', 'source.mac',
+    'source.packets', 'source.port', 'state', 'syslog.facility', 'syslog.facility_label',
+    'syslog.priority', 'tags', 'tls.established', 'url.full', 'url.full.text',
+    'user.domain', 'user.id', 'user.name', 'user.name.text', 'winlog.activity_id',
+    'winlog.api', 'winlog.channel', 'winlog.computer_name', 'winlog.event_data.AccessList',
+    'winlog.event_data.AccessListDescription', 'winlog.event_data.AccessMask',
+    'winlog.event_data.AccessMaskDescription', 'winlog.event_data.AuthenticationPackageName',
+    'winlog.event_data.Binary', 'winlog.event_data.Direction', 'winlog.event_data.ElevatedToken',
+    'winlog.event_data.FilterRTID', 'winlog.event_data.HandleId', 'winlog.event_data.KeyLength',
+    'winlog.event_data.LayerName', 'winlog.event_data.LayerNameDescription',
+    'winlog.event_data.LayerRTID', 'winlog.event_data.LogonProcessName',
+    'winlog.event_data.LogonType', 'winlog.event_data.ObjectName',
+    'winlog.event_data.ObjectServer', 'winlog.event_data.ObjectType',
+    'winlog.event_data.PrivilegeList', 'winlog.event_data.ProcessID',
+    'winlog.event_data.ProcessId', 'winlog.event_data.ProcessName',
+    'winlog.event_data.Protocol', 'winlog.event_data.RemoteMachineDescription',
+    'winlog.event_data.RemoteMachineID', 'winlog.event_data.RemoteUserDescription',
+    'winlog.event_data.RemoteUserID', 'winlog.event_data.RestrictedSidCount',
+    'winlog.event_data.SourceHandleId', 'winlog.event_data.SourceProcessId',
+    'winlog.event_data.SubjectDomainName', 'winlog.event_data.SubjectLogonId',
+    'winlog.event_data.SubjectUserName', 'winlog.event_data.SubjectUserSid',
+    'winlog.event_data.TargetDomainName', 'winlog.event_data.TargetHandleId',
+    'winlog.event_data.TargetLinkedLogonId', 'winlog.event_data.TargetLogonId',
+    'winlog.event_data.TargetProcessId', 'winlog.event_data.TargetUserName',
+    'winlog.event_data.TargetUserSid', 'winlog.event_data.VirtualAccount',
+    'winlog.event_data.param1', 'winlog.event_data.param2', 'winlog.event_id',
+    'winlog.keywords', 'winlog.logon.id', 'winlog.logon.type', 'winlog.opcode',
+    'winlog.process.pid', 'winlog.process.thread.id', 'winlog.provider_name',
+    'winlog.record_id', 'winlog.task', 'event.severity', 'event.category',
+    'event.type', 'event.action', 'syslog.severity_label', 'log.level'
+]
+
+# Champs ECS numériques (convertis dans le plus petit type numérique qui convient en mode compact)
+COLONNES_NUMERIQUES = [
+    '_score', 'cisco.ios.message_count', 'destination.bytes', 'destination.packets', 'destination.port',
+    'event.duration', 'event.sequence', 'file.Ext.entropy', 'http.request.body.bytes',
+    'http.response.body.bytes', 'http.response.status_code', 'log.file.device_id', 'log.file.idxhi',
+    'log.file.idxlo', 'log.file.inode', 'log.file.vol', 'log.offset', 'log.origin.file.line',
+    'log.syslog.priority', 'network.bytes', 'network.iana_number', 'network.packets',
+    'process.parent.pid', 'process.pid', 'process.thread.id', 'source.bytes', 'source.packets',
+    'source.port', 'syslog.facility', 'syslog.priority', 'winlog.event_data.KeyLength',
+    'winlog.event_data.RestrictedSidCount', 'winlog.event_id', 'winlog.process.pid',
+    'winlog.process.thread.id', 'winlog.record_id',
+]
+# Valeur « vide » des exports Kibana
+PLACEHOLDER = '-'
+
+# Colonne ajoutée par clean(), toujours en dernière position (les détecteurs s'en servent comme label)
+SEVERITY_COLUMN = 'severity_unified'
+
+
+def read_header(title):
+    """Noms des colonnes du fichier, sans lire les données."""
+    return pd.read_csv(title, sep=",", nrows=0).columns.tolist()
+
+
+def select_columns(header, columns=None):
+    """Colonnes à charger : celles demandées (par défaut COLONNES_IMPORTANTES) présentes dans le fichier."""
+    present = set(header)
+    return [col for col in (columns or COLONNES_IMPORTANTES) if col in present]
+
+
+def add_severity(df):
+    """Fusionner log.level et syslog.severity_label dans une seule colonne (en dernière position)."""
+    df[SEVERITY_COLUMN] = df['log.level'].where(df['log.level'] != '-', df['syslog.severity_label'])
+    return df
+
+
+def iter_clean(title, columns=None, chunksize=None, engine=None):
+    """
+    Lit le fichier bloc par bloc et produit des DataFrames ne contenant que les colonnes utiles
+    (toutes en chaînes, comme à l'export) suivies de severity_unified. Les lignes mal formées
+    sont ignorées. La mémoire utilisée est bornée par la taille d'un bloc.
+    """
+    engine = engine or SPACY_CSV_ENGINE
+    usecols = select_columns(read_header(title), columns)
+    # log.level et syslog.severity_label sont nécessaires au calcul de severity_unified
+    needed = usecols + [col for col in ('log.level', 'syslog.severity_label') if col not in usecols]
+
+    if engine == 'pyarrow':
+        chunks = _iter_pyarrow(title, needed)
+    else:
+        chunks = pd.read_csv(
+            title, sep=",", usecols=needed, dtype={col: str for col in needed},
+            on_bad_lines='skip', chunksize=chunksize or SPACY_CLEAN_CHUNKSIZE, engine=engine,
+        )
+    for chunk in chunks:
+        yield add_severity(chunk)[usecols + [SEVERITY_COLUMN]]
+
+
+def estimate_rows(title, sample_bytes=4 * 2**20):
+    """
+    Nombre de lignes du fichier estimé sans le lire en entier : taille du fichier divisée par la
+    taille moyenne d'une ligne sur les premiers sample_bytes octets (avancement des lectures en flux).
+    """
+    size = os.path.getsize(title)
+    with open(title, 'rb') as f:
+        sample = f.read(sample_bytes)
+    newlines = sample.count(b'\n')
+    if not newlines:
+        return 0
+    # La première ligne est l'en-tête
+    return max(0, round(size * newlines / len(sample)) - 1)
+
+
+def _iter_pyarrow(title, columns):
+    # Lecture en flux multi-thread : un RecordBatch par bloc de SPACY_CLEAN_BLOCK_BYTES octets
+    if pa_csv is None:
+        raise ValueError("pyarrow n'est pas installé : moteur CSV 'pyarrow' indisponible")
+    reader = pa_csv.open_csv(
+        title,
+        read_options=pa_csv.ReadOptions(block_size=SPACY_CLEAN_BLOCK_BYTES, use_threads=True),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda row: 'skip'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas()[columns]
+
+
+# --- Mode compact ---
+
+def format_value(value):
+    """
+    Texte d'une valeur tel qu'il apparaît dans le texte des lignes (row_text) : un float entier
+    (colonne compactée à cause des manquants) s'écrit comme l'entier d'origine ; None pour une
+    valeur vide ou '-'.
+    """
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return None if text in ('', PLACEHOLDER) else text
+
+
+def _same_text(values, numbers):
+    # Le type numérique ne doit changer aucune valeur : chaque paire (texte, nombre) distincte
+    # doit se réécrire à l'identique
+    present = values.notna()
+    pairs = pd.DataFrame({'text': values[present].astype(str).str.strip(), 'number': numbers[present]})
+    pairs = pairs.drop_duplicates()
+    return all(format_value(number) == text for text, number in zip(pairs['text'], pairs['number'].astype(object)))
+
+
+def _smallest_numeric(values):
+    # Entiers : plus petit type entier nullable qui contient toutes les valeurs ; sinon float32
+    present = values.dropna()
+    if present.empty:
+        return values.astype('Int8')
+    if (present == np.floor(present)).all():
+        low, high = present.min(), present.max()
+        for dtype in ('Int8', 'UInt8', 'Int16', 'UInt16', 'Int32', 'UInt32', 'Int64', 'UInt64'):
+            info = np.iinfo(dtype.lower())
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+    return values.astype('float32')
+
+
+def compact_frame(df, numeric_columns=None, max_category_ratio=None):
+    """
+    Réduit la mémoire du DataFrame nettoyé : '-' devient une valeur manquante, les champs ECS
+    numériques passent au plus petit type numérique possible et les colonnes texte peu variées
+    deviennent des catégories. severity_unified garde ses valeurs (y compris '-') en catégorie.
+    """
+    numeric_columns = set(COLONNES_NUMERIQUES if numeric_columns is None else numeric_columns)
+    max_category_ratio = SPACY_CATEGORY_MAX_RATIO if max_category_ratio is None else max_category_ratio
+    compact = {}
+    for col in df.columns:
+        values = df[col]
+        if col == SEVERITY_COLUMN:
+            compact[col] = values.astype('category')
+            continue
+        values = values.mask(values == PLACEHOLDER)
+        if col in numeric_columns:
+            # Types nullables : les entiers sont lus exactement, sans passer par float64 (les
+            # identifiants 64 bits au-delà de 2^53 perdraient leurs derniers chiffres)
+            numbers = pd.to_numeric(values, errors='coerce', dtype_backend='numpy_nullable')
+            # Ne convertir que si toutes les valeurs présentes sont bien numériques, et que le
+            # type retenu réécrit chaque valeur à l'identique (sinon la colonne reste du texte)
+            if numbers.notna().sum() == values.notna().sum():
+                converted = next((candidate for candidate in (_smallest_numeric(numbers), numbers)
+                                  if _same_text(values, candidate)), None)
+                if converted is not None:
+                    compact[col] = converted
+                    continue
+        if values.nunique(dropna=True) <= max_category_ratio * max(len(values), 1):
+            values = values.astype('category')
+        compact[col] = values
+    return pd.DataFrame(compact, index=df.index)
+
+
+def memory_report(before, after):
+    """Affiche la mémoire occupée avant et après compactage."""
+    size_before = before.memory_usage(deep=True).sum()
+    size_after = after.memory_usage(deep=True).sum()
+    ratio = size_before / size_after if size_after else float('inf')
+    print(f"Mémoire du DataFrame nettoyé : {size_before / 2**20:.1f} Mo -> {size_after / 2**20:.1f} Mo (÷{ratio:.1f})")
+    return size_before, size_after
+
+
+# --- Cache Parquet du DataFrame nettoyé ---
+
+def source_fingerprint(title, columns=None):
+    """Empreinte du fichier source : taille, mtime, hash du contenu et paramètres de nettoyage."""
+    stat = os.stat(title)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(title, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha': digest.hexdigest(),
+        'columns': hashlib.blake2b('\n'.join(columns or COLONNES_IMPORTANTES).encode('utf-8'), digest_size=8).hexdigest(),
+        'version': CLEAN_CACHE_VERSION,
+    }
+
+
+def _cache_paths(title, cache_dir):
+    base = os.path.join(cache_dir, os.path.basename(title))
+    return base + '.parquet', base + '.json'
+
+
+def load_clean_cache(title, fingerprint, cache_dir=None):
+    """Retourne le DataFrame nettoyé en cache pour cette empreinte, ou None."""
+    cache_dir = SPACY_CLEAN_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir or pa is None:
+        return None
+    parquet_path, meta_path = _cache_paths(title, cache_dir)
+    try:
+        with open(meta_path) as f:
+            if json.load(f) != fingerprint:
+                return None
+        return pd.read_parquet(parquet_path)
+    except (OSError, ValueError):
+        return None
+
+
+def write_clean_cache(title, fingerprint, df, cache_dir=None):
+    """Écrit le DataFrame nettoyé en Parquet (écriture atomique : fichier temporaire puis rename)."""
+    cache_dir = SPACY_CLEAN_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir or pa is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, meta_path = _cache_paths(title, cache_dir)
+    try:
+        df.to_parquet(parquet_path + '.tmp', index=False)
+        os.replace(parquet_path + '.tmp', parquet_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(fingerprint, f)
+        os.replace(meta_path + '.tmp', meta_path)
+    except (OSError, ValueError) as e:
+        print(f"Cache Parquet non écrit pour {title} : {e}")
+
+
+# --- Ingestion incrémentale (fin de fichier) ---
+
+class _BoundedReader:
+    """Vue en lecture seule d'un fichier binaire limitée à [position courante, end)."""
+
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def read(self, size=-1):
+        remaining = self.end - self.f.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.f.read(size)
+
+    def __iter__(self):
+        while True:
+            line = self.f.readline(max(self.end - self.f.tell(), 0))
+            if not line:
+                return
+            yield line
+
+
+def _checkpoint_path(title, checkpoint_dir=None):
+    checkpoint_dir = SPACY_CHECKPOINT_DIR if checkpoint_dir is None else checkpoint_dir
+    return os.path.join(checkpoint_dir, os.path.basename(title) + '.checkpoint.json')
+
+
+def load_checkpoint(title, checkpoint_dir=None):
+    """Point de reprise enregistré pour ce fichier, ou None."""
+    try:
+        with open(_checkpoint_path(title, checkpoint_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(title, checkpoint, checkpoint_dir=None):
+    """Enregistre le point de reprise (écriture atomique). À appeler une fois le delta traité."""
+    path = _checkpoint_path(title, checkpoint_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+
+@contextmanager
+def checkpoint_lock(title, checkpoint_dir=None):
+    """
+    Verrou exclusif inter-processus (fcntl.flock) sur le point de reprise du fichier : à tenir de
+    load_checkpoint à save_checkpoint, pour que deux appels concurrents (workers gunicorn, threads)
+    ne lisent pas le même offset et ne traitent pas deux fois le même delta.
+    """
+    path = _checkpoint_path(title, checkpoint_dir) + '.lock'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def end_checkpoint(title, rows):
+    """
+    Point de reprise placé après le dernier enregistrement complet actuel du fichier, `rows`
+    lignes ayant déjà été traitées (par exemple par clean() sur le fichier complet) : le
+    read_tail suivant ne lira que les lignes ajoutées ensuite.
+    """
+    stat = os.stat(title)
+    header = read_header(title)
+    with open(title, 'rb') as f:
+        header_end = len(f.readline())
+        end = _last_record_end(f, header_end, stat.st_size)
+    return {'inode': stat.st_ino, 'header': header, 'offset': end, 'rows': int(rows)}
+
+
+def _last_record_end(f, start, end, block_size=2**20):
+    """
+    Position qui suit le dernier retour à la ligne hors guillemets dans [start, end), ou start :
+    un message entre guillemets peut contenir des retours à la ligne, et un enregistrement en
+    cours d'écriture s'arrêter au milieu. start doit être une frontière d'enregistrement.
+    """
+    f.seek(start)
+    boundary = position = start
+    quotes_before = 0  # parité des guillemets depuis start (un "" échappé compte deux fois)
+    while position < end:
+        block = np.frombuffer(f.read(min(block_size, end - position)), dtype=np.uint8)
+        if not len(block):
+            break
+        quotes = np.cumsum(block == ord('"')) + quotes_before
+        newlines = np.flatnonzero((block == ord('\n')) & (quotes % 2 == 0))
+        if len(newlines):
+            boundary = position + int(newlines[-1]) + 1
+        quotes_before = int(quotes[-1]) % 2
+        position += len(block)
+    return boundary
+
+
+def read_tail(title, checkpoint=None, columns=None, chunksize=None):
+    """
+    Lit uniquement les lignes ajoutées depuis le point de reprise (offset en octets) et retourne
+    (delta nettoyé, nouveau point de reprise). L'index du delta continue la numérotation des
+    lignes déjà traitées, comme l'index de clean() sur le fichier complet. Si le fichier a été
+    remplacé, tronqué ou si son en-tête a changé, la lecture repart du début.
+    Seuls les enregistrements complets (terminés par un retour à la ligne hors guillemets) sont
+    lus ; si le delta ne peut pas être analysé, il est laissé pour l'appel suivant (delta vide,
+    point de reprise inchangé).
+    """
+    stat = os.stat(title)
+    header = read_header(title)
+    usecols = select_columns(header, columns)
+    needed = usecols + [col for col in ('log.level', 'syslog.severity_label') if col not in usecols]
+
+    with open(title, 'rb') as f:
+        header_end = len(f.readline())
+        valid = (
+            checkpoint is not None
+            and checkpoint.get('inode') == stat.st_ino
+            and checkpoint.get('header') == header
+            and header_end <= checkpoint.get('offset', -1) <= stat.st_size
+        )
+        offset = checkpoint['offset'] if valid else header_end
+        rows = checkpoint['rows'] if valid else 0
+
+        # Ne pas lire un dernier enregistrement en cours d'écriture (y compris un message
+        # multi-ligne entre guillemets) : s'arrêter au dernier retour à la ligne hors guillemets
+        end = _last_record_end(f, offset, stat.st_size)
+
+        chunks = []
+        if end > offset:
+            f.seek(offset)
+            reader = pd.read_csv(
+                _BoundedReader(f, end), sep=",", header=None, names=header, usecols=needed,
+                dtype={col: str for col in needed}, on_bad_lines='skip',
+                chunksize=chunksize or SPACY_CLEAN_CHUNKSIZE,
+            )
+            try:
+                chunks = [add_severity(chunk)[usecols + [SEVERITY_COLUMN]] for chunk in reader]
+            except pd.errors.ParserError as e:
+                # Delta illisible pour l'instant : rien n'est renvoyé ni consommé
+                print(f"Fin de {title} ignorée jusqu'au prochain appel : {e}")
+                chunks, end = [], offset
+
+    if chunks:
+        delta = pd.concat(chunks, ignore_index=True)
+    else:
+        delta = pd.DataFrame(columns=usecols + [SEVERITY_COLUMN])
+    delta.index = pd.RangeIndex(rows, rows + len(delta))
+
+    new_checkpoint = {
+        'inode': stat.st_ino,
+        'header': header,
+        'offset': max(end, offset),
+        'rows': rows + len(delta),
+    }
+    return delta, new_checkpoint
+
+
+# --- Fichiers CSV reçus en flux (upload HTTP) ---
+
+class _ChunkReader:
+    """Fichier binaire en lecture seule alimenté par un itérable de blocs d'octets, consommé au fil de l'eau."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size is None or size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def readline(self, size=-1):
+        while b'\n' not in self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        end = self.buffer.find(b'\n') + 1 or len(self.buffer)
+        if size is not None and 0 <= size < end:
+            end = size
+        line, self.buffer = self.buffer[:end], self.buffer[end:]
+        return line
+
+
+def iter_upload_texts(chunks, column='message', chunksize=None):
+    """
+    Lit un CSV reçu en flux (itérable de blocs d'octets) et produit, bloc par bloc, la liste des
+    textes de la colonne demandée. Seul un bloc de lignes est gardé en mémoire, jamais le fichier.
+    """
+    reader = pd.read_csv(
+        _ChunkReader(chunks), sep=",", usecols=[column], dtype={column: str},
+        on_bad_lines='skip', chunksize=chunksize or SPACY_CLEAN_CHUNKSIZE,
+    )
+    for chunk in reader:
+        yield chunk[column].tolist()
@@ -0,0 +1,89 @@
+# metrics.py
+# -*- coding: utf-8 -*-
+# Instrumentation des étapes du pipeline (clean, vectorisation, entraînement, scoring),
+# partagée par le service Spacy et les détecteurs. Chaque étape enregistre sa latence,
+# son nombre de lignes, son débit (lignes/s), la taille de ses lots et ses erreurs.
+import functools
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# --- MÉTRIQUES PROMETHEUS PAR ÉTAPE ---
+# Histogramme de la durée de chaque étape
+PIPELINE_STAGE_LATENCY_SECONDS = Histogram(
+    'pipeline_stage_latency_seconds', 'Latency of each pipeline stage in seconds', ['stage'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+# Compteur des lignes traitées par étape (rate() donne le débit moyen dans Grafana)
+PIPELINE_STAGE_ROWS_TOTAL = Counter(
+    'pipeline_stage_rows_total', 'Rows processed by each pipeline stage', ['stage']
+)
+# Jauge du débit de la dernière exécution de chaque étape
+PIPELINE_STAGE_ROWS_PER_SECOND = Gauge(
+    'pipeline_stage_rows_per_second', 'Throughput (rows/s) of the last run of each pipeline stage', ['stage']
+)
+# Histogramme de la taille des lots traités par étape
+PIPELINE_STAGE_BATCH_SIZE = Histogram(
+    'pipeline_stage_batch_size', 'Number of rows per batch for each pipeline stage', ['stage'],
+    buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000),
+)
+# Compteur des erreurs par étape
+PIPELINE_STAGE_ERRORS_TOTAL = Counter(
+    'pipeline_stage_errors_total', 'Errors raised by each pipeline stage', ['stage']
+)
+# Compteur des lignes dupliquées dont le résultat est recopié au lieu d'être recalculé
+PIPELINE_STAGE_DUPLICATE_ROWS_TOTAL = Counter(
+    'pipeline_stage_duplicate_rows_total', 'Duplicate rows served from a unique row by each pipeline stage', ['stage']
+)
+
+
+class StageRun:
+    """Exécution en cours d'une étape ; `rows` peut être renseigné une fois le résultat connu."""
+
+    def __init__(self, stage, rows=None):
+        self.stage = stage
+        self.rows = rows
+
+
+@contextmanager
+def track_stage(stage, rows=None):
+    """
+    Mesure une étape du pipeline :
+
+        with track_stage('clean') as run:
+            df = ...
+            run.rows = len(df)
+    """
+    run = StageRun(stage, rows)
+    start = time.perf_counter()
+    try:
+        yield run
+    except Exception:
+        PIPELINE_STAGE_ERRORS_TOTAL.labels(stage=stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        PIPELINE_STAGE_LATENCY_SECONDS.labels(stage=stage).observe(elapsed)
+        if run.rows is not None:
+            PIPELINE_STAGE_ROWS_TOTAL.labels(stage=stage).inc(run.rows)
+            PIPELINE_STAGE_BATCH_SIZE.labels(stage=stage).observe(run.rows)
+            if elapsed > 0:
+                PIPELINE_STAGE_ROWS_PER_SECOND.labels(stage=stage).set(run.rows / elapsed)
+
+
+def instrument_stage(stage, rows=len):
+    """
+    Décorateur équivalent à track_stage ; `rows` calcule le nombre de lignes à partir du
+    résultat de la fonction (None pour ne pas compter de lignes).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage) as run:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    run.rows = rows(result)
+                return result
+        return wrapper
+    return decorator
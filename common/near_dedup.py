@@ -0,0 +1,128 @@
+# near_dedup.py
+# -*- coding: utf-8 -*-
+# Regroupement des quasi-doublons (MinHash + LSH par bandes) : beaucoup de logs ne diffèrent
+# que par un compteur ou un identifiant d'enregistrement. Chaque texte sérialisé est réduit à
+# une signature MinHash de ses shingles (n-grammes de tokens "champ=valeur") ; les lignes dont
+# une bande de la signature est identique sont candidates, et regroupées si leur similarité de
+# Jaccard estimée atteint le seuil. Chaque groupe est représenté par sa première ligne, pondérée
+# par la taille du groupe (l'entraînement du One-Class SVM est superlinéaire en nombre de lignes).
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from dedup import RowDedup, row_keys
+
+# --- Configuration ---
+# Entraîner le One-Class SVM sur un représentant pondéré par groupe de quasi-doublons (0 pour désactiver)
+LOG_NEAR_DEDUP = os.getenv('LOG_NEAR_DEDUP', '0') == '1'
+# Similarité de Jaccard (estimée sur les signatures) à partir de laquelle deux lignes sont regroupées
+LOG_NEAR_DEDUP_THRESHOLD = float(os.getenv('LOG_NEAR_DEDUP_THRESHOLD', '0.9'))
+# Nombre de permutations MinHash (longueur des signatures)
+LOG_NEAR_DEDUP_PERMUTATIONS = int(os.getenv('LOG_NEAR_DEDUP_PERMUTATIONS', '128'))
+# Taille des shingles, en tokens
+LOG_NEAR_DEDUP_SHINGLE_SIZE = int(os.getenv('LOG_NEAR_DEDUP_SHINGLE_SIZE', '1'))
+
+# Permutations par multiplication-décalage : h(x) = ((a*x + b) mod 2^64) >> 32, a impair, sur le
+# crc32 de chaque shingle (le débordement des uint64 numpy fait le modulo)
+_SHIFT = np.uint64(32)
+_EMPTY = np.uint64(1 << 32)
+_SEED = 1
+# Nombre maximal de (shingle, permutation) évalués à la fois lors du calcul des signatures
+_CHUNK_CELLS = 1 << 24
+
+
+def shingles(text, size=None):
+    """Ensemble des n-grammes de tokens d'un texte (le texte entier s'il a moins de size tokens)."""
+    size = size or LOG_NEAR_DEDUP_SHINGLE_SIZE
+    tokens = text.split()
+    if len(tokens) <= size:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def lsh_params(threshold, num_perm):
+    """
+    (bandes, lignes par bande) : le couple dont le seuil de la courbe en S, (1/b)^(1/r), est le
+    plus proche de la similarité voulue.
+    """
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1)]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def minhash_signatures(texts, num_perm=None, size=None):
+    """Matrice (n, num_perm) uint64 des signatures MinHash des textes."""
+    num_perm = num_perm or LOG_NEAR_DEDUP_PERMUTATIONS
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    # Chaque shingle distinct du corpus n'est haché qu'une fois
+    row_shingles = [shingles(text, size) for text in texts]
+    lengths = np.array([len(found) for found in row_shingles], dtype=np.int64)
+    ids, vocabulary = pd.factorize(pd.Series([shingle for found in row_shingles for shingle in found], dtype=object))
+    hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in vocabulary], dtype=np.uint64)
+
+    # Texte sans shingle : signature hors de l'intervalle des hachés (les textes vides se regroupent entre eux)
+    signatures = np.full((len(texts), num_perm), _EMPTY, dtype=np.uint64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    rows = np.flatnonzero(lengths)
+    step = max(1, _CHUNK_CELLS // (num_perm * max(int(lengths.mean()) if len(lengths) else 1, 1)))
+    for start in range(0, len(rows), step):
+        chunk = rows[start:start + step]
+        # Shingles des lignes du lot, contigus : minimum par ligne avec reduceat
+        members = np.concatenate([ids[offsets[row]:offsets[row + 1]] for row in chunk])
+        permuted = (np.outer(hashes[members], a) + b) >> _SHIFT
+        starts = np.concatenate(([0], np.cumsum(lengths[chunk])[:-1]))
+        signatures[chunk] = np.minimum.reduceat(permuted, starts, axis=0)
+    return signatures
+
+
+def near_duplicate_clusters(texts, threshold=None, num_perm=None, size=None):
+    """
+    Groupe de chaque texte (entiers, numérotés par ordre d'apparition du groupe) : composantes
+    connexes des paires candidates LSH dont la similarité estimée atteint le seuil.
+    """
+    threshold = LOG_NEAR_DEDUP_THRESHOLD if threshold is None else threshold
+    num_perm = num_perm or LOG_NEAR_DEDUP_PERMUTATIONS
+    # Textes identiques : une seule signature
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object).fillna(''), sort=False)
+    if not len(uniques):
+        return codes
+    signatures = minhash_signatures(list(uniques), num_perm, size)
+    n = len(uniques)
+
+    bands, band_rows = lsh_params(threshold, num_perm)
+    sources, targets = [], []
+    for band in range(bands):
+        keys = np.ascontiguousarray(signatures[:, band * band_rows:(band + 1) * band_rows])
+        buckets, _ = pd.factorize(pd.Series(keys.view(np.dtype((np.void, keys.dtype.itemsize * band_rows))).ravel()))
+        # Chaque ligne d'un seau est comparée au premier membre du seau
+        _, leaders = np.unique(buckets, return_index=True)
+        leader = leaders[buckets]
+        candidates = np.flatnonzero(leader != np.arange(n))
+        if not len(candidates):
+            continue
+        similarity = (signatures[candidates] == signatures[leader[candidates]]).mean(axis=1)
+        keep = similarity >= threshold
+        sources.append(candidates[keep])
+        targets.append(leader[candidates][keep])
+
+    if sources:
+        sources, targets = np.concatenate(sources), np.concatenate(targets)
+    else:
+        sources = targets = np.array([], dtype=np.int64)
+    graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels[codes]
+
+
+def near_dedup(df, threshold=None):
+    """
+    RowDedup des groupes de quasi-doublons d'un DataFrame : first (représentant de chaque groupe,
+    sa première ligne), inverse (groupe de chaque ligne) et counts (poids de chaque représentant).
+    """
+    return RowDedup(near_duplicate_clusters(row_keys(df), threshold))
@@ -0,0 +1,75 @@
+# quantization.py
+# -*- coding: utf-8 -*-
+# Stockage des vecteurs en précision réduite : float32 (référence), float16, ou int8 quantifié
+# avec un facteur d'échelle par dimension (x ≈ code * scale[dim], code dans [-127, 127]).
+import os
+
+import numpy as np
+
+# --- Configuration ---
+# Précision des matrices données aux modèles dans les détecteurs ('float32', 'float16' ou 'int8')
+VECTOR_PRECISION = os.getenv('VECTOR_PRECISION', 'float32')
+
+PRECISIONS = ('float32', 'float16', 'int8')
+# Type de stockage (little-endian) de chaque précision
+STORAGE_DTYPES = {'float32': np.dtype('<f4'), 'float16': np.dtype('<f2'), 'int8': np.dtype('i1')}
+INT8_MAX = 127
+
+
+def check_precision(precision):
+    if precision not in PRECISIONS:
+        raise ValueError(f"Précision inconnue : {precision} (disponibles : {', '.join(PRECISIONS)})")
+    return precision
+
+
+def dimension_scales(vectors):
+    """Facteur d'échelle int8 de chaque dimension : max |x| / 127 (1 pour une dimension toujours nulle)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not len(vectors):
+        return np.ones(vectors.shape[1] if vectors.ndim == 2 else 0, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=0) / INT8_MAX
+    return np.where(scales > 0, scales, 1.0).astype(np.float32)
+
+
+def quantize(vectors, precision, scales=None):
+    """
+    Retourne (codes, scales) : la matrice dans le type de stockage de la précision demandée et,
+    en int8, les facteurs d'échelle par dimension (calculés sur les données si non fournis).
+    """
+    check_precision(precision)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if precision != 'int8':
+        return vectors.astype(STORAGE_DTYPES[precision], copy=False), None
+    scales = dimension_scales(vectors) if scales is None else np.asarray(scales, dtype=np.float32)
+    codes = np.clip(np.rint(vectors / scales), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return codes, scales
+
+
+def dequantize(codes, scales=None):
+    """Matrice float32 reconstruite à partir de codes (et des échelles en int8)."""
+    if scales is None:
+        return np.asarray(codes, dtype=np.float32)
+    return np.asarray(codes, dtype=np.float32) * scales
+
+
+def input_scales(vectors, precision=None):
+    """
+    Échelles int8 des matrices données au modèle, à calculer une fois sur la matrice
+    d'entraînement (None hors int8).
+    """
+    if (precision or VECTOR_PRECISION) != 'int8':
+        return None
+    return dimension_scales(vectors)
+
+
+def as_model_input(vectors, precision=None, scales=None):
+    """
+    Matrice dense convertie dans la précision demandée pour l'entraînement et le scoring.
+    En int8, les codes sont passés sans les échelles : l'Isolation Forest (seuils tirés entre le
+    min et le max de chaque dimension) et le StandardScaler de l'OCSVM sont insensibles à un
+    facteur d'échelle par dimension, seul l'arrondi de quantification change le résultat.
+    Les échelles doivent être celles de l'entraînement (input_scales) : recalculées sur un autre
+    lot, elles changeraient la valeur des codes et donc les scores.
+    """
+    codes, _ = quantize(vectors, precision or VECTOR_PRECISION, scales)
+    return codes
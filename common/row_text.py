@@ -0,0 +1,66 @@
+# row_text.py
+# -*- coding: utf-8 -*-
+# Sérialisation des lignes de logs en texte pour la vectorisation : "champ=valeur" pour chaque
+# champ renseigné, construit colonne par colonne (opérations vectorisées, pas de boucle Python
+# par ligne). Les valeurs manquantes et les '-' des exports Kibana sont ignorés : ils ajoutaient
+# des tokens sans information. Entraînement et prédiction produisent le même texte, octet pour
+# octet, pour une même ligne.
+import os
+
+import numpy as np
+import pandas as pd
+
+from log_loader import SEVERITY_COLUMN, format_value
+
+# pyarrow est optionnel : sans lui, les champs sont joints ligne par ligne
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# --- Configuration ---
+# Champs sérialisés, dans cet ordre (liste séparée par des virgules ; vide = toutes les colonnes
+# sauf le label severity_unified)
+ROW_TEXT_FIELDS = [field for field in os.getenv('ROW_TEXT_FIELDS', '').split(',') if field]
+# 'pairs' : "champ=valeur" ; 'values' : valeurs seules (moins de tokens hors vocabulaire)
+ROW_TEXT_FORMAT = os.getenv('ROW_TEXT_FORMAT', 'pairs')
+
+ROW_TEXT_FORMATS = ('pairs', 'values')
+
+
+def _field_pieces(values, prefix):
+    """
+    (codes, textes) d'une colonne : chaque valeur distincte n'est formatée qu'une fois, la ligne i
+    prend textes[codes[i]] ; None (valeur manquante, vide ou '-') signifie « champ sauté ».
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    texts = [format_value(value) for value in uniques] + [None]
+    texts = [None if text is None else prefix + text for text in texts]
+    # Le code -1 des valeurs manquantes désigne la dernière entrée (None)
+    return np.where(codes < 0, len(texts) - 1, codes), texts
+
+
+def row_fields(df, fields=None):
+    """Champs sérialisés présents dans le DataFrame, dans l'ordre configuré."""
+    fields = fields or ROW_TEXT_FIELDS or [col for col in df.columns if col != SEVERITY_COLUMN]
+    return [field for field in fields if field in df.columns]
+
+
+def serialize_rows(df, fields=None, fmt=None):
+    """
+    Texte de chaque ligne : "champ=valeur champ=valeur ..." (ou valeurs seules en format
+    'values'), en sautant les valeurs manquantes, vides et '-'. Retourne une liste de chaînes.
+    """
+    fmt = fmt or ROW_TEXT_FORMAT
+    if fmt not in ROW_TEXT_FORMATS:
+        raise ValueError(f"Format de texte inconnu : {fmt} (disponibles : {', '.join(ROW_TEXT_FORMATS)})")
+    pieces = [_field_pieces(df[field], '' if fmt == 'values' else field + '=') for field in row_fields(df, fields)]
+    if not pieces:
+        return [''] * len(df)
+    if pc is not None:
+        # Jointure colonne à colonne dans Arrow, les champs sautés (null) n'ajoutent ni texte ni séparateur
+        arrays = [pa.array(texts, type=pa.string()).take(pa.array(codes)) for codes, texts in pieces]
+        return pc.binary_join_element_wise(*arrays, ' ', null_handling='skip').to_pylist()
+    columns = [np.array(texts, dtype=object)[codes] for codes, texts in pieces]
+    return [' '.join(filter(None, row)) for row in zip(*columns)]
@@ -0,0 +1,132 @@
+# structured_features.py
+# -*- coding: utf-8 -*-
+# Features structurées des champs ECS : les champs numériques (octets, paquets, ports, durées,
+# event_id...) sont convertis et mis à l'échelle colonne par colonne, les champs catégoriels
+# (event.provider, winlog.channel...) sont hachés dans un nombre fixe de colonnes. Ces champs
+# n'ont plus besoin de passer par la vectorisation NLP de la ligne.
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from log_loader import PLACEHOLDER, SEVERITY_COLUMN
+
+# scipy est optionnel : il n'est nécessaire que pour concaténer avec une matrice creuse
+try:
+    import scipy.sparse as sp
+except ImportError:
+    sp = None
+
+# --- Configuration ---
+# Ajouter les features structurées aux vecteurs de texte dans les détecteurs (0 pour désactiver)
+LOG_STRUCTURED_FEATURES = os.getenv('LOG_STRUCTURED_FEATURES', '0') == '1'
+# Champs numériques encodés directement (liste séparée par des virgules)
+STRUCTURED_NUMERIC_FIELDS = os.getenv(
+    'STRUCTURED_NUMERIC_FIELDS',
+    'destination.bytes,destination.packets,destination.port,source.bytes,source.packets,source.port,'
+    'network.bytes,network.packets,event.duration,winlog.event_id,http.response.status_code',
+).split(',')
+# Champs catégoriels hachés (liste séparée par des virgules)
+STRUCTURED_CATEGORICAL_FIELDS = os.getenv(
+    'STRUCTURED_CATEGORICAL_FIELDS',
+    'event.provider,winlog.channel,event.action,event.category,event.code,network.transport,'
+    'host.name,process.name',
+).split(',')
+# Nombre de colonnes de l'espace haché des champs catégoriels
+STRUCTURED_HASH_FEATURES = int(os.getenv('STRUCTURED_HASH_FEATURES', '256'))
+
+
+def _to_numeric(values):
+    # Les exports Kibana écrivent les nombres avec séparateur de milliers ("1,234") et '-' si vide
+    values = pd.Series(values)
+    if values.dtype == object or isinstance(values.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        values = values.astype(str).str.replace(',', '', regex=False)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _bucket(field, value):
+    # Hachage stable d'un couple champ=valeur (hash() de Python change à chaque processus)
+    return zlib.crc32(f"{field}={value}".encode('utf-8'))
+
+
+class StructuredEncoder:
+    """
+    Encode les champs ECS d'un DataFrame en matrice dense float32 :
+    - par champ numérique : log1p signé puis centrage-réduction (moyenne et écart-type appris par
+      fit), et une colonne indiquant une valeur manquante ;
+    - champs catégoriels : un comptage haché des couples champ=valeur sur n_hash colonnes.
+    """
+
+    def __init__(self, numeric_fields=None, categorical_fields=None, n_hash=None):
+        self.numeric_fields = list(numeric_fields or STRUCTURED_NUMERIC_FIELDS)
+        self.categorical_fields = list(categorical_fields or STRUCTURED_CATEGORICAL_FIELDS)
+        self.n_hash = n_hash or STRUCTURED_HASH_FEATURES
+        self.mean_ = None
+        self.scale_ = None
+
+    @property
+    def fields(self):
+        """Champs consommés par l'encodeur (à retirer du texte vectorisé)."""
+        return self.numeric_fields + self.categorical_fields
+
+    @property
+    def dim(self):
+        return 2 * len(self.numeric_fields) + self.n_hash
+
+    def _numeric(self, df):
+        raw = np.full((len(df), len(self.numeric_fields)), np.nan)
+        for j, field in enumerate(self.numeric_fields):
+            if field in df.columns:
+                raw[:, j] = _to_numeric(df[field])
+        # Octets, paquets et durées ont des distributions à longue traîne
+        return np.sign(raw) * np.log1p(np.abs(raw))
+
+    def fit(self, df):
+        values = self._numeric(df)
+        with np.errstate(invalid='ignore'):
+            self.mean_ = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else np.zeros(values.shape[1])
+            scale = np.nan_to_num(np.nanstd(values, axis=0)) if len(values) else np.ones(values.shape[1])
+        self.scale_ = np.where(scale > 0, scale, 1.0)
+        return self
+
+    def transform(self, df):
+        if self.mean_ is None:
+            raise ValueError("fit() doit être appelé avant transform()")
+        out = np.zeros((len(df), self.dim), dtype=np.float32)
+
+        values = self._numeric(df)
+        missing = np.isnan(values)
+        n_numeric = len(self.numeric_fields)
+        out[:, :n_numeric] = np.where(missing, 0.0, (values - self.mean_) / self.scale_)
+        out[:, n_numeric:2 * n_numeric] = missing
+
+        hashed = out[:, 2 * n_numeric:]
+        rows = np.arange(len(df))
+        for field in self.categorical_fields:
+            if field not in df.columns:
+                continue
+            # Une valeur distincte n'est hachée qu'une fois (factorize), puis répartie sur les lignes
+            codes, uniques = pd.factorize(df[field], use_na_sentinel=True)
+            buckets = np.array([_bucket(field, value) % self.n_hash for value in uniques], dtype=np.int64)
+            present = codes >= 0
+            if len(uniques):
+                present &= np.asarray([value != PLACEHOLDER for value in uniques])[np.maximum(codes, 0)]
+            np.add.at(hashed, (rows[present], buckets[codes[present]]), 1.0)
+        return out
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+
+def text_frame(df, encoder):
+    """Colonnes restant à vectoriser comme texte : celles que l'encodeur ne consomme pas (label compris)."""
+    consumed = set(encoder.fields) - {SEVERITY_COLUMN}
+    return df[[col for col in df.columns if col not in consumed]]
+
+
+def concat_features(text_vectors, structured):
+    """Concatène vecteurs de texte (denses ou creux) et features structurées, ligne à ligne."""
+    if sp is not None and sp.issparse(text_vectors):
+        return sp.hstack([text_vectors, sp.csr_matrix(structured)], format='csr', dtype=np.float32)
+    return np.hstack([np.asarray(text_vectors, dtype=np.float32), structured])
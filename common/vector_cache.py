@@ -0,0 +1,248 @@
+# vector_cache.py
+# -*- coding: utf-8 -*-
+# Cache des vecteurs de logs, adressé par le hash du texte normalisé.
+# - niveau mémoire : LRU borné en nombre d'entrées
+# - niveau disque : matrice en ajout seul (memory-mapped) + index hash -> ligne
+# Les vecteurs peuvent être stockés en float32, float16 ou int8 quantifié (voir quantization.py).
+# Le cache est partagé par les threads du serveur Flask : chaque niveau protège son état par un verrou.
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from quantization import STORAGE_DTYPES, check_precision, dequantize, quantize
+
+# --- Configuration ---
+# Nombre maximal de vecteurs gardés en mémoire (0 = niveau mémoire désactivé)
+SPACY_CACHE_SIZE = int(os.getenv('SPACY_CACHE_SIZE', '50000'))
+# Répertoire du niveau disque (vide = niveau disque désactivé)
+SPACY_CACHE_DIR = os.getenv('SPACY_CACHE_DIR', 'vector_cache')
+# Précision de stockage des vecteurs en cache ('float32', 'float16' ou 'int8')
+SPACY_CACHE_PRECISION = os.getenv('SPACY_CACHE_PRECISION', 'float32')
+
+KEY_SIZE = 16  # octets de hash blake2b par entrée de l'index
+# Version du calcul des clés (text_key) : un stock disque écrit avec une autre version est reconstruit
+KEY_VERSION = 2
+# Extension du fichier de vecteurs selon la précision
+VECTOR_FILE_SUFFIXES = {'float32': 'f32', 'float16': 'f16', 'int8': 'i8'}
+
+# --- MÉTRIQUES PROMETHEUS DU CACHE ---
+SPACY_CACHE_HITS_TOTAL = Counter(
+    'spacy_vector_cache_hits_total', 'Vector cache hits', ['tier']
+)
+SPACY_CACHE_MISSES_TOTAL = Counter(
+    'spacy_vector_cache_misses_total', 'Vector cache misses (vectors computed by spaCy)'
+)
+SPACY_CACHE_EVICTIONS_TOTAL = Counter(
+    'spacy_vector_cache_evictions_total', 'Vectors evicted from the in-memory LRU tier'
+)
+SPACY_CACHE_ENTRIES = Gauge(
+    'spacy_vector_cache_entries', 'Number of vectors stored in the cache', ['tier']
+)
+
+
+def normalize_text(text):
+    """
+    Texte d'un log tel qu'il est vectorisé et haché : None devient '', le reste est converti en
+    str sans autre changement (les espaces de début et de fin sont des tokens spaCy qui comptent
+    dans doc.vector, ils ne sont donc pas retirés).
+    """
+    return "" if text is None else str(text)
+
+
+def text_key(text):
+    """Clé de cache : hash blake2b (16 octets) du texte exact (voir normalize_text)."""
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=KEY_SIZE).digest()
+
+
+class DiskVectorStore:
+    """Matrice en ajout seul sur disque, lue via np.memmap, avec un index hash -> ligne."""
+
+    def __init__(self, directory, dim, model_name, precision='float32', scales=None):
+        self.dim = dim
+        self.precision = precision
+        self.scales = scales
+        self.dtype = STORAGE_DTYPES[precision]
+        self.directory = os.path.join(directory, re.sub(r'[^A-Za-z0-9_.-]', '_', model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, f'vectors.{VECTOR_FILE_SUFFIXES[precision]}')
+        self.index_path = os.path.join(self.directory, 'index.bin')
+        self.lock_path = os.path.join(self.directory, '.lock')
+        self.meta_path = os.path.join(self.directory, 'meta.json')
+        self.rows = {}
+        self.n_rows = 0
+        self._matrix = None
+        # Verrou entre threads (l'index en mémoire), le verrou fichier sérialise les processus
+        self._thread_lock = threading.Lock()
+        with self._locked():
+            self._check_meta(model_name)
+            self._refresh()
+
+    def _locked(self):
+        return _FileLock(self.lock_path)
+
+    def _check_meta(self, model_name):
+        # Un changement de modèle, de dimension, de précision ou de clés rend le stock existant inutilisable :
+        # on repart de zéro
+        meta = {'model': model_name, 'dim': self.dim, 'dtype': self.precision, 'key_version': KEY_VERSION}
+        if self.scales is not None:
+            meta['scales'] = [float(x) for x in self.scales]
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                if json.load(f) == meta:
+                    return
+        vector_files = [os.path.join(self.directory, f'vectors.{suffix}') for suffix in VECTOR_FILE_SUFFIXES.values()]
+        for path in vector_files + [self.index_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def _refresh(self):
+        # Lire uniquement la fin de l'index (lignes ajoutées depuis la dernière lecture, y compris
+        # par d'autres processus). L'index est écrit après les vecteurs : une ligne n'est valide
+        # que si son vecteur est complet.
+        row_bytes = self.dtype.itemsize * self.dim
+        n_vectors = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        keys = b''
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                f.seek(self.n_rows * KEY_SIZE)
+                keys = f.read()
+        n_rows = min(self.n_rows + len(keys) // KEY_SIZE, n_vectors)
+        if n_rows == self.n_rows:
+            return
+        for i in range(n_rows - self.n_rows):
+            self.rows[keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = self.n_rows + i
+        self.n_rows = n_rows
+        self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(n_rows, self.dim))
+        SPACY_CACHE_ENTRIES.labels(tier='disk').set(n_rows)
+
+    def __len__(self):
+        return self.n_rows
+
+    def get(self, key):
+        with self._thread_lock:
+            row = self.rows.get(key)
+            if row is None:
+                return None
+            matrix = self._matrix
+        return np.array(matrix[row])
+
+    def append(self, keys, vectors):
+        """
+        Ajoute des vecteurs (déjà dans le type de stockage du stock) en fin de fichier ; les clés
+        déjà présentes sont ignorées.
+        """
+        with self._thread_lock, self._locked():
+            # Un autre processus a pu ajouter des lignes entre-temps
+            self._refresh()
+            new, seen = [], set()
+            for i, key in enumerate(keys):
+                if key not in self.rows and key not in seen:
+                    seen.add(key)
+                    new.append((key, i))
+            if not new:
+                return
+            block = np.ascontiguousarray(vectors[[i for _, i in new]], dtype=self.dtype)
+            # Tronquer une éventuelle ligne partielle laissée par une écriture interrompue
+            with open(self.vectors_path, 'ab') as f:
+                f.truncate(self.n_rows * self.dtype.itemsize * self.dim)
+                f.write(block.tobytes())
+            with open(self.index_path, 'ab') as f:
+                f.truncate(self.n_rows * KEY_SIZE)
+                f.write(b''.join(key for key, _ in new))
+            self._refresh()
+
+
+class _FileLock:
+    """Verrou exclusif inter-processus (fcntl.flock) autour des écritures du stock disque."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class VectorCache:
+    """
+    Cache à deux niveaux (LRU mémoire puis stock disque) des vecteurs de logs. Les deux niveaux
+    stockent les vecteurs dans la précision demandée ; en int8, les échelles par dimension sont
+    fixes (fournies à la création) pour que tous les vecteurs du stock partagent les mêmes.
+    """
+
+    def __init__(self, dim, model_name, max_items=SPACY_CACHE_SIZE, directory=SPACY_CACHE_DIR,
+                 precision=SPACY_CACHE_PRECISION, scales=None):
+        self.dim = dim
+        self.max_items = max_items
+        self.precision = check_precision(precision)
+        if precision == 'int8' and scales is None:
+            raise ValueError("Le cache int8 nécessite des échelles par dimension fixes")
+        self.scales = None if precision != 'int8' else np.asarray(scales, dtype=np.float32)
+        self.memory = OrderedDict()
+        # Lecture, mise à jour de l'ordre LRU et éviction du niveau mémoire sous un même verrou
+        self._lock = threading.Lock()
+        self.disk = DiskVectorStore(directory, dim, model_name, self.precision, self.scales) if directory else None
+
+    def _remember(self, key, vector):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self.memory[key] = vector
+            self.memory.move_to_end(key)
+            evicted = 0
+            while len(self.memory) > self.max_items:
+                self.memory.popitem(last=False)
+                evicted += 1
+            entries = len(self.memory)
+        if evicted:
+            SPACY_CACHE_EVICTIONS_TOTAL.inc(evicted)
+        SPACY_CACHE_ENTRIES.labels(tier='memory').set(entries)
+
+    def get(self, key):
+        """Retourne le vecteur associé à la clé, ou None (compté comme miss)."""
+        with self._lock:
+            code = self.memory.get(key)
+            if code is not None:
+                self.memory.move_to_end(key)
+        if code is not None:
+            SPACY_CACHE_HITS_TOTAL.labels(tier='memory').inc()
+            return dequantize(code, self.scales)
+        if self.disk is not None:
+            code = self.disk.get(key)
+            if code is not None:
+                SPACY_CACHE_HITS_TOTAL.labels(tier='disk').inc()
+                self._remember(key, code)
+                return dequantize(code, self.scales)
+        SPACY_CACHE_MISSES_TOTAL.inc()
+        return None
+
+    def put_many(self, keys, vectors):
+        """
+        Enregistre des vecteurs fraîchement calculés dans les deux niveaux et retourne les vecteurs
+        tels que le cache les restituera (float32) : un appelant obtient ainsi les mêmes valeurs,
+        que le vecteur vienne d'être calculé ou soit servi par le cache.
+        """
+        codes, _ = quantize(vectors, self.precision, self.scales)
+        for key, code in zip(keys, codes):
+            # Copie : ne pas garder en vie toute la matrice du lot via une vue
+            self._remember(key, np.array(code))
+        if self.disk is not None and len(keys):
+            self.disk.append(keys, codes)
+        if self.precision == 'float32':
+            return vectors
+        return dequantize(codes, self.scales)
@@ -0,0 +1,276 @@
+# vectorizer.py
+# -*- coding: utf-8 -*-
+# Moteur de vectorisation spaCy partagé par le service Spacy et les détecteurs (IF / OCSVM).
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import spacy
+
+from dedup import LOG_DEDUP, RowDedup
+from fast_vectorizer import FastVectorizer
+from metrics import track_stage
+from quantization import dimension_scales
+from vector_cache import SPACY_CACHE_DIR, SPACY_CACHE_PRECISION, SPACY_CACHE_SIZE, VectorCache, normalize_text, text_key
+
+# --- Configuration ---
+SPACY_MODEL_NAME = os.getenv('SPACY_MODEL_NAME', 'en_core_web_md')
+SPACY_BATCH_SIZE = int(os.getenv('SPACY_BATCH_SIZE', '256'))
+# Nombre de processus de vectorisation (1 = mode séquentiel, 0 = tous les cœurs disponibles)
+SPACY_N_PROCESS = int(os.getenv('SPACY_N_PROCESS', '1'))
+# Borne du nombre de processus qu'un appel (ou une requête) peut demander (0 = nombre de cœurs disponibles)
+SPACY_MAX_PROCESSES = int(os.getenv('SPACY_MAX_PROCESSES', '0'))
+# Calcul direct de doc.vector sur la table de vecteurs, sans pipeline spaCy (0 pour désactiver)
+SPACY_FAST_VECTORS = os.getenv('SPACY_FAST_VECTORS', '1') == '1'
+# Nombre de logs envoyés à un worker en une seule tâche
+SPACY_CHUNK_SIZE = int(os.getenv('SPACY_CHUNK_SIZE', '5000'))
+# Nombre de logs synthétiques vectorisés au démarrage pour préchauffer le vectoriseur
+SPACY_WARMUP_ROWS = int(os.getenv('SPACY_WARMUP_ROWS', '512'))
+
+# Composants inutiles pour doc.vector (moyenne des vecteurs de tokens) : ils restent
+# chargés mais ne sont pas exécutés, ce qui permet de les réactiver au besoin.
+VECTOR_DISABLED_COMPONENTS = ['tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'ner', 'senter']
+
+# Modèle chargé une seule fois par processus
+_nlp = None
+_fast = None
+# Pool de workers (créé au premier appel parallèle puis réutilisé, jamais recréé)
+_pool = None
+_pool_lock = threading.Lock()
+# Cache des vecteurs (créé au premier appel si activé)
+_cache = None
+
+
+def get_nlp():
+    """Charge le modèle spaCy au premier appel puis le réutilise."""
+    global _nlp
+    if _nlp is None:
+        _nlp = spacy.load(SPACY_MODEL_NAME, disable=VECTOR_DISABLED_COMPONENTS)
+    return _nlp
+
+
+def model_loaded():
+    """Indique si le modèle spaCy est déjà chargé dans ce processus."""
+    return _nlp is not None
+
+
+def vectorizer_version():
+    """Identifiant du vectoriseur (modèle et version du paquet), enregistré avec les vecteurs produits."""
+    return f"{SPACY_MODEL_NAME}=={spacy.util.get_package_version(SPACY_MODEL_NAME) or 'local'}"
+
+
+def get_fast_vectorizer():
+    """Retourne le vectoriseur « vecteurs seuls » du processus, ou None s'il ne s'applique pas."""
+    global _fast
+    if _fast is None and SPACY_FAST_VECTORS and FastVectorizer.supports(get_nlp()):
+        _fast = FastVectorizer(get_nlp())
+    return _fast
+
+
+def vector_dim():
+    """Dimension des vecteurs du modèle (300 pour en_core_web_md)."""
+    return get_nlp().vocab.vectors_length
+
+
+def vector_scales():
+    """
+    Échelles int8 par dimension valables pour tous les vecteurs du modèle : doc.vector est une
+    moyenne de lignes de la table, donc |doc.vector[d]| <= max |table[:, d]|.
+    """
+    return dimension_scales(get_nlp().vocab.vectors.data)
+
+
+def available_cpus():
+    """Nombre de cœurs utilisables par ce processus (respecte l'affinité CPU du conteneur)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def max_processes():
+    """Nombre maximal de processus de vectorisation : SPACY_MAX_PROCESSES, sans dépasser les cœurs disponibles."""
+    cpus = available_cpus()
+    return min(SPACY_MAX_PROCESSES, cpus) if SPACY_MAX_PROCESSES > 0 else cpus
+
+
+def resolve_n_process(n_process=None):
+    """Nombre de processus effectif d'un appel : SPACY_N_PROCESS par défaut, 0 = tous, borné par max_processes()."""
+    n_process = SPACY_N_PROCESS if n_process is None else int(n_process)
+    if n_process <= 0:
+        n_process = available_cpus()
+    return max(1, min(n_process, max_processes()))
+
+
+def _vectorize_chunk(texts, batch_size):
+    # Exécuté dans le processus courant ou dans un worker du pool
+    fast = get_fast_vectorizer()
+    if fast is not None:
+        return fast(texts)
+    nlp = get_nlp()
+    vectors = np.zeros((len(texts), vector_dim()), dtype=np.float32)
+    for i, doc in enumerate(nlp.pipe(texts, batch_size=batch_size)):
+        vectors[i] = doc.vector
+    return vectors
+
+
+def get_pool():
+    """
+    Retourne le pool partagé de max_processes() workers ; chaque worker charge le modèle une seule
+    fois. Le pool est créé sous verrou et n'est jamais arrêté pendant la vie du processus : des
+    requêtes concurrentes peuvent s'en servir en même temps, chacune n'occupant que n_process
+    workers (un bloc de textes par worker).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_processes(), initializer=get_nlp)
+        return _pool
+
+
+def get_cache():
+    """Retourne le cache de vecteurs du processus, ou None s'il est désactivé."""
+    global _cache
+    if _cache is None and (SPACY_CACHE_SIZE > 0 or SPACY_CACHE_DIR):
+        scales = vector_scales() if SPACY_CACHE_PRECISION == 'int8' else None
+        _cache = VectorCache(vector_dim(), SPACY_MODEL_NAME, precision=SPACY_CACHE_PRECISION, scales=scales)
+    return _cache
+
+
+def vectorize(texts, batch_size=None, n_process=None, chunk_size=None, use_cache=True):
+    """
+    Vectorise une liste de textes et retourne une matrice float32 (n, dim), dans le même
+    ordre que les textes reçus. Les textes répétés ne sont traités qu'une fois (LOG_DEDUP) ;
+    les textes déjà vus sont servis par le cache, les autres passent par _compute_vectors puis
+    sont ajoutés au cache.
+    """
+    # Textes vectorisés tels quels : seul None est remplacé par '' (voir normalize_text)
+    texts = [normalize_text(text) for text in texts]
+    with track_stage('vectorize', rows=len(texts)):
+        if LOG_DEDUP:
+            # Chaque texte distinct n'est vectorisé (et cherché dans le cache) qu'une fois
+            dedup = RowDedup(texts)
+            if dedup.n_unique < dedup.n_rows:
+                vectors = _vectorize_cached(dedup.unique(texts), batch_size, n_process, chunk_size, use_cache)
+                return dedup.scatter(vectors, stage='vectorize')
+        return _vectorize_cached(texts, batch_size, n_process, chunk_size, use_cache)
+
+
+def _vectorize_cached(texts, batch_size, n_process, chunk_size, use_cache):
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return _compute_vectors(texts, batch_size, n_process, chunk_size)
+
+    vectors = np.zeros((len(texts), vector_dim()), dtype=np.float32)
+    # Clé -> positions des lignes encore à calculer
+    missing = {}
+    missing_texts = []
+    for i, text in enumerate(texts):
+        key = text_key(text)
+        if key in missing:
+            missing[key].append(i)
+            continue
+        vector = cache.get(key)
+        if vector is None:
+            missing[key] = [i]
+            missing_texts.append(text)
+        else:
+            vectors[i] = vector
+    if missing_texts:
+        computed = _compute_vectors(missing_texts, batch_size, n_process, chunk_size)
+        # Vecteurs dans la précision du cache, identiques à ceux qu'il servira aux appels suivants
+        computed = cache.put_many(list(missing.keys()), computed)
+        for rows, vector in zip(missing.values(), computed):
+            vectors[rows] = vector
+    return vectors
+
+
+def _compute_vectors(texts, batch_size=None, n_process=None, chunk_size=None):
+    """
+    Vectorise une liste de textes via nlp.pipe, sans cache. Avec n_process > 1, les textes sont
+    découpés en blocs de chunk_size vectorisés en parallèle, puis réassemblés dans l'ordre d'origine.
+    """
+    batch_size = batch_size or SPACY_BATCH_SIZE
+    n_process = resolve_n_process(n_process)
+
+    # Étape mesurée : textes réellement vectorisés (hors cache)
+    with track_stage('vectorize_batch', rows=len(texts)):
+        return _compute_chunks(texts, batch_size, n_process, chunk_size)
+
+
+def _compute_chunks(texts, batch_size, n_process, chunk_size):
+    # Petits volumes : le coût d'envoi aux workers dépasserait le gain
+    if n_process == 1 or len(texts) <= batch_size:
+        return _vectorize_chunk(texts, batch_size)
+
+    # Au moins un bloc par worker, sans dépasser SPACY_CHUNK_SIZE logs par tâche
+    chunk_size = chunk_size or min(SPACY_CHUNK_SIZE, -(-len(texts) // n_process))
+
+    # Charger le modèle dans le parent avant le fork : les workers partagent ses pages
+    get_nlp()
+    pool = get_pool()
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    # pool.map conserve l'ordre des blocs, donc l'ordre des lignes d'origine
+    results = pool.map(_vectorize_chunk, chunks, [batch_size] * len(chunks))
+    return np.concatenate(list(results), axis=0)
+
+
+def _warmup_texts(n):
+    # Logs synthétiques proches des vrais (mots courants, IP, GUID, nombres) pour que les
+    # allocations paresseuses du tokenizer et de la table de vecteurs aient lieu
+    samples = [
+        "An account was successfully logged on from 10.0.{i}.{j} port {port}",
+        "The Windows Filtering Platform has permitted a connection to {i}.{j}.168.1",
+        "Process {port} created with GUID {{6b29fc40-ca47-1067-b31d-00dd010662{j:02d}}}",
+        "Special privileges assigned to new logon user{i} error warning critical",
+        "Service control manager: the service entered the running state ({port} ms)",
+    ]
+    return [samples[k % len(samples)].format(i=k % 256, j=k % 100, port=1024 + k) for k in range(n)]
+
+
+def warm_up(rows=None):
+    """
+    Charge le modèle, le vectoriseur rapide, le cache et le pool de workers, puis vectorise un lot
+    synthétique (sans passer par le cache) pour que le premier vrai appel ne paie pas ces coûts.
+    Retourne la durée du préchauffage en secondes.
+    """
+    start = time.perf_counter()
+    get_nlp()
+    get_fast_vectorizer()
+    get_cache()
+    rows = SPACY_WARMUP_ROWS if rows is None else rows
+    if rows > 0:
+        # Appel direct, hors métriques d'étape : le préchauffage ne doit pas fausser les débits
+        _compute_chunks(_warmup_texts(rows), SPACY_BATCH_SIZE, resolve_n_process(), None)
+    return time.perf_counter() - start
+
+
+def iter_vectors(texts, batch_size=None):
+    """
+    Vectorise un flux de textes (itérable éventuellement infini) et produit les vecteurs un
+    par un, au fil des lots : la mémoire reste bornée à un lot quel que soit le volume.
+    """
+    batch_size = batch_size or SPACY_BATCH_SIZE
+    texts = (normalize_text(text) for text in texts)
+    fast = get_fast_vectorizer()
+    if fast is None:
+        for doc in get_nlp().pipe(texts, batch_size=batch_size):
+            yield doc.vector
+        return
+    batch = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) == batch_size:
+            yield from _stream_batch(fast, batch)
+            batch = []
+    if batch:
+        yield from _stream_batch(fast, batch)
+
+
+def _stream_batch(fast, batch):
+    # Le lot est vectorisé avant d'être produit : la mesure n'inclut pas l'envoi au client
+    with track_stage('vectorize_stream', rows=len(batch)):
+        vectors = fast(batch)
+    return vectors
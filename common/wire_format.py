@@ -0,0 +1,155 @@
+# wire_format.py
+# -*- coding: utf-8 -*-
+# Formats d'échange des vecteurs entre le service Spacy et ses clients (IF / OCSVM).
+# Le format est négocié via l'en-tête Accept, la compression via Accept-Encoding.
+import gzip
+import io
+import json
+import struct
+
+import numpy as np
+
+from quantization import dequantize, quantize
+
+# Dépendances optionnelles : le format correspondant n'est proposé que si elles sont installées
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --- Types de contenu supportés ---
+JSON_MIMETYPE = 'application/json'
+RAW_F32_MIMETYPE = 'application/x-float32'   # float32 little-endian précédé d'un en-tête (magic, lignes, dim)
+NPY_MIMETYPE = 'application/x-npy'           # fichier .npy (np.save)
+RAW_F16_MIMETYPE = 'application/x-float16'   # float16 little-endian, même en-tête que float32
+RAW_I8_MIMETYPE = 'application/x-int8'       # int8 quantifié : en-tête, échelles float32 par dimension, codes
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'  # Arrow IPC, colonne FixedSizeList<float32>
+
+# En-tête du format brut : magic, nombre de lignes, dimension (uint32 little-endian)
+RAW_F32_MAGIC = b'F32V'
+RAW_F32_HEADER = struct.Struct('<4sII')
+RAW_F16_MAGIC = b'F16V'
+RAW_I8_MAGIC = b'I8QV'
+
+# En dessous de cette taille, compresser coûte plus que ça ne rapporte
+MIN_COMPRESS_BYTES = 1024
+
+
+def supported_mimetypes():
+    """Types de contenu proposés, par ordre de préférence (JSON en premier pour les anciens clients)."""
+    mimetypes = [JSON_MIMETYPE, RAW_F32_MIMETYPE, NPY_MIMETYPE, RAW_F16_MIMETYPE, RAW_I8_MIMETYPE]
+    if pa is not None:
+        mimetypes.append(ARROW_MIMETYPE)
+    return mimetypes
+
+
+def supported_encodings():
+    """Encodages de compression proposés, par ordre de préférence."""
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def encode_vectors(vectors, mimetype=JSON_MIMETYPE):
+    """Sérialise une matrice (n, dim) dans le format demandé et retourne les octets."""
+    vectors = np.ascontiguousarray(vectors, dtype='<f4')
+    if vectors.ndim != 2:
+        vectors = vectors.reshape(len(vectors), -1)
+
+    if mimetype == RAW_F32_MIMETYPE:
+        return RAW_F32_HEADER.pack(RAW_F32_MAGIC, *vectors.shape) + vectors.tobytes()
+    if mimetype == RAW_F16_MIMETYPE:
+        codes, _ = quantize(vectors, 'float16')
+        return RAW_F32_HEADER.pack(RAW_F16_MAGIC, *vectors.shape) + codes.tobytes()
+    if mimetype == RAW_I8_MIMETYPE:
+        codes, scales = quantize(vectors, 'int8')
+        return RAW_F32_HEADER.pack(RAW_I8_MAGIC, *vectors.shape) + scales.astype('<f4').tobytes() + codes.tobytes()
+    if mimetype == NPY_MIMETYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, vectors, allow_pickle=False)
+        return buffer.getvalue()
+    if mimetype == ARROW_MIMETYPE:
+        if pa is None:
+            raise ValueError("pyarrow n'est pas installé : format Arrow indisponible")
+        column = pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel(), type=pa.float32()), vectors.shape[1])
+        table = pa.table({'vector': column})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if mimetype == JSON_MIMETYPE:
+        # orjson sérialise directement les tableaux NumPy (repr float32 la plus courte)
+        if orjson is not None:
+            return orjson.dumps({'vectors': vectors}, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps({'vectors': vectors.tolist()}).encode('utf-8')
+    raise ValueError(f"Format de vecteurs non supporté : {mimetype}")
+
+
+def decode_quantized(body, mimetype):
+    """
+    Désérialise une réponse float16 ou int8 sans la reconvertir en float32 : retourne
+    (codes, échelles par dimension ou None), vues sans copie sur le tampon reçu.
+    """
+    mimetype = mimetype.split(';')[0].strip()
+    magic, rows, dim = RAW_F32_HEADER.unpack_from(body)
+    offset = RAW_F32_HEADER.size
+    if mimetype == RAW_F16_MIMETYPE and magic == RAW_F16_MAGIC:
+        return np.frombuffer(body, dtype='<f2', count=rows * dim, offset=offset).reshape(rows, dim), None
+    if mimetype == RAW_I8_MIMETYPE and magic == RAW_I8_MAGIC:
+        scales = np.frombuffer(body, dtype='<f4', count=dim, offset=offset)
+        codes = np.frombuffer(body, dtype='i1', count=rows * dim, offset=offset + 4 * dim).reshape(rows, dim)
+        return codes, scales
+    raise ValueError(f"En-tête de vecteurs {mimetype} invalide")
+
+
+def decode_vectors(body, mimetype=JSON_MIMETYPE):
+    """Désérialise une réponse /vectorize en matrice float32 (n, dim)."""
+    mimetype = (mimetype or JSON_MIMETYPE).split(';')[0].strip()
+
+    if mimetype in (RAW_F16_MIMETYPE, RAW_I8_MIMETYPE):
+        return dequantize(*decode_quantized(body, mimetype))
+
+    if mimetype == RAW_F32_MIMETYPE:
+        magic, rows, dim = RAW_F32_HEADER.unpack_from(body)
+        if magic != RAW_F32_MAGIC:
+            raise ValueError("En-tête de vecteurs float32 invalide")
+        # Vue sans copie sur le tampon reçu
+        return np.frombuffer(body, dtype='<f4', count=rows * dim, offset=RAW_F32_HEADER.size).reshape(rows, dim)
+    if mimetype == NPY_MIMETYPE:
+        return np.load(io.BytesIO(body), allow_pickle=False)
+    if mimetype == ARROW_MIMETYPE:
+        if pa is None:
+            raise ValueError("pyarrow n'est pas installé : format Arrow indisponible")
+        table = pa.ipc.open_stream(body).read_all()
+        column = table.column('vector').combine_chunks()
+        return column.flatten().to_numpy().reshape(len(column), column.type.list_size)
+    if mimetype == JSON_MIMETYPE:
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
+        return np.asarray(data['vectors'], dtype=np.float32)
+    raise ValueError(f"Format de vecteurs non supporté : {mimetype}")
+
+
+def compress(body, encoding):
+    """Compresse le corps de la réponse (None = pas de compression)."""
+    if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body), 'zstd'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
+
+
+def decompress(body, encoding):
+    """Décompresse un corps reçu selon son Content-Encoding (si le client HTTP ne l'a pas déjà fait)."""
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    return body